@@ -4,8 +4,7 @@ from langchain.schema import AIMessage, SystemMessage
 from langchain_community.chat_models import ChatOpenAI
 
 from agents.agent_simulations.agent.dialogue_agent import DialogueAgent
-from config import Config
-from memory.zep.zep_memory import ZepMemory
+from memory.get_memory import get_memory
 from services.run_log import RunLogsManager
 from typings.agent import AgentWithConfigsOutput
 
@@ -41,13 +40,7 @@ class DialogueAgentWithTools(DialogueAgent):
         """
 
         # Setup memory
-        memory = ZepMemory(
-            session_id=self.session_id,
-            url=Config.ZEP_API_URL,
-            api_key=Config.ZEP_API_KEY,
-            memory_key="chat_history",
-            return_messages=True,
-        )
+        memory = get_memory(session_id=self.session_id)
 
         memory.human_name = self.sender_name
         memory.ai_name = self.agent_with_configs.agent.name
@@ -13,7 +13,7 @@ from agents.agent_simulations.authoritarian.director_dialogue_agent_with_tools i
 from agents.base_agent import BaseAgent
 from config import Config
 from exceptions import InvalidLLMApiKeyException
-from memory.zep.zep_memory import ZepMemory
+from memory.get_memory import get_memory
 from models.config import ConfigModel
 from models.datasource import DatasourceModel
 from models.team import TeamModel
@@ -142,13 +142,7 @@ class AuthoritarianSpeaker(BaseAgent):
             topic  # self.generate_specified_prompt(topic, agent_summary, team)
         )
 
-        memory = ZepMemory(
-            session_id=self.session_id,
-            url=Config.ZEP_API_URL,
-            api_key=Config.ZEP_API_KEY,
-            memory_key="chat_history",
-            return_messages=True,
-        )
+        memory = get_memory(session_id=self.session_id, write_behind=True)
 
         memory.human_name = self.sender_name
         memory.save_human_message(specified_topic)
@@ -249,3 +243,6 @@ class AuthoritarianSpeaker(BaseAgent):
             ai_message = history.create_ai_message(str(err))
             memory.save_ai_message(str(err))
             self.chat_pubsub_service.send_chat_message(chat_message=ai_message)
+        finally:
+            # Speakers don't wait on Zep, the run ends once their messages are written
+            memory.flush(Config.ZEP_WRITE_FLUSH_TIMEOUT)
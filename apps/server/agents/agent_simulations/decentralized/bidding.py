@@ -0,0 +1,75 @@
+import math
+import time
+from concurrent.futures import (FIRST_COMPLETED, Future, ThreadPoolExecutor,
+                                wait)
+from typing import Callable, Dict, List, TypeVar
+
+A = TypeVar("A")
+
+
+def collect_bids(
+    agents: List[A],
+    ask_for_bid: Callable[[A], int],
+    max_concurrency: int,
+    timeout: float,
+    default_bid: int = 0,
+) -> List[int]:
+    """
+    Asks every agent for its bid on at most max_concurrency threads. A bid which
+    takes longer than timeout seconds from when it started counts as default_bid,
+    so one slow agent doesn't hold up the turn. Errors of a bid are raised.
+    """
+    if not agents:
+        return []
+
+    workers = max(1, min(max_concurrency, len(agents)))
+    executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bid")
+    started: Dict[int, float] = {}
+
+    def run_bid(index: int, agent: A) -> int:
+        started[index] = time.monotonic()
+        return ask_for_bid(agent)
+
+    futures: Dict[Future, int] = {
+        executor.submit(run_bid, index, agent): index
+        for index, agent in enumerate(agents)
+    }
+    bids = [default_bid] * len(agents)
+    pending = set(futures)
+    # Bids queued behind timed out ones still start late, bound the whole round too
+    round_deadline = time.monotonic() + timeout * math.ceil(len(agents) / workers)
+
+    try:
+        while pending:
+            now = time.monotonic()
+            deadlines = [round_deadline] + [
+                started[futures[future]] + timeout
+                for future in pending
+                if futures[future] in started
+            ]
+            done, pending = wait(
+                pending,
+                timeout=max(min(deadlines) - now, 0),
+                return_when=FIRST_COMPLETED,
+            )
+
+            for future in done:
+                bids[futures[future]] = future.result()
+
+            now = time.monotonic()
+
+            if now >= round_deadline:
+                break
+
+            pending = {
+                future
+                for future in pending
+                if future.done()
+                or futures[future] not in started
+                or now < started[futures[future]] + timeout
+            }
+    finally:
+        # Timed out bids finish in the background, their results are ignored
+        executor.shutdown(wait=False, cancel_futures=True)
+
+    return bids
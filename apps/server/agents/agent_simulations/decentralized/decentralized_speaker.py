@@ -9,12 +9,13 @@ from langchain_community.chat_models import ChatOpenAI
 from agents.agent_simulations.agent.dialogue_agent import DialogueSimulator
 from agents.agent_simulations.agent.dialogue_agent_with_tools import \
     DialogueAgentWithTools
+from agents.agent_simulations.decentralized.bidding import collect_bids
 from agents.agent_simulations.decentralized.bidding_dialogue_agent import \
     BiddingDialogueAgent
 from agents.agent_simulations.decentralized.output_parser import bid_parser
 from agents.base_agent import BaseAgent
 from config import Config
-from memory.zep.zep_memory import ZepMemory
+from memory.get_memory import get_memory
 from models.config import ConfigModel
 from models.datasource import DatasourceModel
 from models.team import TeamModel
@@ -73,10 +74,12 @@ class DecentralizedSpeaker(BaseAgent):
     def select_next_speaker(
         self, step: int, agents: List[DialogueAgentWithTools]
     ) -> int:
-        bids = []
-        for agent in agents:
-            bid = self.ask_for_bid(agent)
-            bids.append(bid)
+        bids = collect_bids(
+            agents,
+            self.ask_for_bid,
+            max_concurrency=Config.BID_MAX_CONCURRENCY,
+            timeout=Config.BID_TIMEOUT,
+        )
 
         # randomly select among multiple agents with the same bid
         max_value = np.max(bids)
@@ -199,13 +202,7 @@ Here is task or topic: {topic}.
             topic  # self.generate_specified_prompt(topic, agent_summary, team)
         )
 
-        memory = ZepMemory(
-            session_id=self.session_id,
-            url=Config.ZEP_API_URL,
-            api_key=Config.ZEP_API_KEY,
-            memory_key="chat_history",
-            return_messages=True,
-        )
+        memory = get_memory(session_id=self.session_id, write_behind=True)
 
         memory.human_name = self.sender_name
         memory.save_human_message(specified_topic)
@@ -306,3 +303,6 @@ Here is task or topic: {topic}.
             ai_message = history.create_ai_message(str(err))
             memory.save_ai_message(str(err))
             self.chat_pubsub_service.send_chat_message(chat_message=ai_message)
+        finally:
+            # Speakers don't wait on Zep, the run ends once their messages are written
+            memory.flush(Config.ZEP_WRITE_FLUSH_TIMEOUT)
@@ -1,24 +1,87 @@
 import asyncio
+from typing import List, Tuple
 
-from langchain import hub
 from langchain.agents import (AgentExecutor, AgentType, create_react_agent,
                               initialize_agent)
+from langchain_core.language_models import BaseLanguageModel
+from langchain_core.runnables import Runnable
+from langchain_core.tools import BaseTool
+from starlette.concurrency import run_in_threadpool
 
 from agents.base_agent import BaseAgent
+from agents.conversational.marker_scanner import (FINAL_ANSWER_MARKER,
+                                                  MarkerScanner)
 from agents.conversational.output_parser import ConvoOutputParser
+from agents.conversational.prompt import REACT_PROMPT
 from agents.conversational.streaming_aiter import AsyncCallbackHandler
 from agents.handle_agent_errors import handle_agent_error
 from config import Config
-from memory.zep.zep_memory import ZepMemory
+from memory.get_memory import get_memory
 from postgres import PostgresChatMessageHistory
 from services.pubsub import ChatPubSubService
 from services.run_log import RunLogsManager
 from services.voice import speech_to_text, text_to_speech
 from typings.agent import AgentWithConfigsOutput
 from typings.config import AccountSettings, AccountVoiceSettings
+from utils.cache import TTLCache, make_fingerprint
 from utils.model import get_llm
 from utils.system_message import SystemMessageBuilder
 
+# Compiled ReAct agents (LLM client + prompt bound to the tool descriptions), with
+# their LLM client which the memory also uses
+react_agent_cache: TTLCache[Tuple[BaseLanguageModel, Runnable]] = TTLCache(
+    maxsize=Config.REACT_AGENT_CACHE_SIZE, ttl=Config.REACT_AGENT_CACHE_TTL
+)
+
+
+def get_react_agent_cache_key(
+    settings: AccountSettings,
+    agent_with_configs: AgentWithConfigsOutput,
+    tools: List[BaseTool],
+):
+    """
+    Agent id plus a fingerprint of everything the compiled agent is built from, so
+    editing the agent, its tools or the account's API keys yields a new entry.
+    """
+    return (
+        str(agent_with_configs.agent.id),
+        make_fingerprint(
+            agent_with_configs.json(),
+            settings.json(),
+            [(tool.name, tool.description) for tool in tools],
+        ),
+    )
+
+
+def build_react_agent(
+    cache_key,
+    settings: AccountSettings,
+    agent_with_configs: AgentWithConfigsOutput,
+    tools: List[BaseTool],
+) -> Tuple[BaseLanguageModel, Runnable]:
+    llm = get_llm(
+        settings,
+        agent_with_configs,
+    )
+
+    llm.streaming = True
+
+    agent = create_react_agent(llm, tools, prompt=REACT_PROMPT)
+    react_agent_cache.set(cache_key, (llm, agent))
+
+    return llm, agent
+
+
+def save_error_context(memory, prompt: str, res: str):
+    """
+    Saves the failed turn to memory. Loading the chat history can query Postgres,
+    summarize with the LLM or call Zep, so run it in the threadpool.
+    """
+    chat_history = memory.load_memory_variables({})["chat_history"]
+    memory.save_context(
+        {"input": prompt, "chat_history": chat_history}, {"output": res}
+    )
+
 
 class ConversationalAgent(BaseAgent):
     async def run(
@@ -35,12 +98,10 @@ class ConversationalAgent(BaseAgent):
         run_logs_manager: RunLogsManager,
         pre_retrieved_context: str,
     ):
-        memory = ZepMemory(
+        memory = get_memory(
             session_id=str(self.session_id),
-            url=Config.ZEP_API_URL,
-            api_key=Config.ZEP_API_KEY,
-            memory_key="chat_history",
-            return_messages=True,
+            max_tokens=Config.ZEP_HISTORY_MAX_TOKENS,
+            exclude_message_id=human_message_id,
         )
 
         memory.human_name = self.sender_name
@@ -55,16 +116,12 @@ class ConversationalAgent(BaseAgent):
         try:
             if voice_url:
                 configs = agent_with_configs.configs
-                prompt = speech_to_text(voice_url, configs, voice_settings)
-
-            llm = get_llm(
-                settings,
-                agent_with_configs,
-            )
+                prompt = await run_in_threadpool(
+                    speech_to_text, voice_url, configs, voice_settings
+                )
 
             streaming_handler = AsyncCallbackHandler()
 
-            llm.streaming = True
             # llm.callbacks = [
             #     run_logs_manager.get_agent_callback_handler(),
             #     streaming_handler,
@@ -84,14 +141,17 @@ class ConversationalAgent(BaseAgent):
             #     callbacks=[run_logs_manager.get_agent_callback_handler()],
             # )
 
-            agentPrompt = hub.pull("hwchase17/react")
-
-            agent = create_react_agent(llm, tools, prompt=agentPrompt)
+            cache_key = get_react_agent_cache_key(settings, agent_with_configs, tools)
+            # get_llm looks up fine-tuned models in the DB, build off the event loop
+            llm, agent = react_agent_cache.get(cache_key) or await run_in_threadpool(
+                build_react_agent, cache_key, settings, agent_with_configs, tools
+            )
+            memory.set_llm(llm)
 
+            # Tools carry this run's log callbacks, so only this thin wrapper is per run
             agent_executor = AgentExecutor(agent=agent, tools=tools, verbose=True)
 
-            chunks = []
-            final_answer_detected = False
+            final_answer_scanner = MarkerScanner(FINAL_ANSWER_MARKER)
 
             async for event in agent_executor.astream_events(
                 {"input": prompt}, version="v1"
@@ -100,43 +160,20 @@ class ConversationalAgent(BaseAgent):
 
                 if kind == "on_chat_model_stream":
                     content = event["data"]["chunk"].content
-                    if content:
-                        chunks.append(content)
-                        # Check if the last three elements in chunks, when stripped, are "Final", "Answer", and ":"
-                        if (
-                            len(chunks) >= 3
-                            and chunks[-3].strip() == "Final"
-                            and chunks[-2].strip() == "Answer"
-                            and chunks[-1].strip() == ":"
-                        ):
-                            final_answer_detected = True
-                            continue
-
-                        if final_answer_detected:
-                            yield content
-
-            full_response = "".join(chunks)
-            final_answer_index = full_response.find("Final Answer:")
-            if final_answer_index != -1:
-                # Add the length of the phrase "Final Answer:" and any subsequent whitespace or characters you want to skip
-                start_index = final_answer_index + len("Final Answer:")
-                # Optionally strip leading whitespace
-                res = full_response[start_index:].lstrip()
+                    answer = final_answer_scanner.feed(content)
+
+                    if answer:
+                        yield answer
+
+            if final_answer_scanner.detected:
+                res = final_answer_scanner.text
             else:
                 res = "Final Answer not found in response."
 
         except Exception as err:
             res = handle_agent_error(err)
 
-            memory.save_context(
-                {
-                    "input": prompt,
-                    "chat_history": memory.load_memory_variables({})["chat_history"],
-                },
-                {
-                    "output": res,
-                },
-            )
+            await run_in_threadpool(save_error_context, memory, prompt, res)
 
             yield res
 
@@ -144,18 +181,20 @@ class ConversationalAgent(BaseAgent):
             configs = agent_with_configs.configs
             voice_url = None
             if "Voice" in configs.response_mode:
-                voice_url = text_to_speech(res, configs, voice_settings)
+                voice_url = await run_in_threadpool(
+                    text_to_speech, res, configs, voice_settings
+                )
                 pass
         except Exception as err:
             res = f"{res}\n\n{handle_agent_error(err)}"
 
             yield res
 
-        ai_message = history.create_ai_message(
+        ai_message = await history.acreate_ai_message(
             res,
             human_message_id,
             agent_with_configs.agent.id,
             voice_url,
         )
 
-        chat_pubsub_service.send_chat_message(chat_message=ai_message)
+        await chat_pubsub_service.asend_chat_message(chat_message=ai_message)
@@ -0,0 +1,55 @@
+from typing import List
+
+FINAL_ANSWER_MARKER = "Final Answer:"
+
+
+class MarkerScanner:
+    """
+    Finds a marker in a token stream regardless of how the model splits it into
+    chunks, and returns whatever follows it as soon as the marker completes.
+
+    Only the last len(marker) - 1 characters are kept between chunks, so the whole
+    stream is scanned in O(n).
+    """
+
+    def __init__(
+        self, marker: str = FINAL_ANSWER_MARKER, strip_leading_whitespace: bool = True
+    ):
+        self.marker = marker
+        self.strip_leading_whitespace = strip_leading_whitespace
+        self.detected = False
+        self._tail = ""
+        self._parts: List[str] = []
+
+    def feed(self, chunk: str) -> str:
+        """Consume a chunk and return the part of it which comes after the marker"""
+        if not chunk:
+            return ""
+
+        if self.detected:
+            text = chunk
+        else:
+            window = self._tail + chunk
+            index = window.find(self.marker)
+
+            if index == -1:
+                self._tail = window[-(len(self.marker) - 1) :] if self.marker else ""
+                return ""
+
+            self.detected = True
+            self._tail = ""
+            text = window[index + len(self.marker) :]
+
+        if self.strip_leading_whitespace and not self._parts:
+            text = text.lstrip()
+
+            if not text:
+                return ""
+
+        self._parts.append(text)
+        return text
+
+    @property
+    def text(self) -> str:
+        """Everything received after the marker so far"""
+        return "".join(self._parts)
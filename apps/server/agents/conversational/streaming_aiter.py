@@ -3,29 +3,43 @@ from typing import Any
 from langchain.callbacks.streaming_aiter import AsyncIteratorCallbackHandler
 from langchain.schema import LLMResult
 
+from agents.conversational.marker_scanner import MarkerScanner
 
-class AsyncCallbackHandler(AsyncIteratorCallbackHandler):
-    content: str = ""
-    final_answer: bool = False
 
+class AsyncCallbackHandler(AsyncIteratorCallbackHandler):
     def __init__(self) -> None:
         super().__init__()
+        self.reset()
+
+    @property
+    def final_answer(self) -> bool:
+        return self.final_answer_scanner.detected
+
+    def reset(self) -> None:
+        self.final_answer_scanner = MarkerScanner("Final Answer")
+        self.action_input_scanner = MarkerScanner(
+            '"action_input": "', strip_leading_whitespace=False
+        )
 
     async def on_llm_new_token(self, token: str, **kwargs: Any) -> None:
-        self.content += token
-        # if we passed the final answer, we put tokens in queue
-        if self.final_answer:
-            if '"action_input": "' in self.content:
-                if token not in [' "', '" ', "", "}", "```", "} ", "}\n", '"\n']:
-                    self.queue.put_nowait(token)
-        elif "Final Answer" in self.content:
-            self.final_answer = True
-            self.content = ""
+        # once we passed the final answer, we put its action input tokens in queue
+        action_input = self.action_input_scanner.feed(
+            self.final_answer_scanner.feed(token)
+        )
+
+        if action_input and action_input not in [
+            ' "',
+            '" ',
+            "}",
+            "```",
+            "} ",
+            "}\n",
+            '"\n',
+        ]:
+            self.queue.put_nowait(action_input)
 
     async def on_llm_end(self, response: LLMResult, **kwargs: Any) -> None:
         if self.final_answer:
-            self.content = ""
-            self.final_answer = False
             self.done.set()
-        else:
-            self.content = ""
+
+        self.reset()
@@ -14,7 +14,7 @@ from langchain.prompts import (
     MessagesPlaceholder,
 )
 from langchain.schema.messages import SystemMessage
-from memory.zep.zep_memory import ZepMemory
+from memory.buffer import ConversationBufferMemory
 
 
 class PlanningOutputParser(PlanOutputParser):
@@ -42,14 +42,14 @@ INSTRUCTIONS = (
 
 
 def initialize_chat_planner(
-    llm: BaseLanguageModel, system_prompt: str, memory: ZepMemory
+    llm: BaseLanguageModel, system_prompt: str, memory: ConversationBufferMemory
 ) -> LLMPlanner:
     """
     Load a chat planner.
     Args:
         llm: Language model.
         system_prompt: System prompt.
-        memory: Zep memory instance.
+        memory: Conversation memory instance.
 
     Returns:
         LLMPlanner
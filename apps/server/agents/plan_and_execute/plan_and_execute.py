@@ -10,7 +10,7 @@ from agents.plan_and_execute.chat_planner import initialize_chat_planner
 from agents.plan_and_execute.plan_and_execute_chain import PlanAndExecuteChain
 from config import Config
 from exceptions import PlannerEmptyTasksException
-from memory.zep.zep_memory import ZepMemory
+from memory.get_memory import get_memory
 from models.agent import AgentModel
 from models.datasource import DatasourceModel
 from models.team import TeamAgentModel, TeamModel
@@ -85,12 +85,10 @@ class PlanAndExecute(BaseAgent):
             updated_message = history.update_thoughts(ai_message_id, thoughts)
             chat_pubsub_service.send_chat_message(chat_message=updated_message)
 
-        memory = ZepMemory(
+        memory = get_memory(
             session_id=self.session_id,
-            url=Config.ZEP_API_URL,
-            api_key=Config.ZEP_API_KEY,
-            memory_key="chat_history",
-            return_messages=True,
+            max_tokens=Config.ZEP_HISTORY_MAX_TOKENS,
+            exclude_message_id=human_message_id,
         )
 
         memory.human_name = self.user.name
@@ -103,6 +101,7 @@ class PlanAndExecute(BaseAgent):
                 settings,
                 planner_agent_with_configs,
             )
+            memory.set_llm(planner_llm)
 
             planner_system_message = SystemMessageBuilder(
                 planner_agent_with_configs
@@ -0,0 +1,168 @@
+"""
+Time to first token of concurrent chat streams.
+
+Every stream stores the human prompt, then waits for a fake model which sends its
+first token after --model-latency seconds. The prompt is stored either through
+acreate_human_message (async) or the blocking create_message path the streaming
+endpoint used before (sync). With the sync path every database round trip of one
+stream stalls all the others, so p99 grows with the round trips of every stream,
+with the async path only the CPU time of the inserts adds up. --db-latency adds a
+network round trip to every statement and commit, which a local database doesn't
+have. SQLite serializes writers, run it against Postgres for meaningful numbers.
+
+    poetry run python -m benchmarks.chat_ttft --url postgresql+psycopg://...
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+import uuid
+from typing import Callable, List
+
+# Config builds the database URIs at import time
+for key, value in {
+    "DB_USER": "bench",
+    "DB_PASS": "bench",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "bench",
+}.items():
+    os.environ.setdefault(key, value)
+
+from langchain_core.messages import HumanMessage  # noqa: E402
+from sqlalchemy import create_engine, event  # noqa: E402
+from sqlalchemy.dialects.postgresql import JSONB  # noqa: E402
+from sqlalchemy.ext.asyncio import (async_sessionmaker,  # noqa: E402
+                                    create_async_engine)
+from sqlalchemy.ext.compiler import compiles  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+from sqlalchemy.util import await_only  # noqa: E402
+
+import postgres  # noqa: E402
+from models import *  # noqa: E402, F401, F403
+from models.account import AccountModel  # noqa: E402
+from models.base_model import BaseModel  # noqa: E402
+from postgres import PostgresChatMessageHistory  # noqa: E402
+
+CONCURRENCY = [1, 10, 50, 100]
+
+
+@compiles(JSONB, "sqlite")
+def compile_jsonb_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+def percentile(values: List[float], percent: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * percent / 100))]
+
+
+async def stream(store_prompt: Callable, model_latency: float) -> float:
+    started = time.perf_counter()
+    await store_prompt()
+    # The model sends its first token
+    await asyncio.sleep(model_latency)
+    return time.perf_counter() - started
+
+
+def add_db_latency(sync_engine, async_engine, latency: float):
+    def sleep(*args, **kwargs):
+        time.sleep(latency)
+
+    def async_sleep(*args, **kwargs):
+        # Called in the greenlet of the async engine, waits without blocking
+        await_only(asyncio.sleep(latency))
+
+    for engine, wait in ((sync_engine, sleep), (async_engine.sync_engine, async_sleep)):
+        event.listen(engine, "before_cursor_execute", wait)
+        event.listen(engine, "commit", wait)
+
+
+async def run(url: str, async_url: str, model_latency: float, db_latency: float):
+    sync_engine = create_engine(url)
+    sync_session = sessionmaker(sync_engine)
+    account_id = uuid.uuid4()
+
+    with sync_session() as session:
+        session.add(AccountModel(id=account_id, name="Bench"))
+        session.commit()
+
+    async_engine = create_async_engine(async_url)
+    add_db_latency(sync_engine, async_engine, db_latency)
+    postgres.create_async_session = async_sessionmaker(
+        async_engine, expire_on_commit=False
+    )
+
+    def history(index: int) -> PostgresChatMessageHistory:
+        return PostgresChatMessageHistory(
+            sender_account_id=account_id,
+            sender_user_id=None,
+            session_id=f"bench-{index}",
+            sender_name="Bench",
+        )
+
+    async def store_sync(index: int):
+        # Previous path, create_message through a blocking session
+        chat_message = history(index)._build_chat_message(HumanMessage(content="Hi"))
+
+        with sync_session() as session:
+            session.add(chat_message)
+            session.commit()
+            session.refresh(chat_message)
+            history(index)._serialize_chat_message(chat_message, chat_message.parent)
+
+    async def store_async(index: int):
+        await history(index).acreate_human_message("Hi")
+
+    print(f"{'mode':<6} {'streams':>8} {'p50 ms':>8} {'p99 ms':>8}")
+
+    for mode, store in (("sync", store_sync), ("async", store_async)):
+        # The first round opens the connections, it isn't reported
+        for warm_up, concurrency in [(True, max(CONCURRENCY))] + [
+            (False, concurrency) for concurrency in CONCURRENCY
+        ]:
+            ttfts = await asyncio.gather(
+                *[
+                    stream(lambda index=index: store(index), model_latency)
+                    for index in range(concurrency)
+                ]
+            )
+
+            if warm_up:
+                continue
+
+            print(
+                f"{mode:<6} {concurrency:>8} "
+                f"{statistics.median(ttfts) * 1000:>8.1f} "
+                f"{percentile(ttfts, 99) * 1000:>8.1f}"
+            )
+
+    await async_engine.dispose()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="Database URL, a temporary SQLite by default")
+    parser.add_argument("--model-latency", type=float, default=0.05)
+    parser.add_argument("--db-latency", type=float, default=0.002)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        url = args.url or f"sqlite:///{directory}/bench.db"
+        engine = create_engine(url)
+        BaseModel.metadata.create_all(engine)
+        engine.dispose()
+
+        if url.startswith("sqlite"):
+            async_url = url.replace("sqlite", "sqlite+aiosqlite", 1)
+        else:
+            async_url = url
+
+        asyncio.run(run(url, async_url, args.model_latency, args.db_latency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+"""
+Time of one round of decentralized speaker bids.
+
+Every fake agent answers its bid after a random latency between --min-latency and
+--max-latency seconds, like a model call. A round is timed asking the agents one
+after another, as the speaker did before, and with collect_bids. The stuck round
+adds an agent which never answers, collect_bids counts its bid as 0 after
+--timeout seconds instead of waiting for it.
+
+    poetry run python -m benchmarks.collect_bids --agents 8 --timeout 3
+"""
+
+import argparse
+import random
+import threading
+import time
+from typing import Callable, List
+
+from agents.agent_simulations.decentralized.bidding import collect_bids
+
+STUCK = -1
+
+
+def make_agents(count: int, min_latency: float, max_latency: float, seed: int):
+    rng = random.Random(seed)
+    return [(bid, rng.uniform(min_latency, max_latency)) for bid in range(1, count + 1)]
+
+
+def time_round(run_round: Callable[[], List[int]]):
+    start = time.monotonic()
+    bids = run_round()
+    return time.monotonic() - start, bids
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--agents", type=int, default=8)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--timeout", type=float, default=3)
+    parser.add_argument("--min-latency", type=float, default=0.5)
+    parser.add_argument("--max-latency", type=float, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    release = threading.Event()
+
+    def ask_for_bid(agent) -> int:
+        bid, latency = agent
+        release.wait(None if latency == STUCK else latency)
+        return bid
+
+    agents = make_agents(args.agents, args.min_latency, args.max_latency, args.seed)
+    rounds = {
+        "sequential": lambda: [ask_for_bid(agent) for agent in agents],
+        "collect_bids": lambda: collect_bids(
+            agents, ask_for_bid, args.concurrency, args.timeout
+        ),
+        "collect_bids, one stuck agent": lambda: collect_bids(
+            agents + [(args.agents + 1, STUCK)],
+            ask_for_bid,
+            args.concurrency,
+            args.timeout,
+        ),
+    }
+
+    print(
+        f"{args.agents} agents, {args.min_latency}-{args.max_latency}s per bid, "
+        f"concurrency {args.concurrency}, timeout {args.timeout}s\n"
+    )
+
+    try:
+        for name, run_round in rounds.items():
+            elapsed, bids = time_round(run_round)
+            print(f"{name:<30} {elapsed:>6.2f}s  bids {bids}")
+    finally:
+        # Lets the stuck agent's thread finish
+        release.set()
+
+
+if __name__ == "__main__":
+    main()
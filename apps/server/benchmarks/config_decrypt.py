@@ -0,0 +1,94 @@
+"""
+Decryption cost of config values.
+
+A batch of --rows configs, --secret-share of them encrypted, is decrypted the way
+get_configs used to and the way it does now. Before, every value was trial
+decrypted with a new Fernet instance to find out whether it was encrypted, and
+encrypted ones were then decrypted a second time. Now the stored is_encrypted
+marker decides, or the token prefix for rows without a marker, and every value is
+decrypted at most once.
+
+    poetry run python -m benchmarks.config_decrypt --rows 500
+"""
+
+import argparse
+import random
+import statistics
+import time
+from typing import Callable, List, Optional, Tuple
+
+from cryptography.fernet import Fernet, InvalidSignature, InvalidToken
+
+from utils.encyption import decrypt_data, decrypt_value, encrypt_data, key
+
+Row = Tuple[str, Optional[bool]]
+
+
+def trial_decrypt_is_encrypted(value) -> bool:
+    """is_encrypted as it was before the marker, kept here for comparison"""
+    try:
+        Fernet(key).decrypt(value)
+        return True
+    except (InvalidToken, InvalidSignature, ValueError, TypeError):
+        return False
+
+
+def decrypt_with_trial(rows: List[Row]) -> List[str]:
+    return [
+        decrypt_data(value) if trial_decrypt_is_encrypted(value) else value
+        for value, _ in rows
+    ]
+
+
+def decrypt_with_marker(rows: List[Row]) -> List[str]:
+    return [decrypt_value(value, encrypted) for value, encrypted in rows]
+
+
+def make_rows(count: int, secret_share: float, marked: bool, seed: int) -> List[Row]:
+    rng = random.Random(seed)
+    rows = []
+
+    for index in range(count):
+        value = f"sk-{index:04d}-{rng.getrandbits(128):032x}"
+        encrypted = rng.random() < secret_share
+        rows.append(
+            (encrypt_data(value) if encrypted else value, encrypted if marked else None)
+        )
+
+    return rows
+
+
+def time_batch(decrypt: Callable[[List[Row]], List[str]], rows: List[Row], runs: int):
+    """Median time per row in microseconds"""
+    timings = []
+
+    for _ in range(runs):
+        start = time.perf_counter()
+        decrypt(rows)
+        timings.append((time.perf_counter() - start) / len(rows) * 1e6)
+
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--rows", type=int, default=500)
+    parser.add_argument("--secret-share", type=float, default=0.5)
+    parser.add_argument("--runs", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    print(f"{args.rows} configs, {args.secret_share:.0%} encrypted\n")
+
+    for name, decrypt, marked in [
+        ("trial decrypt, then decrypt", decrypt_with_trial, True),
+        ("decrypt_value, marker", decrypt_with_marker, True),
+        ("decrypt_value, prefix only", decrypt_with_marker, False),
+    ]:
+        rows = make_rows(args.rows, args.secret_share, marked, args.seed)
+        assert decrypt(rows) == decrypt_with_trial(rows)
+        print(f"{name:<30} {time_batch(decrypt, rows, args.runs):>7.2f}us per row")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+"""
+Recall and latency of the local vector index's IVF-PQ search.
+
+Vectors are drawn around --clusters random centers, like the topics of embedded
+documents, and queries come from the same distribution. Recall@k is the share of
+the exact top k which the approximate search returns, for every combination of
+re-rank factor and probed lists, next to the latency of an exact search. With
+--clusters 1 the vectors have no structure, no IVF index does well on such data
+and exact search is faster anyway.
+
+    poetry run python -m benchmarks.vector_index_recall --size 30000 --dim 64
+"""
+
+import argparse
+import statistics
+import time
+from typing import List
+
+import numpy as np
+
+from datasources.file.vector_index import (MIN_PROBES, PROBES_DIVISOR,
+                                           RERANK_FACTOR, VectorIndex,
+                                           normalize)
+
+
+def make_vectors(
+    size: int, dim: int, clusters: int, spread: float, seed: int
+) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((clusters, dim))
+    vectors = centers[rng.integers(clusters, size=size)]
+    vectors += spread * rng.standard_normal((size, dim))
+    return normalize(vectors.astype(np.float32))
+
+
+def measure(index: VectorIndex, queries: np.ndarray, exact: List[set], k: int):
+    """Mean recall and p50 latency in milliseconds"""
+    recalls, latencies = [], []
+
+    for query, expected in zip(queries, exact):
+        start = time.perf_counter()
+        ids, _ = index.search(query, k)
+        latencies.append((time.perf_counter() - start) * 1000)
+        recalls.append(len(expected & set(ids)) / k)
+
+    return statistics.mean(recalls), statistics.median(latencies)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--size", type=int, default=30000)
+    parser.add_argument("--dim", type=int, default=64)
+    parser.add_argument("--clusters", type=int, default=100)
+    parser.add_argument("--spread", type=float, default=0.5)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    vectors = make_vectors(
+        args.size + args.queries, args.dim, args.clusters, args.spread, args.seed
+    )
+    vectors, queries = vectors[: args.size], vectors[args.size :]
+    ids = [str(position) for position in range(args.size)]
+
+    start = time.perf_counter()
+    index = VectorIndex(ivf_threshold=1, seed=args.seed)
+    index.add(ids, vectors)
+    print(
+        f"{args.size} x {args.dim} vectors, {index.ivf.lists} lists, "
+        f"built in {time.perf_counter() - start:.1f}s\n"
+    )
+
+    exact, exact_latencies = [], []
+
+    for query in queries:
+        start = time.perf_counter()
+        exact_ids, _ = index.search(query, args.k, exact=True)
+        exact_latencies.append((time.perf_counter() - start) * 1000)
+        exact.append(set(exact_ids))
+
+    default_probes = max(MIN_PROBES, index.ivf.lists // PROBES_DIVISOR)
+    print(f"exact search: p50 {statistics.median(exact_latencies):.2f}ms\n")
+    print("rerank  probes  recall@k   p50")
+
+    for rerank_factor in sorted({10, 20, RERANK_FACTOR, 80}):
+        for probes in sorted({default_probes, index.ivf.lists // 4}):
+            index.rerank_factor, index.probes = rerank_factor, probes
+            recall, latency = measure(index, queries, exact, args.k)
+            default = (
+                " (default)"
+                if (rerank_factor, probes) == (RERANK_FACTOR, default_probes)
+                else ""
+            )
+            print(
+                f"{rerank_factor:>6}  {probes:>6}  {recall:>8.3f}  "
+                f"{latency:>5.2f}ms{default}"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -18,12 +18,40 @@ class Config:
     DB_USER = os.environ.get("DB_USER")
     DB_PASS = os.environ.get("DB_PASS")
     DB_URI = f"postgresql+psycopg2://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    DB_ASYNC_URI = (
+        f"postgresql+psycopg://{DB_USER}:{DB_PASS}@{DB_HOST}:{DB_PORT}/{DB_NAME}"
+    )
 
     AZURE_PUBSUB_CONNECTION_STRING = os.environ.get("AZURE_PUBSUB_CONNECTION_STRING")
     AZURE_PUBSUB_HUB_NAME = os.environ.get("AZURE_PUBSUB_HUB_NAME")
+    # azure, redis or memory (in-process, for local runs and load tests)
+    PUBSUB_BACKEND = os.environ.get("PUBSUB_BACKEND", "azure")
+    # Public url of the /pubsub/client websocket, used by redis and memory backends
+    PUBSUB_WEBSOCKET_URL = os.environ.get(
+        "PUBSUB_WEBSOCKET_URL", "ws://localhost:4000/pubsub/client"
+    )
+    REDIS_URL = os.environ.get("REDIS_URL")
+    PUBSUB_DISPATCH_WORKERS = int(os.environ.get("PUBSUB_DISPATCH_WORKERS", 4))
+    PUBSUB_QUEUE_SIZE = int(os.environ.get("PUBSUB_QUEUE_SIZE", 10000))
+
+    # Conversation memory backend: zep or postgres (reads the chat_message table)
+    MEMORY_BACKEND = os.environ.get("MEMORY_BACKEND", "zep")
+    # Recent messages the postgres memory keeps as they are, older ones are summarized
+    MEMORY_MESSAGE_WINDOW = int(os.environ.get("MEMORY_MESSAGE_WINDOW", 12))
+
+    # Agents bidding to speak at once in decentralized teams, and seconds a bid may
+    # take before it counts as the lowest bid
+    BID_MAX_CONCURRENCY = int(os.environ.get("BID_MAX_CONCURRENCY", 8))
+    BID_TIMEOUT = int(os.environ.get("BID_TIMEOUT", 30))
 
     ZEP_API_URL = os.environ.get("ZEP_API_URL")
     ZEP_API_KEY = os.environ.get("ZEP_API_KEY") or None
+    # Token budget of the conversation history (summary and recent messages) in prompts
+    ZEP_HISTORY_MAX_TOKENS = int(os.environ.get("ZEP_HISTORY_MAX_TOKENS", 2000))
+    # Messages of team runs waiting to be written to Zep before saving blocks
+    ZEP_WRITE_QUEUE_SIZE = int(os.environ.get("ZEP_WRITE_QUEUE_SIZE", 1000))
+    ZEP_WRITE_BATCH_SIZE = int(os.environ.get("ZEP_WRITE_BATCH_SIZE", 100))
+    ZEP_WRITE_FLUSH_TIMEOUT = int(os.environ.get("ZEP_WRITE_FLUSH_TIMEOUT", 30))
 
     JWT_EXPIRY = os.environ.get("JWT_EXPIRY")
     JWT_SECRET_KEY = os.environ.get("JWT_SECRET_KEY")
@@ -44,3 +72,29 @@ class Config:
     TEST_USER_PASSWORD = os.environ.get("TEST_USER_PASSWORD")
 
     FRONTEND_URL = os.environ.get("FRONTEND_URL")
+
+    ACCOUNT_SETTINGS_CACHE_TTL = int(os.environ.get("ACCOUNT_SETTINGS_CACHE_TTL", 300))
+    ACCOUNT_SETTINGS_CACHE_SIZE = int(
+        os.environ.get("ACCOUNT_SETTINGS_CACHE_SIZE", 10000)
+    )
+    # Compiled ReAct agents kept per process, and seconds before they are rebuilt
+    REACT_AGENT_CACHE_SIZE = int(os.environ.get("REACT_AGENT_CACHE_SIZE", 500))
+    REACT_AGENT_CACHE_TTL = int(os.environ.get("REACT_AGENT_CACHE_TTL", 600))
+    # Memory budget for file datasource indexes kept loaded between queries
+    DATASOURCE_INDEX_CACHE_MB = int(os.environ.get("DATASOURCE_INDEX_CACHE_MB", 512))
+    # Seconds query embeddings and retrieved chunks of file datasources are reused
+    DATASOURCE_QUERY_CACHE_TTL = int(os.environ.get("DATASOURCE_QUERY_CACHE_TTL", 300))
+    # Seconds a reflected SQL datasource schema and its table index stay cached
+    SQL_SCHEMA_CACHE_TTL = int(os.environ.get("SQL_SCHEMA_CACHE_TTL", 3600))
+    # Pooled engines kept open for customer SQL datasources, per process
+    SQL_DATASOURCE_MAX_ENGINES = int(os.environ.get("SQL_DATASOURCE_MAX_ENGINES", 50))
+    SQL_DATASOURCE_POOL_SIZE = int(os.environ.get("SQL_DATASOURCE_POOL_SIZE", 5))
+    SQL_DATASOURCE_ENGINE_IDLE_TIMEOUT = int(
+        os.environ.get("SQL_DATASOURCE_ENGINE_IDLE_TIMEOUT", 600)
+    )
+    # Seconds table row counts of a SQL datasource are reused before being recounted
+    SQL_TABLE_COUNTS_CACHE_TTL = int(os.environ.get("SQL_TABLE_COUNTS_CACHE_TTL", 300))
+    # Chunk embeddings kept in the embedding_cache table before LRU eviction
+    EMBEDDING_CACHE_MAX_ENTRIES = int(
+        os.environ.get("EMBEDDING_CACHE_MAX_ENTRIES", 1000000)
+    )
@@ -14,7 +14,7 @@ from models.config import ConfigModel
 from models.team import TeamModel
 from postgres import PostgresChatMessageHistory
 from services.chat import create_client_message, create_user_message
-from services.pubsub import AzurePubSubService
+from services.pubsub import get_pubsub_service
 from typings.auth import UserAccount
 from typings.chat import (ChatInput, ChatListOutput, ChatMessageInput,
                           ChatMessageOutput, ChatOutput, ChatStatus,
@@ -253,7 +253,7 @@ def negotiate(id: str):
     """
     # todo need validation
 
-    token = AzurePubSubService().get_client_access_token(user_id=id)
+    token = get_pubsub_service().get_client_access_token(user_id=id)
     return NegotiateOutput(url=token["url"])
 
 
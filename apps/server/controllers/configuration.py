@@ -1,4 +1,6 @@
 import json
+import logging
+from datetime import datetime
 from typing import List
 from uuid import UUID
 
@@ -11,6 +13,7 @@ from datasources.file.file_retriever import FileDatasourceRetriever
 from exceptions import ConfigNotFoundException
 from models.config import ConfigModel
 from models.datasource import DatasourceModel
+from services.sql_engines import sql_engine_registry
 from typings.account import AccountOutput
 from typings.auth import UserAccount
 from typings.config import ConfigInput, ConfigOutput, ConfigQueryParams
@@ -21,6 +24,8 @@ from utils.configuration import (convert_configs_to_config_list,
 
 router = APIRouter()
 
+logger = logging.getLogger(__name__)
+
 
 # TODO: refactor update method in models to be flexible.
 def index_documents(value: str, datasource_id: UUID, account: AccountOutput):
@@ -55,10 +60,13 @@ def index_documents(value: str, datasource_id: UUID, account: AccountOutput):
             chunk_size,
             similarity_top_k,
         )
-        retriever.index_documents(file_urls)
+        stats = retriever.index_documents(file_urls)
+        logger.info("Indexed datasource %s: %s", datasource_id, stats.to_dict())
 
         datasource.status = DatasourceStatus.READY.value
         datasource.error = None
+        # Bumps the index version, so other processes drop their loaded copy
+        datasource.updated_on = datetime.utcnow()
     except Exception as err:
         print(err)
         sentry_sdk.capture_exception(err)
@@ -126,6 +134,10 @@ def update_config(
             db, id=id, config=config, user=auth.user, account=auth.account
         )
 
+        # Credentials of a SQL datasource may have changed
+        if config.datasource_id:
+            sql_engine_registry.dispose(config.datasource_id)
+
         # Save index to storage
         if config.datasource_id and config.key_type == DatasourceEnvKeyType.FILES.value:
             background_tasks.add_task(
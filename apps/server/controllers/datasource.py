@@ -1,20 +1,26 @@
-from concurrent.futures import ThreadPoolExecutor
+import json
 from typing import List, Optional
 
 from fastapi import APIRouter, Depends, HTTPException
+from fastapi.responses import StreamingResponse
 from fastapi_sqlalchemy import db
-from sqlalchemy import MetaData, create_engine, text
 
+from config import Config
 from datasources.base import DatasourceType
 from datasources.get_datasources import get_all_datasources
 from exceptions import DatasourceNotFoundException
 from models.config import ConfigModel
 from models.datasource import DatasourceModel
+from services.sql_engines import sql_engine_registry
+from services.sql_tables import (get_approximate_table_counts,
+                                 iter_exact_table_counts,
+                                 sql_table_counts_cache)
 from typings.auth import UserAccount
 from typings.config import ConfigQueryParams
 from typings.datasource import (DatasourceInput, DatasourceOutput,
                                 DatasourceSQLTableOutput)
 from utils.auth import authenticate
+from utils.cache import make_fingerprint
 from utils.datasource import (convert_datasources_to_datasource_list,
                               convert_model_to_response)
 
@@ -116,10 +122,17 @@ def get_sql_tables(
     password: Optional[str] = None,
     name: Optional[str] = None,
     id: Optional[str] = None,
+    exact: bool = False,
+    refresh: bool = False,
     auth: UserAccount = Depends(authenticate),
 ):
     """
     Get all SQL database table names and counts for a datasource by its ID or by provided credentials.
+
+    Counts are estimates from the database statistics unless exact is set, in which
+    case every table is counted and the results are streamed as each count finishes.
+    A table which can't be counted is returned with a null count and its error.
+    Counts are cached for SQL_TABLE_COUNTS_CACHE_TTL seconds, refresh recounts them.
     """
 
     if id:
@@ -164,26 +177,40 @@ def get_sql_tables(
 
     uri = f"{prefix}://{user}:{password}@{host}:{port}/{name}"
 
-    engine = create_engine(uri)
-    meta = MetaData()
-    meta.reflect(bind=engine)
+    engine = sql_engine_registry.get_engine(id, uri)
+    cache_key = (str(id) if id else None, make_fingerprint(uri), exact)
+
+    if not refresh:
+        tables = sql_table_counts_cache.get(cache_key)
+
+        if tables is not None:
+            return tables
+
+    if not exact:
+        tables = get_approximate_table_counts(engine)
+        sql_table_counts_cache.set(cache_key, tables)
+        return tables
+
+    table_counts = iter_exact_table_counts(
+        engine, max_workers=Config.SQL_DATASOURCE_POOL_SIZE
+    )
+
+    def stream_table_counts():
+        # A JSON array written one table at a time, in the order counts finish
+        tables = []
+        yield "["
 
-    tables = meta.tables.keys()
-    result = []
+        for table in table_counts:
+            yield ("," if tables else "") + json.dumps(table)
+            tables.append(table)
 
-    def get_table_count(table):
-        with engine.connect() as conn:
-            count = conn.execute(text(f"SELECT COUNT(*) FROM {table}")).scalar()
-            return {
-                "id": table,
-                "name": table,
-                "count": count,
-            }
+        yield "]"
 
-    with ThreadPoolExecutor() as executor:
-        result = list(executor.map(get_table_count, tables))
+        # Failed counts are retried by the next request
+        if all(table["count"] is not None for table in tables):
+            sql_table_counts_cache.set(cache_key, tables)
 
-    return result
+    return StreamingResponse(stream_table_counts(), media_type="application/json")
 
 
 @router.get("/{id}", response_model=DatasourceOutput)
@@ -228,6 +255,7 @@ def delete_datasource(datasource_id: str, auth: UserAccount = Depends(authentica
         DatasourceModel.delete_by_id(
             db, datasource_id=datasource_id, account=auth.account
         )
+        sql_engine_registry.dispose(datasource_id)
         return {"message": "Datasource deleted successfully"}
 
     except DatasourceNotFoundException:
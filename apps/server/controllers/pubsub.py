@@ -0,0 +1,73 @@
+import asyncio
+import json
+
+from fastapi import APIRouter, WebSocket, WebSocketDisconnect
+
+from services.pubsub import get_pubsub_service, verify_client_access_token
+
+router = APIRouter()
+
+
+@router.websocket("/client")
+async def pubsub_client(websocket: WebSocket, access_token: str):
+    """
+    Websocket for the self-hosted PubSub backends. Speaks the subset of the
+    json.webpubsub.azure.v1 protocol the UI uses, so the client code stays the same.
+    """
+    backend = get_pubsub_service()
+    user_id = verify_client_access_token(access_token)
+
+    if not backend.supports_websocket or not user_id:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept(subprotocol="json.webpubsub.azure.v1")
+    await websocket.send_json(
+        {"type": "system", "event": "connected", "userId": user_id}
+    )
+
+    # Unbounded, the fanout drops droppable messages of a slow client instead
+    queue: asyncio.Queue = asyncio.Queue()
+    groups = set()
+    sender = asyncio.create_task(forward_group_messages(websocket, queue))
+
+    try:
+        while True:
+            request = json.loads(await websocket.receive_text())
+            request_type = request.get("type")
+            group = request.get("group")
+
+            if request_type == "joinGroup" and group not in groups:
+                groups.add(group)
+                await backend.join_group(group, queue)
+            elif request_type == "leaveGroup" and group in groups:
+                groups.discard(group)
+                await backend.leave_group(group, queue)
+            elif request_type == "sendToGroup":
+                await backend.asend_to_group(group, request.get("data"))
+
+            if request.get("ackId") is not None:
+                await websocket.send_json(
+                    {"type": "ack", "ackId": request["ackId"], "success": True}
+                )
+    except (WebSocketDisconnect, json.JSONDecodeError):
+        pass
+    finally:
+        sender.cancel()
+
+        for group in groups:
+            await backend.leave_group(group, queue)
+
+
+async def forward_group_messages(websocket: WebSocket, queue: asyncio.Queue):
+    while True:
+        group, message = await queue.get()
+        await websocket.send_json(
+            {
+                "type": "message",
+                "from": "group",
+                "group": group,
+                "dataType": "json",
+                "data": message,
+            }
+        )
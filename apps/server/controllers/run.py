@@ -1,37 +1,110 @@
-from typing import List
+from typing import List, Optional
 from uuid import UUID
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
 from fastapi_sqlalchemy import db
 
 from exceptions import RunNotFoundException
 from models.run import RunModel
 from models.run_log import RunLogModel
+from models.run_log_message import RunLogMessageModel
 from typings.auth import UserAccount
-from typings.run import RunLogOutput
+from typings.run import RunLogMessageOutput, RunLogOutput
 from utils.auth import authenticate
-from utils.run_log import convert_run_logs_to_run_logs_list
+from utils.run_log import (convert_run_logs_to_run_logs_list,
+                           decode_run_log_cursor, encode_run_log_cursor)
 
 router = APIRouter()
 
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+RUN_LOGS_PAGE_SIZE = 50
+
 
 @router.get("/{run_id}/log", response_model=List[RunLogOutput])
 def get_run_logs(
-    run_id: UUID, auth: UserAccount = Depends(authenticate)
+    run_id: UUID,
+    response: Response,
+    cursor: Optional[str] = None,
+    limit: Optional[int] = Query(default=None, ge=1, le=200),
+    auth: UserAccount = Depends(authenticate),
 ) -> List[RunLogOutput]:
     """
-    Get all run logs by run ID.
+    Get run logs by run ID. Every run log is returned unless a cursor or limit is
+    passed, then they are returned a page at a time.
 
     Args:
+        cursor (Optional[str]): Value of the X-Next-Cursor header of the previous page.
+        limit (Optional[int]): Maximum number of run logs to return, defaults to 50
+            when only the cursor is passed.
         auth (UserAccount): Authenticated user account.
 
     Returns:
-        List[RunLogOutput]: List of teams associated with the account.
+        List[RunLogOutput]: Run logs with their messages. X-Next-Cursor header is set
+            when there are more run logs.
     """
     run = RunModel.get_run_by_id(db.session, run_id)
 
     if not run:
         raise RunNotFoundException("Run not found")
 
-    run_logs = RunLogModel.get_run_logs(db.session, run_id, auth.account)
-    return convert_run_logs_to_run_logs_list(run_logs)
+    try:
+        after = decode_run_log_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+    if cursor and not limit:
+        limit = RUN_LOGS_PAGE_SIZE
+
+    run_logs = RunLogModel.get_run_logs_page(
+        db.session, run_id, auth.account, after, limit + 1 if limit else None
+    )
+
+    if limit and len(run_logs) > limit:
+        run_logs = run_logs[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_run_log_cursor(run_logs[-1])
+
+    messages = RunLogMessageModel.get_messages_by_run_log_ids(
+        db.session, [run_log.id for run_log in run_logs]
+    )
+
+    return convert_run_logs_to_run_logs_list(run_logs, messages)
+
+
+@router.get(
+    "/{run_id}/log/{run_log_id}/messages", response_model=List[RunLogMessageOutput]
+)
+def get_run_log_messages(
+    run_id: UUID,
+    run_log_id: UUID,
+    response: Response,
+    cursor: Optional[int] = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    auth: UserAccount = Depends(authenticate),
+) -> List[RunLogMessageOutput]:
+    """
+    Get messages of a single run log, a page at a time.
+
+    Args:
+        cursor (Optional[int]): Value of the X-Next-Cursor header of the previous page.
+        limit (int): Maximum number of messages to return.
+        auth (UserAccount): Authenticated user account.
+
+    Returns:
+        List[RunLogMessageOutput]: Messages ordered as they were logged.
+    """
+    run_log = RunLogModel.get_run_log_by_id(
+        db.session, run_log_id, run_id, auth.account
+    )
+
+    if not run_log:
+        raise RunNotFoundException("Run log not found")
+
+    messages = RunLogMessageModel.get_messages_page(
+        db.session, run_log_id, cursor, limit + 1
+    )
+
+    if len(messages) > limit:
+        messages = messages[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = str(messages[-1].seq)
+
+    return [RunLogMessageOutput(**message.message) for message in messages]
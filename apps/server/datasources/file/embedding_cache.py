@@ -0,0 +1,106 @@
+import hashlib
+import unicodedata
+from typing import Any, Dict, List
+
+import sentry_sdk
+from llama_index.core.base.embeddings.base import BaseEmbedding, Embedding
+from llama_index.core.bridge.pydantic import PrivateAttr
+
+from models.db import create_session
+from models.embedding_cache import EmbeddingCacheModel
+
+
+def get_embedding_cache_key(model: str, text: str) -> str:
+    # Unicode and whitespace variants of a text share one entry
+    normalized = " ".join(unicodedata.normalize("NFC", text).split())
+    return hashlib.sha256(f"{model}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+class CachedEmbedding(BaseEmbedding):
+    """
+    Wraps an embedding model with the persistent embedding cache, so identical
+    chunks are embedded once across datasources, template copies and re-indexes.
+    Query embeddings are not cached.
+    """
+
+    _embed_model: BaseEmbedding = PrivateAttr()
+    _hits: int = PrivateAttr(default=0)
+    _misses: int = PrivateAttr(default=0)
+
+    def __init__(self, embed_model: BaseEmbedding, **kwargs: Any):
+        super().__init__(
+            model_name=embed_model.model_name,
+            embed_batch_size=embed_model.embed_batch_size,
+            callback_manager=embed_model.callback_manager,
+            **kwargs,
+        )
+        self._embed_model = embed_model
+
+    @classmethod
+    def class_name(cls) -> str:
+        return "CachedEmbedding"
+
+    @property
+    def hits(self) -> int:
+        return self._hits
+
+    @property
+    def misses(self) -> int:
+        return self._misses
+
+    @property
+    def hit_rate(self) -> float:
+        total = self._hits + self._misses
+        return self._hits / total if total else 0.0
+
+    def _get_query_embedding(self, query: str) -> Embedding:
+        return self._embed_model._get_query_embedding(query)
+
+    async def _aget_query_embedding(self, query: str) -> Embedding:
+        return await self._embed_model._aget_query_embedding(query)
+
+    def _get_text_embedding(self, text: str) -> Embedding:
+        return self._get_text_embeddings([text])[0]
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[Embedding]:
+        keys = [get_embedding_cache_key(self.model_name, text) for text in texts]
+        session = create_session()
+
+        try:
+            cached = self._read(session, keys)
+            missing: Dict[str, str] = {}
+
+            for key, text in zip(keys, texts):
+                if key not in cached:
+                    missing.setdefault(key, text)
+
+            self._hits += len(texts) - len(missing)
+            self._misses += len(missing)
+
+            if missing:
+                embeddings = self._embed_model._get_text_embeddings(
+                    list(missing.values())
+                )
+                computed = dict(zip(missing.keys(), embeddings))
+                self._write(session, computed)
+                cached.update(computed)
+        finally:
+            session.close()
+
+        return [cached[key] for key in keys]
+
+    def _read(self, session, keys: List[str]) -> Dict[str, Embedding]:
+        # The cache only saves work, embedding still succeeds without it
+        try:
+            return EmbeddingCacheModel.get_embeddings(session, keys)
+        except Exception as err:
+            session.rollback()
+            sentry_sdk.capture_exception(err)
+            return {}
+
+    def _write(self, session, embeddings: Dict[str, Embedding]):
+        try:
+            EmbeddingCacheModel.set_embeddings(session, self.model_name, embeddings)
+        except Exception as err:
+            session.rollback()
+            sentry_sdk.capture_exception(err)
@@ -1,13 +1,25 @@
 import shutil
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from enum import Enum
 from pathlib import Path
-from typing import List, Optional
+from typing import Dict, Hashable, Iterator, List, Optional, Tuple
 from uuid import UUID, uuid4
 
+import numpy as np
 import s3fs
-from llama_index.core import (ServiceContext, Settings, SimpleDirectoryReader,
-                              StorageContext, SummaryIndex, TreeIndex,
-                              VectorStoreIndex, load_index_from_storage)
+import sentry_sdk
+from llama_index.core import (
+    ServiceContext,
+    SimpleDirectoryReader,
+    StorageContext,
+    SummaryIndex,
+    TreeIndex,
+    VectorStoreIndex,
+    load_index_from_storage,
+)
+from llama_index.core.base.embeddings.base import BaseEmbedding
+from llama_index.core.node_parser import SentenceSplitter
+from llama_index.core.schema import BaseNode, MetadataMode, QueryBundle
 from llama_index.core.vector_stores.types import VectorStore
 from llama_index.embeddings.langchain import LangchainEmbedding
 from llama_index.embeddings.openai import OpenAIEmbedding as OpenAIEmbeddings
@@ -17,9 +29,26 @@ from llama_index.vector_stores.weaviate import WeaviateVectorStore
 from llama_index.vector_stores.zep import ZepVectorStore
 
 from config import Config
+from datasources.file.embedding_cache import CachedEmbedding
+from datasources.file.ingestion import (
+    IndexingStats,
+    IngestionManifest,
+    hash_file,
+    hash_text,
+)
+from datasources.file.local_index import (
+    LOCAL_INDEX_ROOT,
+    NODE_OVERHEAD,
+    LocalIndex,
+    LocalKVStore,
+)
+from datasources.file.local_vector_store import LocalVectorStore
+from models.db import create_session
+from models.embedding_cache import EmbeddingCacheModel
 from services.aws_s3 import AWSS3Service
 from typings.agent import AgentWithConfigsOutput
 from typings.config import AccountSettings
+from utils.cache import SizedLRUCache, TTLCache, make_fingerprint
 from utils.model import get_llm
 
 s3 = s3fs.S3FileSystem(
@@ -28,10 +57,59 @@ s3 = s3fs.S3FileSystem(
 )
 
 
+# Files downloaded concurrently while earlier ones are parsed and embedded
+INGESTION_DOWNLOAD_WORKERS = 8
+# Chunks embedded and upserted per insert
+INGESTION_BATCH_SIZE = 100
+
+# Repeated questions within a ReAct loop or across debate turns reuse the query
+# embedding and the retrieved chunks for a few minutes
+query_embedding_cache: TTLCache = TTLCache(10000, Config.DATASOURCE_QUERY_CACHE_TTL)
+retrieval_cache: TTLCache = TTLCache(10000, Config.DATASOURCE_QUERY_CACHE_TTL)
+
+
+def normalize_query(query_str: str) -> str:
+    return " ".join(query_str.casefold().split()).rstrip("?.! ")
+
+
+# Indexes loaded from S3, kept per process so warm queries skip the download
+loaded_index_cache: SizedLRUCache = SizedLRUCache(
+    Config.DATASOURCE_INDEX_CACHE_MB * 1024 * 1024
+)
+
+
+def estimate_index_size(index) -> int:
+    """Approximate memory held by a loaded index: node texts plus local embeddings"""
+    size = 0
+    kvstore = getattr(index.docstore, "_kvstore", None)
+
+    if isinstance(kvstore, LocalKVStore):
+        # Listing the docs would decode every node of the lazy store
+        size += kvstore.nbytes
+    else:
+        for node in index.docstore.docs.values():
+            size += len(node.get_content()) + NODE_OVERHEAD
+
+    vector_store = getattr(index, "vector_store", None)
+    embedding_dict = getattr(getattr(vector_store, "_data", None), "embedding_dict", {})
+
+    for embedding in embedding_dict.values():
+        size += len(embedding) * 8
+
+    return size + getattr(vector_store, "nbytes", 0)
+
+
+def invalidate_loaded_index(datasource_id: str) -> int:
+    """Drops every cached version of the datasource index, in memory and on disk"""
+    shutil.rmtree(LOCAL_INDEX_ROOT / str(datasource_id), ignore_errors=True)
+    return loaded_index_cache.pop_where(lambda key: key[0] == str(datasource_id))
+
+
 class VectorStoreProvider(Enum):
     ZEP = "zep"
     PINECONE = "pinecone"
     WEAVIATE = "weaviate"
+    LOCAL = "local"
 
 
 class IndexType(Enum):
@@ -66,6 +144,7 @@ class FileDatasourceRetriever:
         agent_with_configs: Optional[AgentWithConfigsOutput] = None,
         chunk_size: Optional[int] = 1024,
         similarity_top_k: Optional[int] = 2,
+        query_cache: Optional[bool] = True,
     ) -> None:
         self.settings = settings
         self.datasource_id = datasource_id
@@ -78,6 +157,9 @@ class FileDatasourceRetriever:
         self.agent_with_configs = agent_with_configs
         self.account_id = account_id
         self.data_source_account_id = data_source_account_id
+        self.query_cache = query_cache
+        self.index_version: Optional[str] = None
+        self.query_cache_status: Optional[str] = None
 
     def get_vector_store(self, is_retriever: bool = False):
         vector_store: VectorStore
@@ -129,22 +211,35 @@ class FileDatasourceRetriever:
                 index_name=index_name,
             )
 
-        return vector_store
-
-    def index_documents(self, file_urls: List[str]):
-        # Read documents from S3 and store them in tmp directory
-        self.download_documents(file_urls)
+        elif self.vector_store == VectorStoreProvider.LOCAL.value:
+            if is_retriever:
+                vector_store = LocalVectorStore.from_persist_dir(
+                    self.get_index_persist_dir(self.data_source_account_id), fs=s3
+                )
+            else:
+                vector_store = LocalVectorStore()
 
-        documents = SimpleDirectoryReader(
-            self.datasource_path.resolve(), filename_as_id=True
-        ).load_data()
-
-        # Remove tmp directory
-        shutil.rmtree(self.datasource_path)
+        return vector_store
 
-        Settings.embed_model = OpenAIEmbeddings(
-            api_key=self.settings.openai_api_key,
-            show_progress_bar=True,
+    def get_index_persist_dir(self, account_id: str) -> str:
+        return f"{Config.AWS_S3_BUCKET}/account_{account_id}/index/datasource_{self.datasource_id}"
+
+    def index_documents(self, file_urls: List[str]) -> IndexingStats:
+        """
+        Streams files into the index: downloads run in a bounded pool while the files
+        which already arrived are parsed, chunked and inserted batch by batch, so only
+        a few files are held in memory at any time.
+
+        When the persisted index was built with the same settings it is updated in
+        place: unchanged files are skipped, chunks whose content did not change
+        reuse their embedding and removed files are deleted. Tree indexes are always
+        rebuilt.
+        """
+        embed_model = CachedEmbedding(
+            OpenAIEmbeddings(
+                api_key=self.settings.openai_api_key,
+                show_progress_bar=True,
+            )
         )
         # embed_model = LangchainEmbedding(
         #     OpenAIEmbeddings(
@@ -154,66 +249,330 @@ class FileDatasourceRetriever:
         # )
 
         service_context = ServiceContext.from_defaults(
-            chunk_size=self.chunk_size, embed_model=Settings.embed_model
+            chunk_size=self.chunk_size, embed_model=embed_model
+        )
+        node_parser = SentenceSplitter(chunk_size=self.chunk_size)
+        index_persist_dir = self.get_index_persist_dir(self.account_id)
+        manifest_settings = {
+            "index_type": self.index_type,
+            "vector_store": self.vector_store,
+            "chunk_size": self.chunk_size,
+        }
+        stats = IndexingStats()
+        tree_nodes = []
+
+        manifest = (
+            IngestionManifest.load(index_persist_dir, manifest_settings, s3)
+            if self.index_type != IndexType.TREE.value
+            else None
         )
 
-        # try:
-        #     self.load_index()
-        # except FileNotFoundError:
-        # Create index from documents
-        if self.index_type == IndexType.SUMMARY.value:
-            self.index = SummaryIndex.from_documents(
-                documents, service_context=service_context, show_progress=True
+        if manifest:
+            storage_context = StorageContext.from_defaults(
+                persist_dir=index_persist_dir,
+                fs=s3,
+                vector_store=self.get_vector_store(is_retriever=True),
             )
-        elif self.index_type == IndexType.VECTOR_STORE.value:
-            vector_store = self.get_vector_store()
-            storage_context = StorageContext.from_defaults(vector_store=vector_store)
-
-            self.index = VectorStoreIndex.from_documents(
-                documents,
-                service_context=service_context,
-                storage_context=storage_context,
-                show_progress=True,
+            self.index = load_index_from_storage(
+                storage_context, self.datasource_id, service_context=service_context
             )
-        elif self.index_type == IndexType.TREE.value:
-            self.index = TreeIndex.from_documents(
-                documents, service_context=service_context, show_progress=True
+        else:
+            manifest = IngestionManifest(manifest_settings)
+
+            if self.index_type == IndexType.SUMMARY.value:
+                self.index = SummaryIndex(nodes=[], service_context=service_context)
+            elif self.index_type == IndexType.VECTOR_STORE.value:
+                vector_store = self.get_vector_store()
+                storage_context = StorageContext.from_defaults(
+                    vector_store=vector_store
+                )
+
+                self.index = VectorStoreIndex(
+                    nodes=[],
+                    service_context=service_context,
+                    storage_context=storage_context,
+                )
+
+        keys = {AWSS3Service.get_key_from_public_url(url): url for url in file_urls}
+        previous_files = manifest.files
+        manifest.files = {}
+
+        for key in previous_files.keys() - keys.keys():
+            self.delete_file_documents(previous_files[key])
+            stats.files_removed += 1
+
+        with ThreadPoolExecutor(max_workers=INGESTION_DOWNLOAD_WORKERS) as executor:
+            etags = dict(zip(keys, executor.map(AWSS3Service.get_etag, keys)))
+
+        changed_urls = []
+
+        for key, url in keys.items():
+            previous = previous_files.get(key)
+
+            if previous and previous["etag"] == etags[key]:
+                manifest.files[key] = previous
+                stats.files_unchanged += 1
+                stats.chunks_reused += len(previous["chunks"])
+            else:
+                changed_urls.append(url)
+
+        try:
+            for file_url, path in self.download_documents(changed_urls):
+                key = AWSS3Service.get_key_from_public_url(file_url)
+                content_hash = hash_file(path)
+                previous = previous_files.get(key)
+
+                # Uploaded again with the same content
+                if previous and previous["hash"] == content_hash:
+                    path.unlink()
+                    manifest.set_file(
+                        key,
+                        etags[key],
+                        content_hash,
+                        previous["ref_doc_ids"],
+                        previous["chunks"],
+                    )
+                    stats.files_unchanged += 1
+                    stats.chunks_reused += len(previous["chunks"])
+                    continue
+
+                documents = SimpleDirectoryReader(input_files=[path]).load_data()
+                path.unlink()
+
+                # Stable ids and metadata, so unchanged chunks hash the same next time
+                for position, document in enumerate(documents):
+                    document.id_ = f"{key}_part_{position}"
+                    document.metadata["file_path"] = key
+                    document.metadata["file_name"] = key.rsplit("/", 1)[-1]
+
+                nodes = node_parser.get_nodes_from_documents(documents)
+                chunk_hashes = [
+                    hash_text(node.get_content(metadata_mode=MetadataMode.EMBED))
+                    for node in nodes
+                ]
+
+                if previous:
+                    self.delete_file_documents(previous)
+
+                manifest.set_file(
+                    key,
+                    etags[key],
+                    content_hash,
+                    [document.id_ for document in documents],
+                    chunk_hashes,
+                )
+                stats.files_indexed += 1
+
+                # A tree is summarized level by level, so it is built from all chunks
+                if self.index_type == IndexType.TREE.value:
+                    tree_nodes.extend(nodes)
+                    continue
+
+                for start in range(0, len(nodes), INGESTION_BATCH_SIZE):
+                    batch = nodes[start : start + INGESTION_BATCH_SIZE]
+
+                    if self.index_type == IndexType.VECTOR_STORE.value:
+                        self.embed_nodes(
+                            embed_model,
+                            batch,
+                            chunk_hashes[start : start + INGESTION_BATCH_SIZE],
+                            manifest,
+                            stats,
+                        )
+
+                    self.index.insert_nodes(batch)
+        finally:
+            # Remove tmp directory
+            shutil.rmtree(self.datasource_path, ignore_errors=True)
+
+        if self.index_type == IndexType.TREE.value:
+            self.index = TreeIndex(
+                nodes=tree_nodes, service_context=service_context, show_progress=True
             )
 
         self.index.set_index_id(self.datasource_id)
 
-        # Refresh docs if re-indexing
-        # self.index.refresh_ref_docs(
-        #     documents,
-        #     service_context=service_context,
-        #     update_kwargs={"delete_kwargs": {"delete_from_docstore": True}},
-        # )
-
         # Persist index to S3
-        index_persist_dir = f"{Config.AWS_S3_BUCKET}/account_{self.account_id}/index/datasource_{self.datasource_id}"
-
         self.index.storage_context.persist(persist_dir=index_persist_dir, fs=s3)
 
-    def load_index(self):
-        index_persist_dir = f"{Config.AWS_S3_BUCKET}/account_{self.data_source_account_id}/index/datasource_{self.datasource_id}"
+        if self.index_type != IndexType.TREE.value:
+            manifest.persist(index_persist_dir, s3)
+
+        invalidate_loaded_index(self.datasource_id)
+
+        stats.embedding_cache_hits = embed_model.hits
+        stats.embedding_cache_misses = embed_model.misses
+        self.evict_embedding_cache()
+
+        return stats
 
-        vector_store = self.get_vector_store(is_retriever=True)
-        storage_context = StorageContext.from_defaults(
-            persist_dir=index_persist_dir, fs=s3, vector_store=vector_store
+    def evict_embedding_cache(self):
+        session = create_session()
+
+        try:
+            EmbeddingCacheModel.evict(session, Config.EMBEDDING_CACHE_MAX_ENTRIES)
+        except Exception as err:
+            sentry_sdk.capture_exception(err)
+        finally:
+            session.close()
+
+    def embed_nodes(
+        self,
+        embed_model: BaseEmbedding,
+        nodes: List[BaseNode],
+        chunk_hashes: List[str],
+        manifest: IngestionManifest,
+        stats: IndexingStats,
+    ):
+        """Sets node embeddings, reusing the ones of chunks indexed before"""
+        missing = []
+
+        for node, chunk_hash in zip(nodes, chunk_hashes):
+            embedding = manifest.embeddings.get(chunk_hash)
+
+            if embedding is None:
+                missing.append((node, chunk_hash))
+            else:
+                node.embedding = embedding.tolist()
+                stats.chunks_reused += 1
+
+        if not missing:
+            return
+
+        embeddings = embed_model.get_text_embedding_batch(
+            [node.get_content(metadata_mode=MetadataMode.EMBED) for node, _ in missing]
         )
-        self.index = load_index_from_storage(storage_context, self.datasource_id)
 
-    def download_documents(self, file_urls: List[str]):
+        for (node, chunk_hash), embedding in zip(missing, embeddings):
+            node.embedding = embedding
+            manifest.embeddings[chunk_hash] = np.asarray(embedding, dtype=np.float32)
+
+        stats.chunks_embedded += len(missing)
+
+    def delete_file_documents(self, file: Dict):
+        for ref_doc_id in file["ref_doc_ids"]:
+            self.index.delete_ref_doc(ref_doc_id, delete_from_docstore=True)
+
+    def get_index_cache_key(self, version: str) -> Hashable:
+        # Pinecone and Weaviate indexes are reached with the querying account's keys
+        vector_store_settings = (
+            self.settings.pinecone_api_key,
+            self.settings.pinecone_environment,
+            self.settings.weaviate_url,
+            self.settings.weaviate_api_key,
+        )
+
+        return (
+            str(self.datasource_id),
+            version,
+            self.data_source_account_id,
+            self.index_type,
+            self.vector_store,
+            make_fingerprint(vector_store_settings),
+        )
+
+    def load_index(self, version: Optional[str] = None):
+        """
+        Loads the persisted index. When the index version is known, the loaded index
+        is cached and reused until the datasource is re-indexed, and a local on-disk
+        copy is kept so other workers of the node skip the S3 download.
+        """
+        self.index_version = version
+        cache_key = self.get_index_cache_key(version) if version else None
+
+        if cache_key:
+            index = loaded_index_cache.get(cache_key)
+
+            if index is not None:
+                self.index = index
+                return
+
+        local_index = LocalIndex.open(self.datasource_id, version) if version else None
+
+        if local_index:
+            vector_store = (
+                None
+                if local_index.has_vector_store
+                else self.get_vector_store(is_retriever=True)
+            )
+            self.index = local_index.load_index(self.datasource_id, vector_store)
+        else:
+            vector_store = self.get_vector_store(is_retriever=True)
+            index_persist_dir = self.get_index_persist_dir(self.data_source_account_id)
+
+            storage_context = StorageContext.from_defaults(
+                persist_dir=index_persist_dir, fs=s3, vector_store=vector_store
+            )
+            self.index = load_index_from_storage(storage_context, self.datasource_id)
+
+            if version:
+                try:
+                    LocalIndex.write(self.datasource_id, version, self.index)
+                except Exception as err:
+                    sentry_sdk.capture_exception(err)
+
+        if cache_key:
+            loaded_index_cache.set(
+                cache_key, self.index, estimate_index_size(self.index)
+            )
+
+    def download_documents(self, file_urls: List[str]) -> Iterator[Tuple[str, Path]]:
+        """
+        Downloads files concurrently and yields each url with its local path, in the
+        order the downloads finish.
+        At most INGESTION_DOWNLOAD_WORKERS * 2 files are requested ahead of the
+        consumer, so a slow consumer does not pull the whole corpus to disk.
+        """
         self.datasource_path.mkdir(parents=True, exist_ok=True)
+        file_urls = iter(file_urls)
+        pending = set()
+
+        with ThreadPoolExecutor(max_workers=INGESTION_DOWNLOAD_WORKERS) as executor:
+            while True:
+                for file_url in file_urls:
+                    pending.add(executor.submit(self.download_document, file_url))
+
+                    if len(pending) >= INGESTION_DOWNLOAD_WORKERS * 2:
+                        break
+
+                if not pending:
+                    return
+
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    yield future.result()
 
-        for file_url in file_urls:
-            key = AWSS3Service.get_key_from_public_url(file_url)
-            _, ext = key.rsplit(".", 1)
-            name = f"{uuid4()}.{ext}"
-            absolute_path = self.datasource_path.joinpath(name).resolve()
-            AWSS3Service.download_file(key, absolute_path)
+    def download_document(self, file_url: str) -> Tuple[str, Path]:
+        key = AWSS3Service.get_key_from_public_url(file_url)
+        _, ext = key.rsplit(".", 1)
+        name = f"{uuid4()}.{ext}"
+        absolute_path = self.datasource_path.joinpath(name).resolve()
+        AWSS3Service.download_file(key, absolute_path)
+        return file_url, absolute_path
+
+    def get_query_cache_key(self, query_str: str) -> Optional[Hashable]:
+        if not self.query_cache or not self.index_version:
+            return None
+
+        return (
+            self.get_index_cache_key(self.index_version),
+            self.similarity_top_k,
+            normalize_query(query_str),
+        )
 
     def query(self, query_str):
+        cache_key = self.get_query_cache_key(query_str)
+
+        if cache_key:
+            texts = retrieval_cache.get(cache_key)
+
+            if texts is not None:
+                self.query_cache_status = "hit"
+                return "\n".join(texts)
+
+            self.query_cache_status = "miss"
+
         llm = LangChainLLM(
             llm=get_llm(
                 self.settings,
@@ -240,6 +599,39 @@ class FileDatasourceRetriever:
         #     verbose=True,
         # )
 
-        nodes = retriever.retrieve(query_str)
-        content = "\n".join([node.text for node in nodes])
+        query_bundle = QueryBundle(query_str)
+        embed_model = getattr(retriever, "_embed_model", None)
+
+        if cache_key and embed_model:
+            query_bundle.embedding = self.get_query_embedding(embed_model, query_str)
+
+        nodes = retriever.retrieve(query_bundle)
+        texts = [node.text for node in nodes]
+
+        if cache_key:
+            retrieval_cache.set(cache_key, texts)
+
+        content = "\n".join(texts)
         return content
+
+    def get_query_embedding(self, embed_model: BaseEmbedding, query_str: str):
+        cache_key = (embed_model.model_name, normalize_query(query_str))
+        embedding = query_embedding_cache.get(cache_key)
+
+        if embedding is None:
+            embedding = embed_model.get_query_embedding(query_str)
+            query_embedding_cache.set(cache_key, embedding)
+
+        return embedding
+
+    def describe_query_cache(self) -> Optional[str]:
+        """Query cache outcome of the last query, for run logs"""
+        if not self.query_cache_status:
+            return None
+
+        return (
+            f"Retrieval cache {self.query_cache_status}. "
+            f"Process totals: retrieval {retrieval_cache.hits} hits / "
+            f"{retrieval_cache.misses} misses, query embedding "
+            f"{query_embedding_cache.hits} hits / {query_embedding_cache.misses} misses"
+        )
@@ -0,0 +1,124 @@
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Optional
+
+import fsspec
+import numpy as np
+
+MANIFEST_FNAME = "ingestion_manifest.json"
+CHUNK_EMBEDDINGS_FNAME = "chunk_embeddings.npz"
+
+
+def hash_file(path: Path) -> str:
+    digest = hashlib.sha256()
+
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(1024 * 1024), b""):
+            digest.update(block)
+
+    return digest.hexdigest()
+
+
+def hash_text(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class IndexingStats:
+    """Counters reported by an indexing run"""
+
+    def __init__(self):
+        self.files_unchanged = 0
+        self.files_indexed = 0
+        self.files_removed = 0
+        self.chunks_reused = 0
+        self.chunks_embedded = 0
+        # Of the chunks embedded, how many were found in the shared embedding cache
+        self.embedding_cache_hits = 0
+        self.embedding_cache_misses = 0
+
+    def to_dict(self) -> Dict[str, int]:
+        return dict(vars(self))
+
+    def __repr__(self) -> str:
+        return f"IndexingStats({self.to_dict()})"
+
+
+class IngestionManifest:
+    """
+    What the persisted index was built from: per file its S3 ETag, content hash,
+    document ids and chunk hashes, plus the embedding of every chunk. A re-index
+    compares files against it and only parses and embeds what changed.
+    """
+
+    def __init__(self, settings: Dict, files: Optional[Dict[str, Dict]] = None):
+        self.settings = settings
+        self.files: Dict[str, Dict] = files or {}
+        self.embeddings: Dict[str, np.ndarray] = {}
+
+    def set_file(
+        self,
+        key: str,
+        etag: str,
+        content_hash: str,
+        ref_doc_ids: List[str],
+        chunk_hashes: List[str],
+    ):
+        self.files[key] = {
+            "etag": etag,
+            "hash": content_hash,
+            "ref_doc_ids": ref_doc_ids,
+            "chunks": chunk_hashes,
+        }
+
+    @classmethod
+    def load(
+        cls, persist_dir: str, settings: Dict, fs: fsspec.AbstractFileSystem
+    ) -> Optional["IngestionManifest"]:
+        """Returns None when there is no manifest or the index settings changed"""
+        manifest_path = os.path.join(persist_dir, MANIFEST_FNAME)
+
+        if not fs.exists(manifest_path):
+            return None
+
+        with fs.open(manifest_path, "r") as file:
+            data = json.load(file)
+
+        if data.get("settings") != settings:
+            return None
+
+        manifest = cls(settings, data["files"])
+        embeddings_path = os.path.join(persist_dir, CHUNK_EMBEDDINGS_FNAME)
+
+        if fs.exists(embeddings_path):
+            with fs.open(embeddings_path, "rb") as file:
+                arrays = np.load(file)
+                manifest.embeddings = dict(
+                    zip(arrays["hashes"].tolist(), arrays["vectors"])
+                )
+
+        return manifest
+
+    def persist(self, persist_dir: str, fs: fsspec.AbstractFileSystem):
+        # Embeddings of chunks which are no longer in any file are dropped
+        chunk_hashes = [
+            chunk_hash
+            for file in self.files.values()
+            for chunk_hash in file["chunks"]
+            if chunk_hash in self.embeddings
+        ]
+        chunk_hashes = list(dict.fromkeys(chunk_hashes))
+
+        with fs.open(os.path.join(persist_dir, MANIFEST_FNAME), "w") as file:
+            json.dump({"settings": self.settings, "files": self.files}, file)
+
+        with fs.open(os.path.join(persist_dir, CHUNK_EMBEDDINGS_FNAME), "wb") as file:
+            np.savez(
+                file,
+                hashes=np.asarray(chunk_hashes, dtype=str),
+                vectors=np.asarray(
+                    [self.embeddings[chunk_hash] for chunk_hash in chunk_hashes],
+                    dtype=np.float32,
+                ),
+            )
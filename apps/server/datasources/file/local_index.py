@@ -0,0 +1,315 @@
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+import fsspec
+import numpy as np
+from llama_index.core import StorageContext, load_index_from_storage
+from llama_index.core.schema import NodeRelationship
+from llama_index.core.storage.docstore import SimpleDocumentStore
+from llama_index.core.storage.docstore.utils import doc_to_json, json_to_doc
+from llama_index.core.storage.index_store import SimpleIndexStore
+from llama_index.core.storage.index_store.utils import (index_struct_to_json,
+                                                        json_to_index_struct)
+from llama_index.core.storage.kvstore import SimpleKVStore
+from llama_index.core.storage.kvstore.types import DEFAULT_COLLECTION
+from llama_index.core.vector_stores import SimpleVectorStore
+from llama_index.core.vector_stores.types import VectorStore
+
+from datasources.file.local_vector_store import (LOCAL_VECTOR_STORE_FNAME,
+                                                 LocalVectorStore)
+from datasources.file.vector_index import VectorIndex, normalize
+
+LOCAL_INDEX_ROOT = Path("tmp/datasources/index")
+
+NODES_FILE = "nodes.json"
+TEXT_FILE = "text.bin"
+OFFSETS_FILE = "offsets.npy"
+EMBEDDINGS_FILE = "embeddings.npy"
+INDEX_STRUCT_FILE = "index_struct.json"
+
+# Collection of the default docstore namespace which holds the node json
+NODES_COLLECTION = "docstore/data"
+# Rough memory of a node's metadata and python objects, besides its text
+NODE_OVERHEAD = 512
+
+
+def get_local_index_path(datasource_id: str, version: str) -> Path:
+    # Versions are timestamps, keep them usable as directory names
+    safe_version = "".join(char if char.isalnum() else "_" for char in version)
+    return LOCAL_INDEX_ROOT / str(datasource_id) / safe_version
+
+
+class LocalIndex:
+    """
+    On-disk copy of a persisted index, shared by all workers of a node through the
+    page cache. Node texts are concatenated in one file and addressed by offsets, and
+    embeddings are stored as a float32 matrix. Both are memory-mapped, so opening an
+    index reads only the small node and index struct files.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.has_local_vector_store = (path / LOCAL_VECTOR_STORE_FNAME).exists()
+
+        with open(path / NODES_FILE) as file:
+            self.nodes: List[Dict] = json.load(file)
+
+        with open(path / INDEX_STRUCT_FILE) as file:
+            self.index_struct: Dict = json.load(file)
+
+        self.offsets = np.load(path / OFFSETS_FILE, mmap_mode="r")
+        # numpy cannot map an empty file
+        self.text = (
+            np.memmap(path / TEXT_FILE, dtype=np.uint8, mode="r")
+            if os.path.getsize(path / TEXT_FILE)
+            else np.empty(0, dtype=np.uint8)
+        )
+
+        embeddings_path = path / EMBEDDINGS_FILE
+        self.embeddings: Optional[np.ndarray] = (
+            np.load(embeddings_path, mmap_mode="r")
+            if embeddings_path.exists()
+            else None
+        )
+
+    @property
+    def has_vector_store(self) -> bool:
+        """Whether the vectors are stored locally, so no remote store is needed"""
+        return self.embeddings is not None or self.has_local_vector_store
+
+    @classmethod
+    def open(cls, datasource_id: str, version: str) -> Optional["LocalIndex"]:
+        path = get_local_index_path(datasource_id, version)
+
+        if not (path / NODES_FILE).exists():
+            return None
+
+        return cls(path)
+
+    @classmethod
+    def write(cls, datasource_id: str, version: str, index) -> Path:
+        """
+        Stores the loaded index. Files are written to a temporary directory which is
+        renamed into place, so readers never see a partial index. Older versions of
+        the datasource are removed.
+        """
+        path = get_local_index_path(datasource_id, version)
+        tmp_path = path.with_name(f".{path.name}.{uuid4().hex}")
+        tmp_path.mkdir(parents=True, exist_ok=True)
+
+        try:
+            cls._write_files(tmp_path, index)
+
+            try:
+                os.rename(tmp_path, path)
+            except OSError:
+                # Another worker stored the same version first
+                shutil.rmtree(tmp_path, ignore_errors=True)
+        except Exception:
+            shutil.rmtree(tmp_path, ignore_errors=True)
+            raise
+
+        for sibling in path.parent.iterdir():
+            if sibling.name != path.name and not sibling.name.startswith("."):
+                shutil.rmtree(sibling, ignore_errors=True)
+
+        return path
+
+    @classmethod
+    def _write_files(cls, path: Path, index):
+        nodes = []
+        offsets = [0]
+
+        with open(path / TEXT_FILE, "wb") as text_file:
+            for node in index.docstore.docs.values():
+                node_json = doc_to_json(node)
+                text = node_json["__data__"].pop("text", "") or ""
+                node_json["__data__"]["embedding"] = None
+                nodes.append(node_json)
+
+                encoded = text.encode("utf-8")
+                text_file.write(encoded)
+                offsets.append(offsets[-1] + len(encoded))
+
+        with open(path / NODES_FILE, "w") as file:
+            json.dump(nodes, file)
+
+        with open(path / INDEX_STRUCT_FILE, "w") as file:
+            json.dump(index_struct_to_json(index.index_struct), file)
+
+        np.save(path / OFFSETS_FILE, np.asarray(offsets, dtype=np.int64))
+
+        vector_store = getattr(index, "vector_store", None)
+
+        if isinstance(vector_store, LocalVectorStore):
+            vector_store.persist(str(path / LOCAL_VECTOR_STORE_FNAME))
+
+        embedding_dict = cls._get_embedding_dict(index)
+
+        if embedding_dict:
+            node_ids = [node["__data__"]["id_"] for node in nodes]
+            matrix = np.asarray(
+                [embedding_dict[node_id] for node_id in node_ids], dtype=np.float32
+            )
+            # Stored normalized, so queries can score the mapped matrix as it is
+            np.save(path / EMBEDDINGS_FILE, normalize(matrix))
+
+    @staticmethod
+    def _get_embedding_dict(index) -> Dict[str, List[float]]:
+        vector_store = getattr(index, "vector_store", None)
+
+        if not isinstance(vector_store, SimpleVectorStore):
+            return {}
+
+        # llama-index has no public accessor for the whole embedding dict
+        embedding_dict = vector_store._data.embedding_dict
+        node_ids = index.docstore.docs.keys()
+
+        # Only a complete matrix lines up with the node order
+        if not all(node_id in embedding_dict for node_id in node_ids):
+            return {}
+
+        return embedding_dict
+
+    def get_text(self, position: int) -> str:
+        start, end = int(self.offsets[position]), int(self.offsets[position + 1])
+        return bytes(self.text[start:end]).decode("utf-8")
+
+    def get_node_json(self, position: int) -> Dict:
+        node_json = self.nodes[position]
+        data = dict(node_json["__data__"], text=self.get_text(position))
+        return {**node_json, "__data__": data}
+
+    def get_vector_index(self) -> VectorIndex:
+        """
+        Exact index over the embeddings. Unit length rows, as written by _write_files,
+        are searched straight from the mapped file, older files are normalized into
+        memory.
+        """
+        norms = np.sqrt(np.einsum("ij,ij->i", self.embeddings, self.embeddings))
+        is_normalized = np.all((np.abs(norms - 1) < 1e-3) | (norms == 0))
+
+        return VectorIndex.from_arrays(
+            {
+                "ids": np.asarray(
+                    [node_json["__data__"]["id_"] for node_json in self.nodes],
+                    dtype=str,
+                ),
+                "ref_doc_ids": np.asarray(
+                    [self._get_ref_doc_id(node_json) or "" for node_json in self.nodes],
+                    dtype=str,
+                ),
+                "vectors": (
+                    self.embeddings if is_normalized else normalize(self.embeddings)
+                ),
+            },
+            # Training IVF lists would read every vector on the first query
+            ivf_threshold=sys.maxsize,
+        )
+
+    @staticmethod
+    def _get_ref_doc_id(node_json: Dict) -> Optional[str]:
+        relationships = node_json["__data__"].get("relationships", {})
+        source = relationships.get(NodeRelationship.SOURCE.value)
+        return source.get("node_id") if source else None
+
+    def load_index(self, index_id: str, vector_store: Optional[VectorStore] = None):
+        """
+        Builds the llama-index index from the local files. Nodes are decoded when
+        they are retrieved and local embeddings are searched in place, so loading
+        copies neither the texts nor the vectors.
+        """
+        docstore = SimpleDocumentStore(simple_kvstore=LocalKVStore(self))
+
+        index_store = SimpleIndexStore()
+        index_store.add_index_struct(json_to_index_struct(self.index_struct))
+
+        if self.has_local_vector_store:
+            vector_store = LocalVectorStore.from_persist_dir(str(self.path))
+        elif self.embeddings is not None:
+            vector_store = LocalVectorStore(self.get_vector_index())
+
+        storage_context = StorageContext.from_defaults(
+            docstore=docstore, index_store=index_store, vector_store=vector_store
+        )
+        return load_index_from_storage(storage_context, index_id)
+
+
+class LocalKVStore(SimpleKVStore):
+    """
+    Docstore storage over a LocalIndex. Nodes are decoded from the mapped files one
+    at a time when they are fetched, which is all retrieval needs. Any other use,
+    like listing or changing documents, decodes every node once and continues as a
+    plain SimpleKVStore.
+    """
+
+    def __init__(self, local_index: LocalIndex):
+        super().__init__()
+        self.local_index = local_index
+        self.positions: Dict[str, int] = {
+            node_json["__data__"]["id_"]: position
+            for position, node_json in enumerate(local_index.nodes)
+        }
+        self.is_materialized = False
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the nodes, texts count once they are decoded"""
+        size = NODE_OVERHEAD * len(self.positions)
+
+        if self.is_materialized:
+            size += int(self.local_index.offsets[-1])
+
+        return size
+
+    def put(self, key: str, val: dict, collection: str = DEFAULT_COLLECTION) -> None:
+        self._materialize()
+        super().put(key, val, collection)
+
+    def get(self, key: str, collection: str = DEFAULT_COLLECTION) -> Optional[dict]:
+        if not self.is_materialized and collection == NODES_COLLECTION:
+            position = self.positions.get(key)
+            return (
+                None if position is None else self.local_index.get_node_json(position)
+            )
+
+        self._materialize()
+        return super().get(key, collection)
+
+    def get_all(self, collection: str = DEFAULT_COLLECTION) -> Dict[str, dict]:
+        self._materialize()
+        return super().get_all(collection)
+
+    def delete(self, key: str, collection: str = DEFAULT_COLLECTION) -> bool:
+        self._materialize()
+        return super().delete(key, collection)
+
+    def persist(
+        self, persist_path: str, fs: Optional[fsspec.AbstractFileSystem] = None
+    ) -> None:
+        self._materialize()
+        super().persist(persist_path, fs)
+
+    def to_dict(self) -> dict:
+        self._materialize()
+        return super().to_dict()
+
+    def _materialize(self):
+        if self.is_materialized:
+            return
+
+        docstore = SimpleDocumentStore()
+        docstore.add_documents(
+            [
+                json_to_doc(self.local_index.get_node_json(position))
+                for position in range(len(self.local_index.nodes))
+            ],
+            allow_update=True,
+        )
+        self._data = docstore._kvstore.to_dict()
+        self.is_materialized = True
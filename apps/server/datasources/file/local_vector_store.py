@@ -0,0 +1,111 @@
+import mmap
+import os
+from typing import Any, List, Optional
+
+import fsspec
+import numpy as np
+from llama_index.core.schema import BaseNode
+from llama_index.core.vector_stores.types import (VectorStore,
+                                                  VectorStoreQuery,
+                                                  VectorStoreQueryResult)
+
+from datasources.file.vector_index import VectorIndex
+
+LOCAL_VECTOR_STORE_FNAME = "local_vector_store.npz"
+
+
+def is_memory_mapped(array: Any) -> bool:
+    while isinstance(array, np.ndarray):
+        if isinstance(array, np.memmap):
+            return True
+
+        array = array.base
+
+    return isinstance(array, mmap.mmap)
+
+
+class LocalVectorStore(VectorStore):
+    """
+    Vector store kept in the server process, for file datasources which should not
+    depend on an external vector database. Node texts live in the index docstore,
+    and the vectors are persisted next to it as one npz file.
+    """
+
+    stores_text: bool = False
+    is_embedding_query: bool = True
+
+    def __init__(self, index: Optional[VectorIndex] = None):
+        self._index = index or VectorIndex()
+
+    @property
+    def client(self) -> Any:
+        return self._index
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the vectors, mapped files live in the shared page cache"""
+        vectors = self._index.vectors
+        return 0 if vectors is None or is_memory_mapped(vectors) else vectors.nbytes
+
+    def add(self, nodes: List[BaseNode], **add_kwargs: Any) -> List[str]:
+        if not nodes:
+            return []
+
+        ids = [node.node_id for node in nodes]
+        self._index.add(
+            ids,
+            [node.get_embedding() for node in nodes],
+            [node.ref_doc_id for node in nodes],
+        )
+        return ids
+
+    def delete(self, ref_doc_id: str, **delete_kwargs: Any) -> None:
+        self._index.delete_ref_doc(ref_doc_id)
+
+    def query(self, query: VectorStoreQuery, **kwargs: Any) -> VectorStoreQueryResult:
+        if query.filters is not None:
+            raise ValueError("Metadata filters are not supported by the local store")
+
+        if query.node_ids:
+            # Restricted queries are small, score the allowed nodes exactly
+            index = VectorIndex()
+            positions = [
+                self._index.positions[node_id]
+                for node_id in query.node_ids
+                if node_id in self._index.positions
+            ]
+            index.add(
+                [self._index.ids[position] for position in positions],
+                self._index.vectors[positions],
+            )
+        else:
+            index = self._index
+
+        ids, similarities = index.search(query.query_embedding, query.similarity_top_k)
+        return VectorStoreQueryResult(similarities=similarities, ids=ids)
+
+    def persist(
+        self, persist_path: str, fs: Optional[fsspec.AbstractFileSystem] = None
+    ) -> None:
+        fs = fs or fsspec.filesystem("file")
+        path = os.path.join(os.path.dirname(persist_path), LOCAL_VECTOR_STORE_FNAME)
+
+        fs.makedirs(os.path.dirname(path), exist_ok=True)
+
+        with fs.open(path, "wb") as file:
+            np.savez(file, **self._index.to_arrays())
+
+    @classmethod
+    def from_persist_dir(
+        cls, persist_dir: str, fs: Optional[fsspec.AbstractFileSystem] = None
+    ) -> "LocalVectorStore":
+        fs = fs or fsspec.filesystem("file")
+        path = os.path.join(persist_dir, LOCAL_VECTOR_STORE_FNAME)
+
+        if not fs.exists(path):
+            return cls()
+
+        with fs.open(path, "rb") as file:
+            arrays = dict(np.load(file))
+
+        return cls(VectorIndex.from_arrays(arrays))
@@ -0,0 +1,380 @@
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+# Collections below this size are searched exactly
+IVF_THRESHOLD = 20000
+# Candidates re-ranked with the full vectors, per requested result. PQ scores are
+# coarse, so recall depends on this far more than on the probed lists, see
+# benchmarks/vector_index_recall.py
+RERANK_FACTOR = 40
+# Lists probed by default: a share of the lists, but never fewer than MIN_PROBES
+PROBES_DIVISOR = 10
+MIN_PROBES = 8
+
+KMEANS_ITERATIONS = 15
+KMEANS_MAX_SAMPLE = 50000
+PQ_CENTROIDS = 256
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1
+    return vectors / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Positions of the k highest scores, best first"""
+    if k >= len(scores):
+        return np.argsort(-scores)
+
+    positions = np.argpartition(-scores, k)[:k]
+    return positions[np.argsort(-scores[positions])]
+
+
+def kmeans(vectors: np.ndarray, clusters: int, rng: np.random.Generator) -> np.ndarray:
+    """Lloyd's k-means with squared euclidean distance"""
+    centroids = vectors[rng.choice(len(vectors), clusters, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        assignments = assign_to_centroids(vectors, centroids)
+
+        order = np.argsort(assignments, kind="stable")
+        filled, starts, counts = np.unique(
+            assignments[order], return_index=True, return_counts=True
+        )
+        sums = np.add.reduceat(vectors[order], starts, axis=0)
+
+        # Empty clusters keep their previous centroid
+        centroids[filled] = sums / counts[:, None]
+
+    return centroids
+
+
+def assign_to_centroids(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    distances = (
+        -2 * vectors @ centroids.T + np.einsum("ij,ij->i", centroids, centroids)[None]
+    )
+    return np.argmin(distances, axis=1)
+
+
+class IVFPQ:
+    """
+    Inverted file index with product-quantized residuals. Vectors are assigned to
+    the nearest coarse centroid and their residuals are encoded as one byte per
+    subspace, so a query scores candidates of the probed lists with table lookups.
+    """
+
+    def __init__(self, dim: int, lists: int, subspaces: int, seed: int = 0):
+        self.dim = dim
+        self.lists = lists
+        self.subspaces = subspaces
+        self.subspace_dim = dim // subspaces
+        self.rng = np.random.default_rng(seed)
+        self.centroids: Optional[np.ndarray] = None
+        self.codebooks: Optional[np.ndarray] = None
+        self.assignments = np.empty(0, dtype=np.int32)
+        self.codes = np.empty((0, subspaces), dtype=np.uint8)
+        self.trained_size = 0
+        self._order: Optional[np.ndarray] = None
+        self._bounds: Optional[np.ndarray] = None
+
+    def train(self, vectors: np.ndarray):
+        sample_size = min(len(vectors), self.lists * 64, KMEANS_MAX_SAMPLE)
+        sample = vectors[self.rng.choice(len(vectors), sample_size, replace=False)]
+
+        self.trained_size = len(vectors)
+        self.centroids = kmeans(sample, self.lists, self.rng)
+        residuals = sample - self.centroids[assign_to_centroids(sample, self.centroids)]
+        residuals = residuals[: PQ_CENTROIDS * 40]
+
+        self.codebooks = np.stack(
+            [
+                kmeans(
+                    residuals[:, self._subspace(index)],
+                    min(PQ_CENTROIDS, len(residuals)),
+                    self.rng,
+                )
+                for index in range(self.subspaces)
+            ]
+        )
+
+    def add(self, vectors: np.ndarray):
+        assignments = assign_to_centroids(vectors, self.centroids)
+        residuals = vectors - self.centroids[assignments]
+        codes = np.stack(
+            [
+                assign_to_centroids(residuals[:, self._subspace(index)], codebook)
+                for index, codebook in enumerate(self.codebooks)
+            ],
+            axis=1,
+        ).astype(np.uint8)
+
+        self.assignments = np.concatenate(
+            [self.assignments, assignments.astype(np.int32)]
+        )
+        self.codes = np.concatenate([self.codes, codes])
+        self._order = None
+
+    def search(self, query: np.ndarray, candidates: int, probes: int) -> np.ndarray:
+        """Positions of the best candidates by approximate inner product"""
+        if self._order is None:
+            self._order = np.argsort(self.assignments, kind="stable")
+            self._bounds = np.searchsorted(
+                self.assignments[self._order], np.arange(self.lists + 1)
+            )
+
+        coarse_scores = self.centroids @ query
+        probed = top_k(coarse_scores, probes)
+        positions = np.concatenate(
+            [
+                self._order[self._bounds[list_] : self._bounds[list_ + 1]]
+                for list_ in probed
+            ]
+        )
+
+        # Inner product of the query with every codeword, per subspace
+        tables = np.einsum(
+            "sd,scd->sc",
+            query.reshape(self.subspaces, self.subspace_dim),
+            self.codebooks,
+        )
+        scores = coarse_scores[self.assignments[positions]] + tables[
+            np.arange(self.subspaces), self.codes[positions]
+        ].sum(axis=1)
+
+        return positions[top_k(scores, candidates)]
+
+    def keep(self, positions: np.ndarray):
+        """Drops every vector except the given positions, keeping their order"""
+        self.assignments = self.assignments[positions]
+        self.codes = self.codes[positions]
+        self._order = None
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        return {
+            "ivf_centroids": self.centroids,
+            "ivf_codebooks": self.codebooks,
+            "ivf_assignments": self.assignments,
+            "ivf_codes": self.codes,
+            "ivf_trained_size": np.asarray(self.trained_size),
+        }
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], seed: int = 0) -> "IVFPQ":
+        centroids, codebooks = arrays["ivf_centroids"], arrays["ivf_codebooks"]
+        ivf = cls(centroids.shape[1], len(centroids), len(codebooks), seed)
+        ivf.centroids = centroids
+        ivf.codebooks = codebooks
+        ivf.assignments = arrays["ivf_assignments"]
+        ivf.codes = arrays["ivf_codes"]
+        ivf.trained_size = int(arrays["ivf_trained_size"])
+        return ivf
+
+    def _subspace(self, index: int) -> slice:
+        return slice(index * self.subspace_dim, (index + 1) * self.subspace_dim)
+
+
+def choose_subspaces(dim: int) -> int:
+    for subspaces in (48, 32, 24, 16, 8, 4, 2):
+        if dim % subspaces == 0 and dim // subspaces >= 8:
+            return subspaces
+
+    return 1
+
+
+class VectorIndex:
+    """
+    In-process cosine similarity index. Small collections are searched exactly with
+    one matrix-vector product; once a collection reaches ivf_threshold vectors an
+    IVF-PQ index narrows the search to a few lists and the best candidates are
+    re-ranked exactly. The IVF-PQ index is trained while vectors are added, so
+    indexing pays for it rather than the first query. Deletes are tombstones which
+    are compacted away once they make up half of the collection.
+    """
+
+    def __init__(
+        self,
+        ivf_threshold: int = IVF_THRESHOLD,
+        probes: Optional[int] = None,
+        seed: int = 0,
+        rerank_factor: int = RERANK_FACTOR,
+    ):
+        self.ivf_threshold = ivf_threshold
+        self.probes = probes
+        self.rerank_factor = rerank_factor
+        self.seed = seed
+        self.ids: List[str] = []
+        self.ref_doc_ids: List[Optional[str]] = []
+        self.vectors: Optional[np.ndarray] = None
+        self.alive = np.empty(0, dtype=bool)
+        self.positions: Dict[str, int] = {}
+        self.ivf: Optional[IVFPQ] = None
+        self._size = 0
+
+    def __len__(self) -> int:
+        return len(self.positions)
+
+    def add(
+        self,
+        ids: List[str],
+        vectors: Iterable[Iterable[float]],
+        ref_doc_ids: Optional[List[Optional[str]]] = None,
+    ):
+        vectors = normalize(np.asarray(vectors, dtype=np.float32))
+
+        if not len(vectors):
+            return
+
+        self.delete(ids)
+
+        ref_doc_ids = ref_doc_ids or [None] * len(ids)
+        start = self._size
+        self._reserve(start + len(vectors), vectors.shape[1])
+        self.vectors[start : start + len(vectors)] = vectors
+        self.alive = np.concatenate([self.alive, np.ones(len(vectors), dtype=bool)])
+
+        for offset, (id_, ref_doc_id) in enumerate(zip(ids, ref_doc_ids)):
+            self.ids.append(id_)
+            self.ref_doc_ids.append(ref_doc_id)
+            self.positions[id_] = start + offset
+
+        self._size += len(vectors)
+
+        if self.ivf:
+            self.ivf.add(vectors)
+
+        # Retrain once the collection has doubled since the lists were built
+        if len(self.positions) >= self.ivf_threshold and (
+            not self.ivf or self._size > 2 * self.ivf.trained_size
+        ):
+            self._train_ivf()
+
+    def delete(self, ids: Iterable[str]):
+        for id_ in ids:
+            position = self.positions.pop(id_, None)
+
+            if position is not None:
+                self.alive[position] = False
+
+        if self._size and len(self.positions) < self._size / 2:
+            self.compact()
+
+    def delete_ref_doc(self, ref_doc_id: str):
+        self.delete(
+            [
+                id_
+                for id_, position in list(self.positions.items())
+                if self.ref_doc_ids[position] == ref_doc_id
+            ]
+        )
+
+    def compact(self):
+        keep = np.flatnonzero(self.alive[: self._size])
+
+        if len(keep) == self._size:
+            return
+
+        if self.ivf:
+            self.ivf.keep(keep)
+
+        self._set_arrays(
+            [self.ids[position] for position in keep],
+            [self.ref_doc_ids[position] for position in keep],
+            self.vectors[keep],
+        )
+
+    def search(
+        self, query: Iterable[float], k: int, exact: bool = False
+    ) -> Tuple[List[str], List[float]]:
+        if not self.positions:
+            return [], []
+
+        query = normalize(np.asarray(query, dtype=np.float32))
+        vectors = self.vectors[: self._size]
+
+        if exact or len(self.positions) < self.ivf_threshold:
+            scores = vectors @ query
+            scores[~self.alive[: self._size]] = -np.inf
+            positions = top_k(scores, min(k, len(self.positions)))
+        else:
+            if self.ivf is None:
+                self._train_ivf()
+
+            probes = self.probes or max(MIN_PROBES, self.ivf.lists // PROBES_DIVISOR)
+            candidates = self.ivf.search(query, k * self.rerank_factor, probes)
+            candidates = candidates[self.alive[candidates]]
+            scores = vectors[candidates] @ query
+            positions = candidates[top_k(scores, k)]
+
+        selected = [int(position) for position in positions]
+        result_scores = (vectors[selected] @ query).tolist()
+        return [self.ids[position] for position in selected], result_scores
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        self.compact()
+
+        arrays = {
+            "ids": np.asarray(self.ids, dtype=str),
+            "ref_doc_ids": np.asarray(
+                [ref_doc_id or "" for ref_doc_id in self.ref_doc_ids], dtype=str
+            ),
+            "vectors": (
+                self.vectors[: self._size]
+                if self.vectors is not None
+                else np.empty((0, 0), dtype=np.float32)
+            ),
+        }
+
+        if self.ivf:
+            arrays.update(self.ivf.to_arrays())
+
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray], **kwargs) -> "VectorIndex":
+        index = cls(**kwargs)
+
+        if len(arrays["ids"]):
+            index._set_arrays(
+                arrays["ids"].tolist(),
+                [ref_doc_id or None for ref_doc_id in arrays["ref_doc_ids"].tolist()],
+                np.asarray(arrays["vectors"], dtype=np.float32),
+            )
+
+        if "ivf_centroids" in arrays:
+            index.ivf = IVFPQ.from_arrays(arrays, index.seed)
+
+        return index
+
+    def _set_arrays(
+        self, ids: List[str], ref_doc_ids: List[Optional[str]], vectors: np.ndarray
+    ):
+        self.ids = ids
+        self.ref_doc_ids = ref_doc_ids
+        self.vectors = vectors
+        self.alive = np.ones(len(ids), dtype=bool)
+        self.positions = {id_: position for position, id_ in enumerate(ids)}
+        self._size = len(ids)
+
+    def _reserve(self, size: int, dim: int):
+        capacity = 0 if self.vectors is None else len(self.vectors)
+
+        if size <= capacity:
+            return
+
+        vectors = np.empty((max(size, capacity * 2), dim), dtype=np.float32)
+
+        if self.vectors is not None:
+            vectors[: self._size] = self.vectors[: self._size]
+
+        self.vectors = vectors
+
+    def _train_ivf(self):
+        vectors = self.vectors[: self._size]
+        dim = vectors.shape[1]
+        lists = max(1, int(np.sqrt(self._size)))
+
+        self.ivf = IVFPQ(dim, lists, choose_subspaces(dim), self.seed)
+        self.ivf.train(vectors)
+        self.ivf.add(vectors)
@@ -31,6 +31,7 @@ from controllers.voice import router as voice_router
 from controllers.workspace import router as workspace_router
 from controllers.user_account_access import router as user_account_access_router
 from controllers.pod import router as pod_router
+from controllers.pubsub import router as pubsub_router
 from controllers.resource import router as resource_router
 from controllers.template import router as template_router
 from models import *  # noqa: F403
@@ -100,6 +101,7 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 app.add_middleware(CustomCORSMiddleware)
@@ -139,6 +141,7 @@ app.include_router(fine_tuning_router, prefix="/fine-tuning", include_in_schema=
 app.include_router(voice_router, prefix="/voice", include_in_schema=True)
 app.include_router(user_account_access_router, prefix="/user-account-access", include_in_schema=False)
 app.include_router(pod_router, prefix="/pod", include_in_schema=False)
+app.include_router(pubsub_router, prefix="/pubsub", include_in_schema=False)
 app.include_router(resource_router, prefix="/resource", include_in_schema=False)
 app.include_router(template_router, prefix="/template", include_in_schema=False)
 
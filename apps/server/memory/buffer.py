@@ -1,5 +1,5 @@
 from __future__ import annotations
-from typing import Any, Dict, List
+from typing import Any, Callable, Dict, List
 from langchain.memory.chat_memory import BaseChatMemory
 from typing import Sequence
 from langchain.schema.messages import (
@@ -62,6 +62,40 @@ def get_buffer_string(
     return "\n".join(string_messages)
 
 
+def estimate_tokens(text: str) -> int:
+    """Rough token count for when the model's tokenizer is not known"""
+    return len(text) // 4 + 1
+
+
+def get_window_messages(
+    messages: List[BaseMessage],
+    max_tokens: int,
+    count_tokens: Callable[[str], int] = estimate_tokens,
+) -> List[BaseMessage]:
+    """Keeps a leading summary and as many of the most recent messages as fit in max_tokens.
+
+    The summary is kept even when it alone is over the budget, since it stands in
+    for everything older.
+    """
+    summary = []
+
+    if messages and isinstance(messages[0], SystemMessage):
+        summary, messages = messages[:1], messages[1:]
+        max_tokens -= count_tokens(summary[0].content)
+
+    recent: List[BaseMessage] = []
+
+    for message in reversed(messages):
+        max_tokens -= count_tokens(message.content)
+
+        if max_tokens < 0:
+            break
+
+        recent.append(message)
+
+    return summary + list(reversed(recent))
+
+
 class ConversationBufferMemory(BaseChatMemory):
     """Buffer for storing conversation memory."""
 
@@ -0,0 +1,44 @@
+from typing import Optional
+from uuid import UUID
+
+from config import Config
+from memory.buffer import ConversationBufferMemory
+from memory.postgres.postgres_memory import PostgresMemory
+from memory.zep.zep_memory import ZepMemory
+
+
+def get_memory(
+    session_id: str,
+    memory_key: str = "chat_history",
+    return_messages: bool = True,
+    max_tokens: Optional[int] = None,
+    write_behind: bool = False,
+    exclude_message_id: Optional[UUID] = None,
+) -> ConversationBufferMemory:
+    """
+    Returns the conversation memory of a chat session from the backend set by
+    MEMORY_BACKEND: "zep" (default) or "postgres".
+
+    exclude_message_id is the stored prompt which is being answered. Postgres reads
+    the chat messages, so it leaves that one out, Zep only has it once it's saved.
+    """
+    if Config.MEMORY_BACKEND == "postgres":
+        # Messages are already stored with the chat, write_behind has nothing to queue
+        return PostgresMemory(
+            session_id=session_id,
+            message_window=Config.MEMORY_MESSAGE_WINDOW,
+            memory_key=memory_key,
+            return_messages=return_messages,
+            max_tokens=max_tokens,
+            exclude_message_id=exclude_message_id,
+        )
+
+    return ZepMemory(
+        session_id=session_id,
+        url=Config.ZEP_API_URL,
+        api_key=Config.ZEP_API_KEY,
+        memory_key=memory_key,
+        return_messages=return_messages,
+        max_tokens=max_tokens,
+        write_behind=write_behind,
+    )
@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+from typing import Any, Callable, Dict, Optional
+from uuid import UUID
+
+from langchain.schema.language_model import BaseLanguageModel
+from pydantic import Field
+
+from memory.buffer import (ConversationBufferMemory, estimate_tokens,
+                           get_buffer_string)
+from memory.postgres.postgres_memory_history import PostgresMemoryHistory
+
+
+class PostgresMemory(ConversationBufferMemory):
+    """Conversation memory read from the chat_message table, a drop-in for ZepMemory.
+
+    Chat messages are stored by PostgresChatMessageHistory as part of every chat, so
+    saving here only makes the next load see them, nothing is written twice and no
+    memory server is called. Older messages are kept as a rolling summary in the
+    chat_summary table, refreshed by the agent's model (see set_llm).
+    """
+
+    chat_memory: PostgresMemoryHistory
+    human_name: str = Field(default="Human")
+    ai_name: str = Field(default="AI")
+    auto_save: bool = Field(default=True)
+    max_tokens: Optional[int] = Field(default=None)
+    token_counter: Callable[[str], int] = Field(default=estimate_tokens)
+
+    def __init__(
+        self,
+        session_id: str,
+        message_window: int = 12,
+        output_key: Optional[str] = None,
+        input_key: Optional[str] = None,
+        return_messages: bool = False,
+        human_prefix: str = "Human",
+        ai_prefix: str = "AI",
+        memory_key: str = "history",
+        max_tokens: Optional[int] = None,
+        exclude_message_id: Optional[UUID] = None,
+    ):
+        """Initialize PostgresMemory.
+
+        Args:
+            session_id (str): Chat session of the messages.
+            message_window (int, optional): Recent messages kept as they are, older
+                                            ones are summarized. Defaults to 12.
+            output_key (Optional[str], optional): The key to use for the output message.
+                                              Defaults to None.
+            input_key (Optional[str], optional): The key to use for the input message.
+                                              Defaults to None.
+            return_messages (bool, optional): Does your prompt template expect a string
+                                              or a list of Messages? Defaults to False
+                                              i.e. return a string.
+            human_prefix (str, optional): The prefix to use for human messages.
+                                          Defaults to "Human".
+            ai_prefix (str, optional): The prefix to use for AI messages.
+                                       Defaults to "AI".
+            memory_key (str, optional): The key to use for the memory.
+                                        Defaults to "history".
+            max_tokens (Optional[int], optional): Token budget of the loaded history.
+                                        Defaults to None i.e. the summary and the
+                                        whole message window.
+            exclude_message_id (Optional[UUID], optional): Message left out of the
+                                        history, the prompt which is answered.
+                                        Defaults to None.
+        """
+
+        super().__init__(
+            chat_memory=PostgresMemoryHistory(
+                session_id, message_window, exclude_message_id=exclude_message_id
+            ),
+            output_key=output_key,
+            input_key=input_key,
+            return_messages=return_messages,
+            human_prefix=human_prefix,
+            ai_prefix=ai_prefix,
+            memory_key=memory_key,
+            max_tokens=max_tokens,
+        )
+
+    @property
+    def buffer(self) -> Any:
+        """Summary and recent messages of the session, within max_tokens if set"""
+        if self.max_tokens is None:
+            return super().buffer
+
+        messages = self.chat_memory.get_window(self.max_tokens, self.token_counter)
+
+        if self.return_messages:
+            return messages
+
+        return get_buffer_string(
+            messages, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix
+        )
+
+    def set_llm(self, llm: BaseLanguageModel):
+        """Counts history tokens with the agent's model and summarizes with it"""
+        self.token_counter = llm.get_num_tokens
+        self.chat_memory.llm = llm
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        # Nothing is queued, messages are stored by the chat history
+        return True
+
+    def save_human_message(self, content: str):
+        self.chat_memory.reset()
+
+    def save_ai_message(self, content: str):
+        self.chat_memory.reset()
+
+    def save_context(
+        self,
+        inputs: Dict[str, Any],
+        outputs: Dict[str, str],
+        metadata: Optional[Dict[str, Any]] = None,
+    ) -> None:
+        self.chat_memory.reset()
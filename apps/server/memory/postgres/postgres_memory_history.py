@@ -0,0 +1,162 @@
+from __future__ import annotations
+
+import re
+from typing import Callable, Dict, List, Optional, Tuple
+from uuid import UUID
+
+import sentry_sdk
+from langchain.memory.prompt import SUMMARY_PROMPT
+from langchain.schema import BaseChatMessageHistory, messages_from_dict
+from langchain.schema.language_model import BaseLanguageModel
+from langchain.schema.messages import BaseMessage, SystemMessage
+from sqlalchemy import Row
+
+from memory.buffer import (estimate_tokens, get_buffer_string,
+                           get_window_messages)
+from models.chat_message import ChatMessage
+from models.chat_summary import ChatSummaryModel
+from models.db import create_session
+
+
+class PostgresMemoryHistory(BaseChatMessageHistory):
+    """
+    Chat history read straight from the chat_message table, where every chat message
+    is already written by PostgresChatMessageHistory. Adding a message here writes
+    nothing. The most recent message_window messages are returned as they are, and
+    once twice as many are pending, the oldest message_window of them are folded
+    into the session's rolling summary by the llm, when one is set. A longer backlog
+    is folded one chunk per load, so no message is skipped by the summary.
+    The message of exclude_message_id, the prompt the agent answers, is stored
+    before the history is read and is left out, as the agent gets it as input.
+    """
+
+    def __init__(
+        self,
+        session_id: str,
+        message_window: int,
+        llm: Optional[BaseLanguageModel] = None,
+        exclude_message_id: Optional[UUID] = None,
+    ) -> None:
+        self.session_id = session_id
+        self.message_window = message_window
+        self.llm = llm
+        self.exclude_message_id = exclude_message_id
+        # Messages are read once and reused until a message is added
+        self._messages: Optional[List[BaseMessage]] = None
+        self._windows: Dict[Tuple[int, Callable[[str], int]], List[BaseMessage]] = {}
+
+    @property
+    def messages(self) -> List[BaseMessage]:  # type: ignore
+        """Summary and recent messages of the session, oldest first"""
+        if self._messages is None:
+            self._messages = self._load_messages()
+
+        return self._messages
+
+    def get_window(
+        self,
+        max_tokens: int,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ) -> List[BaseMessage]:
+        """Summary and the recent messages within max_tokens, memoized until a save"""
+        key = (max_tokens, count_tokens)
+
+        if key not in self._windows:
+            self._windows[key] = get_window_messages(
+                self.messages, max_tokens, count_tokens
+            )
+
+        return self._windows[key]
+
+    def add_message(self, message: BaseMessage) -> None:
+        # The chat already stored the message, only the next read has to see it
+        self.reset()
+
+    def clear(self) -> None:
+        self.reset()
+
+    def reset(self):
+        self._messages = None
+        self._windows.clear()
+
+    def _load_messages(self) -> List[BaseMessage]:
+        session = create_session()
+
+        try:
+            chat_summary = ChatSummaryModel.get_summary(session, self.session_id)
+            summary = chat_summary.summary if chat_summary else ""
+            summarized_until = chat_summary.summarized_until if chat_summary else None
+            rows = ChatMessage.get_session_messages(
+                session,
+                self.session_id,
+                after=summarized_until,
+                limit=self.message_window * 2,
+                exclude_id=self.exclude_message_id,
+            )
+            # The oldest pending messages, which never overlap the recent window
+            oldest_rows = (
+                ChatMessage.get_session_messages(
+                    session,
+                    self.session_id,
+                    after=summarized_until,
+                    limit=self.message_window,
+                    oldest_first=True,
+                    exclude_id=self.exclude_message_id,
+                )
+                if self.llm and len(rows) >= self.message_window * 2
+                else []
+            )
+        finally:
+            session.close()
+
+        if oldest_rows:
+            new_summary = self._refresh_summary(summary, oldest_rows)
+
+            if new_summary is not None:
+                summary = new_summary
+                rows = rows[: self.message_window]
+
+        messages = [self._to_message(row) for row in reversed(rows)]
+
+        if summary:
+            messages.insert(0, SystemMessage(content=summary))
+
+        return messages
+
+    def _refresh_summary(self, summary: str, rows: List[Row]) -> Optional[str]:
+        """Folds rows, oldest first, into the summary and stores it, None on failure"""
+        new_lines = get_buffer_string([self._to_message(row) for row in rows])
+        session = create_session()
+
+        # The summary only saves prompt tokens, memory still works without it
+        try:
+            summary = self.llm.predict(
+                SUMMARY_PROMPT.format(summary=summary, new_lines=new_lines)
+            )
+            ChatSummaryModel.set_summary(
+                session, self.session_id, summary, rows[-1].created_on
+            )
+            return summary
+        except Exception as err:
+            session.rollback()
+            sentry_sdk.capture_exception(err)
+            return None
+        finally:
+            session.close()
+
+    def _to_message(self, row: Row) -> BaseMessage:
+        message = messages_from_dict([row.message])[0]
+
+        if message.type == "ai":
+            author = row.agent_name or "AI"
+        else:
+            author = row.sender_name or "Human"
+
+        # Same metadata as Zep messages, read by get_buffer_string and OpenAI
+        message.additional_kwargs = {
+            **message.additional_kwargs,
+            "metadata": {"author": author},
+            "name": re.sub(r"[^a-zA-Z0-9_-]", "", author)[:64],
+        }
+
+        return message
@@ -1,13 +1,17 @@
 from __future__ import annotations
 
 import re
-from typing import TYPE_CHECKING, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Callable, Dict, List, Optional, Tuple
 
 from langchain.schema.messages import (AIMessage, BaseMessage, HumanMessage,
                                        SystemMessage)
 from langchain_community.chat_message_histories import \
     ZepChatMessageHistory as ZepChatMessageHistoryBase
 
+from memory.buffer import estimate_tokens, get_window_messages
+from memory.zep.zep_client import get_zep_client
+from memory.zep.zep_write_queue import zep_write_queue
+
 if TYPE_CHECKING:
     from zep_python import Memory, Message
 
@@ -15,6 +19,23 @@ if TYPE_CHECKING:
 class ZepChatMessageHistory(ZepChatMessageHistoryBase):
     """Extends Zep chat message history to add author name to metadata for OpenAI"""
 
+    def __init__(
+        self,
+        session_id: str,
+        url: str = "http://localhost:8000",
+        api_key: Optional[str] = None,
+        write_behind: bool = False,
+    ) -> None:
+        # A view over the shared client, so creating histories opens no connections
+        self.zep_client = get_zep_client(url, api_key)
+        self.session_id = session_id
+        # Queue messages and write them to Zep in the background
+        self.write_behind = write_behind
+        # The Zep memory is fetched once and reused until a message is added
+        self._memory: Optional[Memory] = None
+        self._memory_loaded = False
+        self._windows: Dict[Tuple[int, Callable[[str], int]], List[BaseMessage]] = {}
+
     @property
     def messages(self) -> List[BaseMessage]:
         """Retrieve messages from Zep memory"""
@@ -32,24 +53,80 @@ class ZepChatMessageHistory(ZepChatMessageHistoryBase):
             msg: Message
 
             for msg in zep_memory.messages:
-                author: str = msg.metadata.get("author")
-
-                metadata: Dict = {
-                    "uuid": msg.uuid,
-                    "created_at": msg.created_at,
-                    "token_count": msg.token_count,
-                    "metadata": msg.metadata,
-                    "name": re.sub(r"[^a-zA-Z0-9_-]", "", author)[
-                        :64
-                    ],  # add author for OpenAI chat completions in "name" field
-                }
-                if msg.role == "ai":
-                    messages.append(
-                        AIMessage(content=msg.content, additional_kwargs=metadata)
-                    )
-                else:
-                    messages.append(
-                        HumanMessage(content=msg.content, additional_kwargs=metadata)
-                    )
+                messages.append(self._to_message(msg))
 
         return messages
+
+    def get_window(
+        self,
+        max_tokens: int,
+        count_tokens: Callable[[str], int] = estimate_tokens,
+    ) -> List[BaseMessage]:
+        """Summary and the recent messages within max_tokens, memoized until a save"""
+        key = (max_tokens, count_tokens)
+
+        if key in self._windows:
+            return self._windows[key]
+
+        window = get_window_messages(self.messages, max_tokens, count_tokens)
+        self._windows[key] = window
+        return window
+
+    def add_message(
+        self, message: BaseMessage, metadata: Optional[Dict[str, Any]] = None
+    ) -> None:
+        if self.write_behind:
+            from zep_python import Message
+
+            zep_write_queue.put(
+                self.zep_client,
+                self.session_id,
+                Message(content=message.content, role=message.type, metadata=metadata),
+            )
+        else:
+            super().add_message(message, metadata=metadata)
+
+        self._reset_memory()
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until the queued messages of the session are written to Zep"""
+        if not self.write_behind:
+            return True
+
+        return zep_write_queue.flush(self.zep_client, self.session_id, timeout)
+
+    def clear(self) -> None:
+        self.flush()
+        super().clear()
+        self._reset_memory()
+
+    def _get_memory(self) -> Optional[Memory]:
+        if not self._memory_loaded:
+            # Reads see the messages this history saved
+            self.flush()
+            self._memory = super()._get_memory()
+            self._memory_loaded = True
+
+        return self._memory
+
+    def _reset_memory(self):
+        self._memory = None
+        self._memory_loaded = False
+        self._windows.clear()
+
+    def _to_message(self, msg: Message) -> BaseMessage:
+        author: str = msg.metadata.get("author")
+
+        metadata: Dict = {
+            "uuid": msg.uuid,
+            "created_at": msg.created_at,
+            "token_count": msg.token_count,
+            "metadata": msg.metadata,
+            "name": re.sub(r"[^a-zA-Z0-9_-]", "", author)[
+                :64
+            ],  # add author for OpenAI chat completions in "name" field
+        }
+        if msg.role == "ai":
+            return AIMessage(content=msg.content, additional_kwargs=metadata)
+
+        return HumanMessage(content=msg.content, additional_kwargs=metadata)
@@ -0,0 +1,41 @@
+from __future__ import annotations
+
+import threading
+from typing import TYPE_CHECKING, Dict, Optional, Tuple
+
+if TYPE_CHECKING:
+    from zep_python import ZepClient
+
+# One client per Zep server and API key, shared by every memory of the process
+zep_clients: Dict[Tuple[str, Optional[str]], ZepClient] = {}
+zep_clients_lock = threading.Lock()
+
+
+def get_zep_client(url: str, api_key: Optional[str] = None) -> ZepClient:
+    """
+    Returns the shared Zep client for a server. Its HTTP clients keep a pool of
+    keep-alive connections, and the server healthcheck runs once per process instead
+    of once per memory object.
+    """
+    try:
+        from zep_python import ZepClient
+    except ImportError:
+        raise ImportError(
+            "Could not import zep-python package. "
+            "Please install it with `pip install zep-python`."
+        )
+
+    key = (url, api_key)
+    client = zep_clients.get(key)
+
+    if client:
+        return client
+
+    with zep_clients_lock:
+        client = zep_clients.get(key)
+
+        if not client:
+            client = ZepClient(base_url=url, api_key=api_key)
+            zep_clients[key] = client
+
+    return client
@@ -1,7 +1,8 @@
 from __future__ import annotations
-from typing import Any, Dict, Optional
+from typing import Any, Callable, Dict, Optional
 from pydantic import Field
-from memory.buffer import ConversationBufferMemory
+from langchain.schema.language_model import BaseLanguageModel
+from memory.buffer import ConversationBufferMemory, estimate_tokens, get_buffer_string
 from memory.zep.zep_chat_message_history import ZepChatMessageHistory
 
 
@@ -53,6 +54,8 @@ class ZepMemory(ConversationBufferMemory):
     human_name: str = Field(default="Human")
     ai_name: str = Field(default="AI")
     auto_save: bool = Field(default=True)
+    max_tokens: Optional[int] = Field(default=None)
+    token_counter: Callable[[str], int] = Field(default=estimate_tokens)
 
     def __init__(
         self,
@@ -65,6 +68,8 @@ class ZepMemory(ConversationBufferMemory):
         human_prefix: str = "Human",
         ai_prefix: str = "AI",
         memory_key: str = "history",
+        max_tokens: Optional[int] = None,
+        write_behind: bool = False,
     ):
         """Initialize ZepMemory.
 
@@ -88,12 +93,22 @@ class ZepMemory(ConversationBufferMemory):
                                         Defaults to "history".
                                         Ensure that this matches the key used in
                                         chain's prompt template.
+            max_tokens (Optional[int], optional): Token budget of the loaded history.
+                                        When set, only the summary and the most
+                                        recent messages which fit are loaded,
+                                        counted with token_counter. Defaults to
+                                        None i.e. the whole Zep memory.
+            write_behind (bool, optional): Queue saved messages and write them to
+                                        Zep in batches from a background thread.
+                                        Call flush() at the end of the turn.
+                                        Defaults to False.
         """
 
         chat_message_history = ZepChatMessageHistory(
             session_id=session_id,
             url=url,
             api_key=api_key,
+            write_behind=write_behind,
         )
 
         super().__init__(
@@ -104,8 +119,32 @@ class ZepMemory(ConversationBufferMemory):
             human_prefix=human_prefix,
             ai_prefix=ai_prefix,
             memory_key=memory_key,
+            max_tokens=max_tokens,
         )
 
+    @property
+    def buffer(self) -> Any:
+        """Summary and recent messages of the session, within max_tokens if set"""
+        if self.max_tokens is None:
+            return super().buffer
+
+        messages = self.chat_memory.get_window(self.max_tokens, self.token_counter)
+
+        if self.return_messages:
+            return messages
+
+        return get_buffer_string(
+            messages, human_prefix=self.human_prefix, ai_prefix=self.ai_prefix
+        )
+
+    def set_llm(self, llm: BaseLanguageModel):
+        """Counts history tokens with the tokenizer of the agent's model"""
+        self.token_counter = llm.get_num_tokens
+
+    def flush(self, timeout: Optional[float] = None) -> bool:
+        """Waits until messages queued by write_behind are written to Zep"""
+        return self.chat_memory.flush(timeout)
+
     def save_human_message(self, content: str):
         self.chat_memory.add_user_message(
             content,
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import atexit
+import queue
+import threading
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+
+import sentry_sdk
+
+from config import Config
+
+if TYPE_CHECKING:
+    from zep_python import Message, ZepClient
+
+
+class ZepWriteQueue:
+    """
+    Write-behind queue for Zep messages. One worker thread drains it and adds the
+    pending messages of each session with a single add-memory call, in the order
+    they were saved. The queue is bounded, so when Zep falls behind, saving a
+    message blocks instead of letting the backlog grow without limit.
+    """
+
+    def __init__(self, maxsize: int, batch_size: int):
+        self.batch_size = batch_size
+        self._queue: "queue.Queue[Tuple[ZepClient, str, Message, int]]" = queue.Queue(
+            maxsize
+        )
+        # Sequence numbers per (client, session) of the last saved and written message
+        self._enqueued: Dict[Tuple[int, str], int] = {}
+        self._written: Dict[Tuple[int, str], int] = {}
+        # Keeps sequence numbers in queue order, never taken by the worker
+        self._put_lock = threading.Lock()
+        self._condition = threading.Condition()
+        self._worker: Optional[threading.Thread] = None
+
+    def put(self, client: ZepClient, session_id: str, message: Message):
+        key = (id(client), session_id)
+
+        with self._put_lock:
+            self._start_worker()
+            seq = self._enqueued.get(key, 0) + 1
+            self._enqueued[key] = seq
+            # Blocks while the queue is full
+            self._queue.put((client, session_id, message, seq))
+
+    def flush(
+        self, client: ZepClient, session_id: str, timeout: Optional[float] = None
+    ) -> bool:
+        """
+        Waits until every message saved so far for the session is written to Zep.
+        Returns False if the timeout expired first.
+        """
+        key = (id(client), session_id)
+        target = self._enqueued.get(key, 0)
+
+        with self._condition:
+            flushed = self._condition.wait_for(
+                lambda: self._written.get(key, 0) >= target, timeout
+            )
+
+        if flushed:
+            with self._put_lock:
+                # Forget sessions with nothing pending, they start over at 1
+                if self._enqueued.get(key) == target:
+                    self._enqueued.pop(key, None)
+                    self._written.pop(key, None)
+
+        return flushed
+
+    def flush_all(self, timeout: Optional[float] = None) -> bool:
+        targets = dict(self._enqueued)
+
+        with self._condition:
+            return self._condition.wait_for(
+                lambda: all(
+                    self._written.get(key, 0) >= seq for key, seq in targets.items()
+                ),
+                timeout,
+            )
+
+    def _start_worker(self):
+        if self._worker and self._worker.is_alive():
+            return
+
+        self._worker = threading.Thread(
+            target=self._run, name="zep-write-queue", daemon=True
+        )
+        self._worker.start()
+
+    def _run(self):
+        from zep_python import Memory
+
+        while True:
+            items = [self._queue.get()]
+
+            while len(items) < self.batch_size:
+                try:
+                    items.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            # Per session in first-saved order: client, messages and last sequence
+            batches: Dict[Tuple[int, str], Tuple[ZepClient, List[Message], int]] = {}
+
+            for client, session_id, message, seq in items:
+                key = (id(client), session_id)
+                _, messages, _ = batches.get(key, (client, [], 0))
+                messages.append(message)
+                batches[key] = (client, messages, seq)
+
+            for (_, session_id), (client, messages, seq) in batches.items():
+                try:
+                    client.memory.add_memory(session_id, Memory(messages=messages))
+                except Exception as err:
+                    # Memory is best effort, a failed batch must not stall flushes
+                    sentry_sdk.capture_exception(err)
+
+                with self._condition:
+                    self._written[(id(client), session_id)] = seq
+                    self._condition.notify_all()
+
+            for _ in items:
+                self._queue.task_done()
+
+
+zep_write_queue = ZepWriteQueue(
+    maxsize=Config.ZEP_WRITE_QUEUE_SIZE, batch_size=Config.ZEP_WRITE_BATCH_SIZE
+)
+
+# Write what is still queued before the process exits
+atexit.register(zep_write_queue.flush_all, Config.ZEP_WRITE_FLUSH_TIMEOUT)
@@ -3,7 +3,9 @@ from __future__ import annotations
 import uuid
 from typing import List
 
-from sqlalchemy import UUID, Boolean, Column, ForeignKey, Index, String, or_
+from sqlalchemy import (UUID, Boolean, Column, ForeignKey, Index, String, or_,
+                        select)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload, relationship
 from sqlalchemy.sql import and_
 
@@ -320,6 +322,31 @@ class AgentModel(BaseModel):
         )
         return agent
 
+    @classmethod
+    async def aget_agents_by_ids(
+        cls, session: AsyncSession, agent_ids: List[uuid.UUID]
+    ) -> List[AgentModel]:
+        """
+        Get Agents with configs and creator loaded, in a single query
+
+        Args:
+            session: The async database session.
+            agent_ids(List[UUID]) : Unique identifiers of Agents.
+
+        Returns:
+            List[Agent]: Found agents, missing or deleted ids are skipped.
+        """
+        result = await session.execute(
+            select(AgentModel)
+            .filter(
+                AgentModel.id.in_(agent_ids),
+                or_(AgentModel.is_deleted.is_(False), AgentModel.is_deleted.is_(None)),
+            )
+            .options(joinedload(AgentModel.configs))
+            .options(joinedload(AgentModel.creator))
+        )
+        return result.unique().scalars().all()
+
     @classmethod
     def get_by_parent_id(cls, db, parent_id, account):
         """
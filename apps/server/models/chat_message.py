@@ -1,9 +1,13 @@
 import uuid
+from datetime import datetime
+from typing import List, Optional
 
-from sqlalchemy import UUID, Column, ForeignKey, String
+from sqlalchemy import UUID, Column, ForeignKey, Index, Row, String, select
 from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.orm import relationship
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session, joinedload, relationship
 
+from models.agent import AgentModel
 from models.base_model import BaseModel
 from typings.account import AccountOutput
 
@@ -64,6 +68,11 @@ class ChatMessage(BaseModel):
         "AccountModel", foreign_keys=[sender_account_id], lazy="select"
     )
 
+    # Define indexes
+    __table_args__ = (
+        Index("ix_chat_message_session_id_created_on", "session_id", "created_on"),
+    )
+
     @classmethod
     def get_chat_message_by_id(cls, db, chat_message_id: UUID, account: AccountOutput):
         """
@@ -87,6 +96,81 @@ class ChatMessage(BaseModel):
 
         return chat_message
 
+    @classmethod
+    async def aget_chat_message_by_id(
+        cls, session: AsyncSession, chat_message_id: UUID, account: AccountOutput
+    ):
+        """
+        Get Chat message from chat_message_id with its agent, configs and creator loaded
+
+        Args:
+            session: The async database session.
+            chat_message_id(UUID) : Unique identifier of an Chat message.
+
+        Returns:
+            Chat message: Chat message object is returned.
+        """
+        result = await session.execute(
+            select(ChatMessage)
+            .filter(
+                ChatMessage.id == chat_message_id,
+                ChatMessage.sender_account_id == account.id,
+            )
+            .options(
+                joinedload(ChatMessage.agent).joinedload(AgentModel.configs),
+                joinedload(ChatMessage.agent).joinedload(AgentModel.creator),
+            )
+        )
+
+        return result.unique().scalars().first()
+
+    @classmethod
+    def get_session_messages(
+        cls,
+        session: Session,
+        session_id: str,
+        after: Optional[datetime] = None,
+        limit: Optional[int] = None,
+        oldest_first: bool = False,
+        exclude_id: Optional[UUID] = None,
+    ) -> List[Row]:
+        """
+        Messages of a chat session created after a point in time, newest first.
+
+        Args:
+            session: The database session.
+            session_id: Chat session of the messages.
+            after: Only messages created after it, all messages if None.
+            limit: Maximum number of messages.
+            oldest_first: Return the oldest messages first instead.
+            exclude_id: A message left out, like the prompt being answered.
+
+        Returns:
+            Rows of message, sender_name, agent_name and created_on.
+        """
+        query = (
+            select(
+                cls.message,
+                cls.sender_name,
+                AgentModel.name.label("agent_name"),
+                cls.created_on,
+            )
+            .outerjoin(AgentModel, AgentModel.id == cls.agent_id)
+            .where(cls.session_id == session_id)
+            .order_by(cls.created_on if oldest_first else cls.created_on.desc())
+        )
+
+        if after:
+            query = query.where(cls.created_on > after)
+
+        if exclude_id:
+            query = query.where(cls.id != exclude_id)
+
+        if limit:
+            query = query.limit(limit)
+
+        return session.execute(query).all()
+
     @staticmethod
     def update_voice_url_by_id(db, chat_message_id: UUID, new_voice_url: str):
         """
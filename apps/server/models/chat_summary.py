@@ -0,0 +1,79 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Optional
+
+from sqlalchemy import Column, DateTime, String, Text, or_, select, update
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models.base_model import BaseModel
+
+
+class ChatSummaryModel(BaseModel):
+    """
+    Rolling summary of a chat session's older messages, used by the Postgres memory.
+
+    Attributes:
+        session_id (String): Chat session the summary belongs to.
+        summary (Text): Summary of every message up to summarized_until.
+        summarized_until (DateTime): created_on of the last message in the summary.
+    """
+
+    __tablename__ = "chat_summary"
+
+    session_id = Column(String, primary_key=True)
+    summary = Column(Text, nullable=False, default="")
+    summarized_until = Column(DateTime(timezone=True), nullable=True)
+
+    def __repr__(self) -> str:
+        return (
+            f"ChatSummary(session_id={self.session_id}, "
+            f"summarized_until={self.summarized_until})"
+        )
+
+    @classmethod
+    def get_summary(
+        cls, session: Session, session_id: str
+    ) -> Optional[ChatSummaryModel]:
+        return session.execute(
+            select(cls).where(cls.session_id == session_id)
+        ).scalar_one_or_none()
+
+    @classmethod
+    def set_summary(
+        cls,
+        session: Session,
+        session_id: str,
+        summary: str,
+        summarized_until: datetime,
+    ) -> bool:
+        """
+        Stores the summary unless another worker already summarized further.
+        Returns whether the summary was stored.
+        """
+        now = datetime.utcnow()
+        session.execute(
+            insert(cls)
+            .values(
+                session_id=session_id,
+                summary="",
+                summarized_until=None,
+                created_on=now,
+                updated_on=now,
+            )
+            .on_conflict_do_nothing(index_elements=[cls.session_id])
+        )
+        result = session.execute(
+            update(cls)
+            .where(
+                cls.session_id == session_id,
+                or_(
+                    cls.summarized_until.is_(None),
+                    cls.summarized_until < summarized_until,
+                ),
+            )
+            .values(summary=summary, summarized_until=summarized_until, updated_on=now)
+        )
+        session.commit()
+        return result.rowcount > 0
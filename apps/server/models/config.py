@@ -1,19 +1,54 @@
 from __future__ import annotations
 
 import uuid
-from typing import List
+from typing import Dict, List, Optional, Tuple
 
 from fastapi_sqlalchemy.middleware import DBSessionMeta
-from sqlalchemy import UUID, Boolean, Column, ForeignKey, Index, String
+from sqlalchemy import UUID, Boolean, Column, ForeignKey, Index, String, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, relationship
+from sqlalchemy.orm.attributes import flag_modified, set_committed_value
 from sqlalchemy.sql import and_, or_
 
+from config import Config
 from exceptions import ConfigNotFoundException
 from models.base_model import BaseModel
 from typings.account import AccountOutput
 from typings.config import (AccountSettings, AccountVoiceSettings, ConfigInput,
                             ConfigQueryParams)
-from utils.encyption import decrypt_data, encrypt_data, is_encrypted
+from utils.cache import TTLCache
+from utils.encyption import decrypt_value, encrypt_data
+
+ACCOUNT_SETTINGS_KEYS = [
+    "open_api_key",
+    "hugging_face_access_token",
+    "replicate_api_token",
+    "pinecone_api_key",
+    "pinecone_environment",
+    "weaviate_url",
+    "weaviate_api_key",
+]
+
+ACCOUNT_VOICE_SETTINGS_KEYS = [
+    "DEEPGRAM_API_KEY",
+    "AZURE_SPEECH_KEY",
+    "AZURE_SPEECH_REGION",
+    "PLAY_HT_API_KEY",
+    "PLAY_HT_USER_ID",
+    "ELEVEN_LABS_API_KEY",
+    # todo add openai tsss
+    # todo add 11labs
+]
+
+# Decrypted settings per account id, dropped whenever one of their keys changes.
+# Hits don't read the config table, other workers see a change once their entry
+# expires after ACCOUNT_SETTINGS_CACHE_TTL seconds
+account_settings_cache: TTLCache[AccountSettings] = TTLCache(
+    maxsize=Config.ACCOUNT_SETTINGS_CACHE_SIZE, ttl=Config.ACCOUNT_SETTINGS_CACHE_TTL
+)
+account_voice_settings_cache: TTLCache[AccountVoiceSettings] = TTLCache(
+    maxsize=Config.ACCOUNT_SETTINGS_CACHE_SIZE, ttl=Config.ACCOUNT_SETTINGS_CACHE_TTL
+)
 
 
 class ConfigModel(BaseModel):
@@ -31,6 +66,8 @@ class ConfigModel(BaseModel):
         value (String): The value of the tool configuration.
         key_type (String): The type of key used.
         is_secret (Boolean): Whether the tool configuration is a secret.
+        is_encrypted (Boolean): Whether the stored value is encrypted, None for rows
+            which predate the marker.
         is_required (Boolean): Whether the tool configuration is a required field.
         is_deleted (Boolean): Whether the tool configuration is deleted.
     """
@@ -66,6 +103,7 @@ class ConfigModel(BaseModel):
     value = Column(String)
     key_type = Column(String)
     is_secret = Column(Boolean)
+    is_encrypted = Column(Boolean, nullable=True)
     is_required = Column(Boolean)
     is_deleted = Column(Boolean, default=False, index=True)
 
@@ -115,9 +153,11 @@ class ConfigModel(BaseModel):
         cls.update_model_from_input(db_config, config)
         if db_config.is_secret:
             db_config.value = encrypt_data(db_config.value)
+        db_config.is_encrypted = bool(db_config.is_secret)
         db.session.add(db_config)
         db.session.flush()  # Flush pending changes to generate the config's ID
         db.session.commit()
+        cls.invalidate_account_settings(account.id, db_config.key)
 
         return db_config
 
@@ -137,15 +177,21 @@ class ConfigModel(BaseModel):
         old_config = cls.get_config_by_id(db=db, config_id=id, account=account)
         if not old_config:
             raise ConfigNotFoundException("Config not found")
+        old_key = old_config.key
         db_config = cls.update_model_from_input(
             config_model=old_config, config_input=config
         )
 
         if db_config.is_secret:
             db_config.value = encrypt_data(db_config.value)
+        db_config.is_encrypted = bool(db_config.is_secret)
+        # The loaded value was decrypted without marking it dirty, always write it back
+        # so value and is_encrypted can't get out of sync
+        flag_modified(db_config, "value")
         db_config.modified_by = user.id
         db.session.add(db_config)
         db.session.commit()
+        cls.invalidate_account_settings(account.id, old_key, db_config.key)
 
         return db_config
 
@@ -181,8 +227,7 @@ class ConfigModel(BaseModel):
         # Query the database with the filter conditions
         configs = db.session.query(ConfigModel).filter(and_(*filter_conditions)).all()
         for config in configs:
-            if config and config.is_secret and is_encrypted(config.value):
-                config.value = decrypt_data(config.value)
+            cls.decrypt_secret_value(config)
         return configs
 
     @classmethod
@@ -211,8 +256,7 @@ class ConfigModel(BaseModel):
             )
             .first()
         )
-        if config and config.is_secret and is_encrypted(config.value):
-            config.value = decrypt_data(config.value)
+        cls.decrypt_secret_value(config)
 
         return config
 
@@ -253,86 +297,175 @@ class ConfigModel(BaseModel):
     def get_account_settings(
         cls, session: Session, account_id: UUID
     ) -> AccountSettings:
-        keys = [
-            "open_api_key",
-            "hugging_face_access_token",
-            "replicate_api_token",
-            "pinecone_api_key",
-            "pinecone_environment",
-            "weaviate_url",
-            "weaviate_api_key",
-        ]
+        settings = account_settings_cache.get(str(account_id))
+
+        if settings:
+            return settings
 
         configs: List[ConfigModel] = (
             session.query(ConfigModel)
-            .filter(
-                ConfigModel.key.in_(keys),
-                ConfigModel.account_id == account_id,
-                or_(
-                    or_(
-                        ConfigModel.is_deleted.is_(False),
-                        ConfigModel.is_deleted is None,
-                    ),
-                    ConfigModel.is_deleted is None,
-                ),
-            )
+            .filter(*cls._account_keys_filter(ACCOUNT_SETTINGS_KEYS, account_id))
             .all()
         )
 
-        config = {}
+        settings = cls._to_account_settings(configs)
+        account_settings_cache.set(str(account_id), settings)
+        return settings
 
-        for cfg in configs:
-            config[cfg.key] = (
-                decrypt_data(cfg.value) if is_encrypted(cfg.value) else cfg.value
-            )
+    @classmethod
+    async def aget_account_settings(
+        cls, session: AsyncSession, account_id: UUID
+    ) -> AccountSettings:
+        settings = account_settings_cache.get(str(account_id))
 
-        return AccountSettings(
-            openai_api_key=config.get("open_api_key"),
-            hugging_face_access_token=config.get("hugging_face_access_token"),
-            replicate_api_token=config.get("replicate_api_token"),
-            pinecone_api_key=config.get("pinecone_api_key"),
-            pinecone_environment=config.get("pinecone_environment"),
-            weaviate_url=config.get("weaviate_url"),
-            weaviate_api_key=config.get("weaviate_api_key"),
+        if settings:
+            return settings
+
+        result = await session.execute(
+            select(ConfigModel).filter(
+                *cls._account_keys_filter(ACCOUNT_SETTINGS_KEYS, account_id)
+            )
         )
 
+        settings = cls._to_account_settings(result.scalars().all())
+        account_settings_cache.set(str(account_id), settings)
+        return settings
+
     @classmethod
     def get_account_voice_settings(
         cls, session: Session, account_id: UUID
     ) -> AccountVoiceSettings:
-        keys = [
-            "DEEPGRAM_API_KEY",
-            "AZURE_SPEECH_KEY",
-            "AZURE_SPEECH_REGION",
-            "PLAY_HT_API_KEY",
-            "PLAY_HT_USER_ID",
-            "ELEVEN_LABS_API_KEY",
-            # todo add openai tsss
-            # todo add 11labs
-        ]
+        voice_settings = account_voice_settings_cache.get(str(account_id))
+
+        if voice_settings:
+            return voice_settings
 
         configs: List[ConfigModel] = (
             session.query(ConfigModel)
-            .filter(
-                ConfigModel.key.in_(keys),
-                ConfigModel.account_id == account_id,
+            .filter(*cls._account_keys_filter(ACCOUNT_VOICE_SETTINGS_KEYS, account_id))
+            .all()
+        )
+
+        voice_settings = cls._to_account_voice_settings(configs)
+        account_voice_settings_cache.set(str(account_id), voice_settings)
+        return voice_settings
+
+    @classmethod
+    async def aget_account_voice_settings(
+        cls, session: AsyncSession, account_id: UUID
+    ) -> AccountVoiceSettings:
+        voice_settings = account_voice_settings_cache.get(str(account_id))
+
+        if voice_settings:
+            return voice_settings
+
+        result = await session.execute(
+            select(ConfigModel).filter(
+                *cls._account_keys_filter(ACCOUNT_VOICE_SETTINGS_KEYS, account_id)
+            )
+        )
+
+        voice_settings = cls._to_account_voice_settings(result.scalars().all())
+        account_voice_settings_cache.set(str(account_id), voice_settings)
+        return voice_settings
+
+    @classmethod
+    async def aget_account_settings_and_voice_settings(
+        cls, session: AsyncSession, account_id: UUID
+    ) -> Tuple[AccountSettings, AccountVoiceSettings]:
+        """Fetch both account settings groups with a single query, unless cached"""
+        settings = account_settings_cache.get(str(account_id))
+        voice_settings = account_voice_settings_cache.get(str(account_id))
+
+        if settings and voice_settings:
+            return settings, voice_settings
+
+        result = await session.execute(
+            select(ConfigModel).filter(
+                *cls._account_keys_filter(
+                    ACCOUNT_SETTINGS_KEYS + ACCOUNT_VOICE_SETTINGS_KEYS, account_id
+                )
+            )
+        )
+        configs: List[ConfigModel] = result.scalars().all()
+
+        settings = cls._to_account_settings(
+            [cfg for cfg in configs if cfg.key in ACCOUNT_SETTINGS_KEYS]
+        )
+        voice_settings = cls._to_account_voice_settings(
+            [cfg for cfg in configs if cfg.key in ACCOUNT_VOICE_SETTINGS_KEYS]
+        )
+        account_settings_cache.set(str(account_id), settings)
+        account_voice_settings_cache.set(str(account_id), voice_settings)
+        return settings, voice_settings
+
+    @classmethod
+    def invalidate_account_settings(
+        cls, account_id: Optional[UUID], *keys: Optional[str]
+    ):
+        """Drop cached account settings if any of the changed config keys is one of theirs"""
+        if not account_id:
+            return
+
+        if any(key in ACCOUNT_SETTINGS_KEYS for key in keys):
+            account_settings_cache.pop(str(account_id))
+
+        if any(key in ACCOUNT_VOICE_SETTINGS_KEYS for key in keys):
+            account_voice_settings_cache.pop(str(account_id))
+
+    @classmethod
+    def _account_keys_filter(cls, keys: List[str], account_id: UUID):
+        return [
+            ConfigModel.key.in_(keys),
+            ConfigModel.account_id == account_id,
+            or_(
                 or_(
-                    or_(
-                        ConfigModel.is_deleted.is_(False),
-                        ConfigModel.is_deleted is None,
-                    ),
+                    ConfigModel.is_deleted.is_(False),
                     ConfigModel.is_deleted is None,
                 ),
+                ConfigModel.is_deleted is None,
+            ),
+        ]
+
+    @classmethod
+    def decrypt_secret_value(cls, config: ConfigModel):
+        """
+        Decrypt a secret config value in place for the response. The change is not
+        tracked, so a later commit in the same session can't store the plain value.
+        """
+        if config and config.is_secret:
+            set_committed_value(
+                config, "value", decrypt_value(config.value, config.is_encrypted)
             )
-            .all()
-        )
 
+    @classmethod
+    def decrypt_configs(cls, configs: List[ConfigModel]) -> Dict[str, str]:
         config = {}
 
         for cfg in configs:
-            config[cfg.key] = (
-                decrypt_data(cfg.value) if is_encrypted(cfg.value) else cfg.value
-            )
+            config[cfg.key] = decrypt_value(cfg.value, cfg.is_encrypted)
+
+        return config
+
+    @classmethod
+    def _to_account_settings(cls, configs: List[ConfigModel]) -> AccountSettings:
+        config = cls.decrypt_configs(configs)
+
+        return AccountSettings(
+            openai_api_key=config.get("open_api_key"),
+            hugging_face_access_token=config.get("hugging_face_access_token"),
+            replicate_api_token=config.get("replicate_api_token"),
+            pinecone_api_key=config.get("pinecone_api_key"),
+            pinecone_environment=config.get("pinecone_environment"),
+            weaviate_url=config.get("weaviate_url"),
+            weaviate_api_key=config.get("weaviate_api_key"),
+        )
+
+    @classmethod
+    def _to_account_voice_settings(
+        cls, configs: List[ConfigModel]
+    ) -> AccountVoiceSettings:
+        config = cls.decrypt_configs(configs)
 
         return AccountVoiceSettings(
             DEEPGRAM_API_KEY=config.get("DEEPGRAM_API_KEY"),
@@ -356,3 +489,4 @@ class ConfigModel(BaseModel):
 
         db_config.is_deleted = True
         db.session.commit()
+        cls.invalidate_account_settings(account.id, db_config.key)
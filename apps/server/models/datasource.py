@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import uuid
+from typing import Optional
 
 from sqlalchemy import UUID, Boolean, Column, ForeignKey, Index, String, or_
 from sqlalchemy.orm import Session, relationship
@@ -191,6 +192,23 @@ class DatasourceModel(BaseModel):
         )
         return datasources
 
+    @classmethod
+    def get_index_version(cls, session: Session, datasource_id) -> Optional[str]:
+        """
+        Version of the persisted index of a datasource, which changes every time it is
+        re-indexed. None while the datasource is not ready to be queried.
+        """
+        row = (
+            session.query(DatasourceModel.status, DatasourceModel.updated_on)
+            .filter(DatasourceModel.id == datasource_id)
+            .first()
+        )
+
+        if not row or row.status != DatasourceStatus.READY.value:
+            return None
+
+        return row.updated_on.isoformat()
+
     @classmethod
     def delete_by_id(cls, db, datasource_id, account):
         db_datasource = (
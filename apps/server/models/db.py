@@ -1,4 +1,6 @@
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import (AsyncSession, async_sessionmaker,
+                                    create_async_engine)
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import Session
 
@@ -7,6 +9,17 @@ from config import Config
 engine = create_engine(Config.DB_URI, echo=Config.ENV == "local")
 Base = declarative_base()
 
+# Async engine used by the chat streaming path, so database round-trips do not
+# block the event loop that serves every other SSE stream of the worker
+async_engine = create_async_engine(
+    Config.DB_ASYNC_URI, echo=Config.ENV == "local", pool_pre_ping=True
+)
+async_session_factory = async_sessionmaker(async_engine, expire_on_commit=False)
+
 
 def create_session():
     return Session(bind=engine)
+
+
+def create_async_session() -> AsyncSession:
+    return async_session_factory()
@@ -0,0 +1,106 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+from sqlalchemy import (Column, DateTime, Integer, LargeBinary, String, func,
+                        select)
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from models.base_model import BaseModel
+
+
+class EmbeddingCacheModel(BaseModel):
+    """
+    Embeddings of chunk texts, shared by every datasource and account.
+
+    Attributes:
+        key (String): sha256 of the embedding model and the normalized text.
+        model (String): Name of the embedding model.
+        dimensions (Integer): Length of the embedding.
+        embedding (LargeBinary): The embedding as float32 bytes.
+        last_used_on (DateTime): When the entry was last written or read, for LRU eviction.
+    """
+
+    __tablename__ = "embedding_cache"
+
+    key = Column(String(64), primary_key=True)
+    model = Column(String, nullable=False)
+    dimensions = Column(Integer, nullable=False)
+    embedding = Column(LargeBinary, nullable=False)
+    last_used_on = Column(
+        DateTime(timezone=True), default=datetime.utcnow, nullable=False, index=True
+    )
+
+    def __repr__(self) -> str:
+        return f"EmbeddingCache(key={self.key}, model={self.model})"
+
+    @classmethod
+    def get_embeddings(
+        cls, session: Session, keys: List[str]
+    ) -> Dict[str, List[float]]:
+        """
+        Returns cached embeddings by key and marks them as used.
+        """
+        if not keys:
+            return {}
+
+        rows = session.execute(
+            select(cls.key, cls.embedding).where(cls.key.in_(keys))
+        ).all()
+
+        if rows:
+            session.query(cls).filter(cls.key.in_([row.key for row in rows])).update(
+                {cls.last_used_on: datetime.utcnow()}, synchronize_session=False
+            )
+            session.commit()
+
+        return {
+            row.key: np.frombuffer(row.embedding, dtype=np.float32).tolist()
+            for row in rows
+        }
+
+    @classmethod
+    def set_embeddings(
+        cls, session: Session, model: str, embeddings: Dict[str, List[float]]
+    ):
+        if not embeddings:
+            return
+
+        now = datetime.utcnow()
+        statement = insert(cls).values(
+            [
+                {
+                    "key": key,
+                    "model": model,
+                    "dimensions": len(embedding),
+                    "embedding": np.asarray(embedding, dtype=np.float32).tobytes(),
+                    "last_used_on": now,
+                    "created_on": now,
+                    "updated_on": now,
+                }
+                for key, embedding in embeddings.items()
+            ]
+        )
+        session.execute(statement.on_conflict_do_nothing(index_elements=[cls.key]))
+        session.commit()
+
+    @classmethod
+    def evict(cls, session: Session, max_entries: int) -> int:
+        """
+        Deletes the least recently used entries above max_entries.
+        """
+        count = session.scalar(select(func.count()).select_from(cls))
+        excess = count - max_entries
+
+        if excess <= 0:
+            return 0
+
+        oldest = select(cls.key).order_by(cls.last_used_on.asc()).limit(excess)
+        session.query(cls).filter(cls.key.in_(oldest.scalar_subquery())).delete(
+            synchronize_session=False
+        )
+        session.commit()
+        return excess
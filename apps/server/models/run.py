@@ -3,6 +3,7 @@ from __future__ import annotations
 import uuid
 
 from sqlalchemy import UUID, Boolean, Column, ForeignKey, String
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, relationship
 from sqlalchemy.sql import or_
 
@@ -98,6 +99,32 @@ class RunModel(BaseModel):
 
         return db_run
 
+    @classmethod
+    async def acreate_run(cls, session: AsyncSession, run: RunInput, user, account):
+        """
+        Creates a new run with the provided configuration using async session.
+
+        Args:
+            session: The async database session.
+            run: The object containing the run details.
+
+        Returns:
+            Run: The created run.
+
+        """
+        db_run = RunModel(
+            created_by=user.id,
+            account_id=account.id,
+        )
+
+        cls.update_model_from_input(db_run, run)
+
+        session.add(db_run)
+        await session.flush()  # Flush pending changes to generate the run's ID
+        await session.commit()
+
+        return db_run
+
     @classmethod
     def update_model_from_input(cls, run_model: RunModel, run_input: RunInput):
         for field in RunInput.__annotations__.keys():
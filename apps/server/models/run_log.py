@@ -2,14 +2,16 @@ from __future__ import annotations
 
 import uuid
 from datetime import datetime
-from typing import Dict
+from typing import Dict, List, Optional, Tuple
 
-from sqlalchemy import UUID, Boolean, Column, DateTime, ForeignKey, String
+from sqlalchemy import (UUID, Boolean, Column, DateTime, ForeignKey, String,
+                        tuple_, update)
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import Session, relationship
 from sqlalchemy.sql import or_
 
 from models.base_model import BaseModel
+from models.run_log_message import RunLogMessageModel
 from typings.run import RunLogInput, RunLogType
 
 
@@ -31,6 +33,7 @@ class RunLogModel(BaseModel):
 
     name = Column(String)
     type = Column(String)  # LLM, Tool
+    # Legacy storage, messages live in run_log_message now
     messages = Column(JSONB)
 
     start_date = Column(DateTime(timezone=True), default=datetime.utcnow)
@@ -114,39 +117,31 @@ class RunLogModel(BaseModel):
         return db_run_log
 
     @classmethod
-    def add_message_to_latest_run_log(
+    def append_messages(
         cls,
         session: Session,
-        run_id: UUID,
-        type: RunLogType,
-        message: Dict,
+        run_log_id: UUID,
+        run_id: Optional[UUID],
+        messages: List[Tuple[int, Dict]],
+        end_date: datetime,
         user_id: UUID,
     ):
-        # Get the latest run log by the 'created_on' field
-        old_run_log = (
-            session.query(RunLogModel)
-            .filter(RunLogModel.run_id == run_id, RunLogModel.type == type.value)
-            .order_by(RunLogModel.created_on.desc())
-            .first()
+        """
+        Appends (seq, message) pairs as run_log_message rows, the run log row itself
+        only gets its end date bumped. Doesn't commit.
+        """
+        RunLogMessageModel.create_messages(session, run_log_id, run_id, messages)
+
+        session.execute(
+            update(RunLogModel)
+            .where(RunLogModel.id == run_log_id)
+            .values(
+                end_date=end_date,
+                modified_by=user_id,
+                updated_on=datetime.utcnow(),
+            )
         )
 
-        # If the run log does not exist, raise an exception
-        if not old_run_log:
-            raise Exception("Run log not found")
-
-        new_messages = list(old_run_log.messages) if old_run_log.messages else []
-        new_messages.append(message)
-
-        old_run_log.end_date = datetime.utcnow()
-        old_run_log.messages = new_messages
-        old_run_log.modified_by = user_id
-
-        # Commit the changes to the database
-        session.add(old_run_log)
-        session.commit()
-
-        return old_run_log
-
     @classmethod
     def update_model_from_input(cls, run_model: RunLogModel, run_input: RunLogInput):
         for field in RunLogInput.__annotations__.keys():
@@ -173,3 +168,49 @@ class RunLogModel(BaseModel):
             .all()
         )
         return run_logs
+
+    @classmethod
+    def get_run_logs_page(
+        cls,
+        session: Session,
+        run_id,
+        account,
+        after: Optional[Tuple[datetime, UUID]],
+        limit: Optional[int],
+    ) -> List[RunLogModel]:
+        """
+        Run logs ordered by (created_on, id), starting after the given cursor position.
+        All of them when limit is None.
+        """
+        query = session.query(RunLogModel).filter(
+            RunLogModel.run_id == run_id,
+            RunLogModel.account_id == account.id,
+            or_(RunLogModel.is_deleted.is_(False), RunLogModel.is_deleted.is_(None)),
+        )
+
+        if after:
+            query = query.filter(
+                tuple_(RunLogModel.created_on, RunLogModel.id) > tuple_(*after)
+            )
+
+        query = query.order_by(RunLogModel.created_on.asc(), RunLogModel.id.asc())
+
+        if limit:
+            query = query.limit(limit)
+
+        return query.all()
+
+    @classmethod
+    def get_run_log_by_id(cls, session: Session, run_log_id, run_id, account):
+        return (
+            session.query(RunLogModel)
+            .filter(
+                RunLogModel.id == run_log_id,
+                RunLogModel.run_id == run_id,
+                RunLogModel.account_id == account.id,
+                or_(
+                    RunLogModel.is_deleted.is_(False), RunLogModel.is_deleted.is_(None)
+                ),
+            )
+            .first()
+        )
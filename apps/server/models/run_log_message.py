@@ -0,0 +1,109 @@
+from __future__ import annotations
+
+import uuid
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import UUID, Column, ForeignKey, Integer, UniqueConstraint
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import Session
+
+from models.base_model import BaseModel
+
+
+class RunLogMessageModel(BaseModel):
+    """
+    Model representing a single message of a run log. Messages are append-only and
+    ordered by seq within their run log.
+
+    Attributes:
+        id (UUID): The primary key of the message.
+        run_log_id (UUID): The ID of the run log the message belongs to.
+        run_id (UUID): The ID of the run, denormalized for per-run queries.
+        seq (Integer): Position of the message within its run log.
+        message (JSONB): The message itself (name, content and extra fields).
+    """
+
+    __tablename__ = "run_log_message"
+
+    id = Column(UUID, primary_key=True, index=True, default=uuid.uuid4)
+    run_log_id = Column(
+        UUID, ForeignKey("run_log.id", ondelete="CASCADE"), nullable=False
+    )
+    run_id = Column(
+        UUID, ForeignKey("run.id", ondelete="CASCADE"), nullable=True, index=True
+    )
+    seq = Column(Integer, nullable=False)
+    message = Column(JSONB, nullable=False)
+
+    # Also serves as the (run_log_id, seq) index for reads
+    __table_args__ = (
+        UniqueConstraint("run_log_id", "seq", name="uq_run_log_message_run_log_id_seq"),
+    )
+
+    def __repr__(self) -> str:
+        return (
+            f"RunLogMessage(id={self.id}, run_log_id={self.run_log_id}, "
+            f"seq={self.seq})"
+        )
+
+    @classmethod
+    def create_messages(
+        cls,
+        session: Session,
+        run_log_id: UUID,
+        run_id: Optional[UUID],
+        messages: List[Tuple[int, Dict]],
+    ):
+        """
+        Appends (seq, message) pairs to a run log. Doesn't commit.
+        """
+        session.add_all(
+            [
+                RunLogMessageModel(
+                    id=uuid.uuid4(),
+                    run_log_id=run_log_id,
+                    run_id=run_id,
+                    seq=seq,
+                    message=message,
+                )
+                for seq, message in messages
+            ]
+        )
+
+    @classmethod
+    def get_messages_by_run_log_ids(
+        cls, session: Session, run_log_ids: List[UUID]
+    ) -> Dict[UUID, List[Dict]]:
+        if not run_log_ids:
+            return {}
+
+        rows = (
+            session.query(RunLogMessageModel.run_log_id, RunLogMessageModel.message)
+            .filter(RunLogMessageModel.run_log_id.in_(run_log_ids))
+            .order_by(RunLogMessageModel.run_log_id, RunLogMessageModel.seq)
+            .all()
+        )
+
+        messages: Dict[UUID, List[Dict]] = {}
+
+        for run_log_id, message in rows:
+            messages.setdefault(run_log_id, []).append(message)
+
+        return messages
+
+    @classmethod
+    def get_messages_page(
+        cls,
+        session: Session,
+        run_log_id: UUID,
+        after_seq: Optional[int],
+        limit: int,
+    ) -> List[RunLogMessageModel]:
+        query = session.query(RunLogMessageModel).filter(
+            RunLogMessageModel.run_log_id == run_log_id
+        )
+
+        if after_seq is not None:
+            query = query.filter(RunLogMessageModel.seq > after_seq)
+
+        return query.order_by(RunLogMessageModel.seq).limit(limit).all()
@@ -4,7 +4,8 @@ import uuid
 from typing import List
 
 from sqlalchemy import (UUID, Boolean, Column, ForeignKey, Index, String, and_,
-                        or_)
+                        or_, select)
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import joinedload, relationship
 
 from exceptions import TeamNotFoundException
@@ -273,6 +274,32 @@ class TeamModel(BaseModel):
         )
         return teams
 
+    @classmethod
+    async def aget_team_with_agents(cls, session: AsyncSession, account, id: str):
+        """
+        Async variant of get_team_with_agents. Everything the team runners touch
+        (agents with configs and creator, team configs) is eager loaded, since the
+        returned team is used after the session is closed.
+        """
+        result = await session.execute(
+            select(TeamModel)
+            .filter(
+                TeamModel.id == id,
+                or_(TeamModel.is_deleted.is_(False), TeamModel.is_deleted.is_(None)),
+            )
+            .options(
+                joinedload(TeamModel.team_agents)
+                .joinedload(TeamAgentModel.agent)
+                .joinedload(AgentModel.configs),
+                joinedload(TeamModel.team_agents)
+                .joinedload(TeamAgentModel.agent)
+                .joinedload(AgentModel.creator),
+                joinedload(TeamModel.configs),
+                joinedload(TeamModel.creator),
+            )
+        )
+        return result.unique().scalars().first()
+
     @classmethod
     def get_team_with_agents_by_parent_id(cls, db, account, parent_id: str):
         # todo later need to filter by account_id
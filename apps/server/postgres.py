@@ -10,6 +10,7 @@ from langchain.schema import (BaseChatMessageHistory, BaseMessage,
 from langchain_core.messages import AIMessage, HumanMessage
 
 from models.chat_message import ChatMessage
+from models.db import create_async_session
 
 logger = logging.getLogger(__name__)
 
@@ -63,7 +64,44 @@ class PostgresChatMessageHistory(BaseChatMessageHistory):
         voice_url: Optional[str] = None,
     ):
         # Append the message to the record in PostgreSQL
-        chat_message = ChatMessage(
+        chat_message = self._build_chat_message(message, parent_id, agent_id, voice_url)
+
+        db.session.add(chat_message)
+        db.session.commit()
+        db.session.refresh(chat_message)
+
+        return self._serialize_chat_message(chat_message, chat_message.parent)
+
+    async def acreate_message(
+        self,
+        message,
+        parent_id: Optional[str] = None,
+        agent_id: Optional[UUID] = None,
+        voice_url: Optional[str] = None,
+    ):
+        """Append the message to the record in PostgreSQL without blocking event loop"""
+        chat_message = self._build_chat_message(message, parent_id, agent_id, voice_url)
+
+        async with create_async_session() as session:
+            session.add(chat_message)
+            await session.commit()
+
+            # Columns are kept after the commit, but to_dict also reads the lazy
+            # relationships, which can only load inside run_sync
+            return await session.run_sync(
+                lambda _: self._serialize_chat_message(
+                    chat_message, chat_message.parent
+                )
+            )
+
+    def _build_chat_message(
+        self,
+        message,
+        parent_id: Optional[str] = None,
+        agent_id: Optional[UUID] = None,
+        voice_url: Optional[str] = None,
+    ) -> ChatMessage:
+        return ChatMessage(
             sender_user_id=self.sender_user_id,
             sender_account_id=self.sender_account_id,
             message=_message_to_dict(message),
@@ -77,14 +115,13 @@ class PostgresChatMessageHistory(BaseChatMessageHistory):
             voice_url=voice_url,
         )
 
-        db.session.add(chat_message)
-        db.session.commit()
-        db.session.refresh(chat_message)
-
+    def _serialize_chat_message(
+        self, chat_message: ChatMessage, parent: Optional[ChatMessage]
+    ) -> Dict:
         # Serialize the model instance's data dictionary
         data_dict = chat_message.to_dict()
-        if chat_message.parent:
-            parent_dict = chat_message.parent.to_dict()
+        if parent:
+            parent_dict = parent.to_dict()
             data_dict["parent"] = parent_dict
 
         data_json = json.dumps(
@@ -116,6 +153,31 @@ class PostgresChatMessageHistory(BaseChatMessageHistory):
             voice_url=voice_url,
         )
 
+    async def acreate_ai_message(
+        self,
+        message: str,
+        parent_id: Optional[str] = None,
+        agent_id: Optional[str] = None,
+        voice_url: Optional[str] = None,
+    ):
+        return await self.acreate_message(
+            AIMessage(content=message), parent_id, agent_id, voice_url
+        )
+
+    async def acreate_human_message(
+        self, message: str, voice_url: Optional[str] = None
+    ):
+        return await self.acreate_message(
+            HumanMessage(
+                content=message,
+                additional_kwargs={
+                    "name": self.sender_name,
+                },
+            ),
+            parent_id=self.parent_id,
+            voice_url=voice_url,
+        )
+
     def add_message(self, message: BaseMessage) -> str:
         """Append the message to the record in PostgreSQL"""
         return ""
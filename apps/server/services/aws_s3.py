@@ -46,6 +46,12 @@ class AWSS3Service:
 
         s3_client.download_file(Bucket=Config.AWS_S3_BUCKET, Key=key, Filename=filename)
 
+    @staticmethod
+    def get_etag(key: str) -> str:
+        """Get ETag of S3 object, which changes whenever its content does"""
+
+        return s3_client.head_object(Bucket=Config.AWS_S3_BUCKET, Key=key)["ETag"]
+
     @staticmethod
     def get_public_url(key: str) -> str:
         """Get public url for S3 object"""
@@ -1,8 +1,14 @@
-from typing import Dict, List, Optional, Union
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
 from uuid import UUID
 
+import sentry_sdk
 from fastapi import HTTPException
 from fastapi_sqlalchemy import db
+from starlette.concurrency import run_in_threadpool
 
 from agents.agent_simulations.authoritarian.authoritarian_speaker import \
     AuthoritarianSpeaker
@@ -14,6 +20,7 @@ from agents.plan_and_execute.plan_and_execute import PlanAndExecute
 from agents.team_base import TeamOfAgentsType
 from config import Config
 from exceptions import ChatNotFoundException
+from memory.get_memory import get_memory
 from memory.zep.zep_memory import ZepMemory
 from models.account import AccountModel
 from models.agent import AgentModel
@@ -21,6 +28,7 @@ from models.chat import ChatModel
 from models.chat_message import ChatMessage as ChatMessageModel
 from models.config import ConfigModel
 from models.datasource import DatasourceModel
+from models.db import create_async_session
 from models.run import RunModel
 from models.team import TeamModel
 from models.user import UserModel
@@ -39,6 +47,19 @@ from utils.chat import get_chat_session_id, parse_agent_mention
 from utils.configuration import \
     convert_model_to_response as convert_config_model_to_response
 
+logger = logging.getLogger(__name__)
+
+
+class ChatPreflight(NamedTuple):
+    run: RunModel
+    agents: List[AgentWithConfigsOutput]
+    prompt: str
+    team: Optional[TeamModel]
+    team_configs: Dict
+    settings: AccountSettings
+    voice_settings: AccountVoiceSettings
+    timings: Dict[str, float]
+
 
 async def create_user_message(body: ChatUserMessageInput, auth: UserAccount):
     """
@@ -147,17 +168,26 @@ async def process_chat_message(
     chat_id: str,
     voice_url: str,
 ):
-    run = RunModel.create_run(
-        db.session,
-        RunInput(
-            agent_id=agent_id, team_id=team_id, chat_id=chat_id, session_id=session_id
-        ),
-        provider_user,
-        provider_account,
+    preflight = await run_chat_preflight(
+        prompt=prompt,
+        agent_id=agent_id,
+        team_id=team_id,
+        parent_id=parent_id,
+        chat_id=chat_id,
+        session_id=session_id,
+        provider_account=provider_account,
+        provider_user=provider_user,
     )
 
+    run = preflight.run
+    agents = preflight.agents
+    prompt = preflight.prompt
+    team = preflight.team
+    team_configs = preflight.team_configs
+    settings = preflight.settings
+    voice_settings = preflight.voice_settings
+
     run_logs_manager = RunLogsManager(
-        session=db.session,
         run_id=run.id,
         user_id=sender_user_id,
         account_id=sender_account_id,
@@ -167,16 +197,6 @@ async def process_chat_message(
         session_id=session_id,
     )
 
-    agents: List[AgentWithConfigsOutput] = []
-    agents, prompt = handle_agent_mentions(prompt, provider_account, agents)
-    agents = append_agent_to_list(agent_id, provider_account, agents)
-    agents, prompt = retrieve_parent_message_and_agent(
-        parent_id, provider_account, agents, prompt
-    )
-
-    team_configs = {}
-    team_configs, team = retrieve_team_configs(team_id, provider_account, team_configs)
-
     current_agent_id = agents[0].agent.id if len(agents) == 1 else None
 
     (
@@ -184,7 +204,7 @@ async def process_chat_message(
         human_message_id,
         memory,
         chat_pubsub_service,
-    ) = create_and_send_chat_message(
+    ) = await create_and_send_chat_message(
         session_id=session_id,
         sender_name=sender_name,
         sender_user_id=sender_user_id,
@@ -200,58 +220,205 @@ async def process_chat_message(
         voice_url=voice_url,
     )
 
-    settings = ConfigModel.get_account_settings(db.session, provider_account.id)
-    # todo run async both
-    voice_settings = ConfigModel.get_account_voice_settings(
-        db.session, provider_account.id
-    )
-
     res: str = ""
 
-    if len(agents) > 0:
-        for agent_with_configs in agents:
-            async for token in run_conversational_agent(
-                agent_with_configs=agent_with_configs,
+    try:
+        if len(agents) > 0:
+            for agent_with_configs in agents:
+                async for token in run_conversational_agent(
+                    agent_with_configs=agent_with_configs,
+                    sender_name=sender_name,
+                    sender_user_id=sender_user_id,
+                    sender_account_id=sender_account_id,
+                    provider_account=provider_account,
+                    session_id=session_id,
+                    prompt=prompt,
+                    voice_url=voice_url,
+                    human_message_id=human_message_id,
+                    chat_pubsub_service=chat_pubsub_service,
+                    settings=settings,
+                    voice_settings=voice_settings,
+                    team_id=team_id,
+                    parent_id=parent_id,
+                    history=history,
+                    run_id=run.id,
+                    run_logs_manager=run_logs_manager,
+                ):
+                    yield token
+        elif team:
+            # Team runs are long and synchronous, keep them off the event loop
+            await run_in_threadpool(
+                handle_team_types,
                 sender_name=sender_name,
-                sender_user_id=sender_user_id,
-                sender_account_id=sender_account_id,
-                provider_account=provider_account,
                 session_id=session_id,
-                prompt=prompt,
-                voice_url=voice_url,
-                human_message_id=human_message_id,
-                chat_pubsub_service=chat_pubsub_service,
                 settings=settings,
-                voice_settings=voice_settings,
-                team_id=team_id,
-                parent_id=parent_id,
+                chat_pubsub_service=chat_pubsub_service,
+                team=team,
+                prompt=prompt,
                 history=history,
-                run_id=run.id,
+                human_message_id=human_message_id,
+                team_configs=team_configs,
+                provider_account=provider_account,
+                provider_user=provider_user,
                 run_logs_manager=run_logs_manager,
-            ):
-                yield token
-    elif team:
-        handle_team_types(
-            sender_name=sender_name,
-            session_id=session_id,
-            settings=settings,
-            chat_pubsub_service=chat_pubsub_service,
-            team=team,
-            prompt=prompt,
-            history=history,
-            human_message_id=human_message_id,
-            team_configs=team_configs,
-            provider_account=provider_account,
-            provider_user=provider_user,
-            run_logs_manager=run_logs_manager,
-        )
+            )
+    finally:
+        # Whatever the run logged after its last step boundary
+        run_logs_manager.flush()
 
     # return res
 
 
-def append_agent_to_list(agent_id, account, agents):
+@asynccontextmanager
+async def timed_stage(timings: Dict[str, float], stage: str):
+    """Record how long a pre-flight stage took, in ms, and trace it in Sentry"""
+    start = time.perf_counter()
+
+    with sentry_sdk.start_span(op="chat.preflight", description=stage) as span:
+        try:
+            yield
+        finally:
+            timings[stage] = round((time.perf_counter() - start) * 1000, 2)
+            span.set_data("duration_ms", timings[stage])
+
+
+async def run_preflight_stage(timings: Dict[str, float], stage: str, lookup, *args):
+    """
+    Run a single lookup in its own session, so stages can hit Postgres concurrently.
+    An AsyncSession can't be shared between concurrent tasks.
+    """
+    async with timed_stage(timings, stage):
+        async with create_async_session() as session:
+            return await lookup(session, *args)
+
+
+async def run_chat_preflight(
+    prompt: str,
+    agent_id: str,
+    team_id: str,
+    parent_id: str,
+    chat_id: str,
+    session_id: str,
+    provider_account: UserAccount,
+    provider_user: UserModel,
+) -> ChatPreflight:
+    """
+    Everything the chat needs from Postgres before the first LLM call. Lookups are
+    independent, so they are issued concurrently and resolved afterwards. The run
+    is only created once they resolved, so a 404 leaves no run behind.
+    """
+    timings: Dict[str, float] = {}
+    mentions = parse_agent_mention(prompt)
+    agent_ids = [mention_agent_id for mention_agent_id, _ in mentions]
+
+    if agent_id:
+        agent_ids.append(agent_id)
+
+    async def no_lookup():
+        return None
+
+    async with timed_stage(timings, "total"):
+        (
+            agent_models,
+            parent,
+            team,
+            (settings, voice_settings),
+        ) = await asyncio.gather(
+            (
+                run_preflight_stage(
+                    timings, "agents", AgentModel.aget_agents_by_ids, agent_ids
+                )
+                if agent_ids
+                else no_lookup()
+            ),
+            (
+                run_preflight_stage(
+                    timings,
+                    "parent_message",
+                    ChatMessageModel.aget_chat_message_by_id,
+                    parent_id,
+                    provider_account,
+                )
+                if parent_id
+                else no_lookup()
+            ),
+            (
+                run_preflight_stage(
+                    timings,
+                    "team",
+                    TeamModel.aget_team_with_agents,
+                    provider_account,
+                    team_id,
+                )
+                if team_id
+                else no_lookup()
+            ),
+            run_preflight_stage(
+                timings,
+                "account_settings",
+                ConfigModel.aget_account_settings_and_voice_settings,
+                provider_account.id,
+            ),
+        )
+
+        agents, prompt = resolve_chat_agents(
+            agent_models or [], mentions, agent_id, parent_id, parent, prompt
+        )
+
+        run = await run_preflight_stage(
+            timings,
+            "run",
+            RunModel.acreate_run,
+            RunInput(
+                agent_id=agent_id,
+                team_id=team_id,
+                chat_id=chat_id,
+                session_id=session_id,
+            ),
+            provider_user,
+            provider_account,
+        )
+
+    logger.info("Chat pre-flight timings (ms) for run %s: %s", run.id, timings)
+
+    team_configs = {config.key: config.value for config in team.configs} if team else {}
+
+    return ChatPreflight(
+        run=run,
+        agents=agents,
+        prompt=prompt,
+        team=team,
+        team_configs=team_configs,
+        settings=settings,
+        voice_settings=voice_settings,
+        timings=timings,
+    )
+
+
+def resolve_chat_agents(
+    agent_models: List[AgentModel],
+    mentions: List[Tuple[str, str]],
+    agent_id: Optional[str],
+    parent_id: Optional[str],
+    parent: Optional[ChatMessageModel],
+    prompt: str,
+) -> Tuple[List[AgentWithConfigsOutput], str]:
+    """
+    Pick the agents which answer the prompt: mentioned agents first, then the chat's
+    default agent, then the agent the user replies to.
+    """
+    agents_by_id = {str(agent.id): agent for agent in agent_models}
+    agents: List[AgentWithConfigsOutput] = []
+
+    for mention_agent_id, cleaned_prompt in mentions:
+        agent = agents_by_id.get(mention_agent_id.lower())
+        if not agent:
+            raise HTTPException(status_code=404, detail="Agent not found")
+        agents.append(convert_model_to_response(agent))
+        prompt = cleaned_prompt
+
     if agent_id:
-        agent = AgentModel.get_agent_by_id(db, agent_id)
+        agent = agents_by_id.get(str(agent_id).lower())
 
         if not agent:
             raise HTTPException(status_code=404, detail="Agent not found")
@@ -259,13 +426,8 @@ def append_agent_to_list(agent_id, account, agents):
         # If there are no mentions or user is not replying, use default agent from chat
         if len(agents) == 0:
             agents.append(convert_model_to_response(agent))
-    return agents
-
 
-def retrieve_parent_message_and_agent(parent_id, account, agents, prompt):
     if parent_id:
-        parent = ChatMessageModel.get_chat_message_by_id(db, parent_id, account)
-
         if not parent:
             raise HTTPException(status_code=404, detail="Parent message not found")
 
@@ -279,31 +441,6 @@ def retrieve_parent_message_and_agent(parent_id, account, agents, prompt):
     return agents, prompt
 
 
-def retrieve_team_configs(team_id, account, team_configs):
-    team = None  # Initialize team to None
-    if team_id:
-        team = TeamModel.get_team_with_agents(db, account, team_id)
-
-        if not team:
-            return {}, None  # Return empty dictionary and None if no team is found
-
-        for config in team.configs:
-            team_configs[config.key] = config.value
-    return team_configs, team
-
-
-def handle_agent_mentions(prompt: str, account, agents: List[AgentWithConfigsOutput]):
-    mentions = parse_agent_mention(prompt)
-    new_agents = agents.copy()
-    for agent_id, cleaned_prompt in mentions:
-        agent = AgentModel.get_agent_by_id(db, agent_id)
-        if not agent:
-            raise HTTPException(status_code=404, detail="Agent not found")
-        new_agents.append(convert_model_to_response(agent))
-        prompt = cleaned_prompt
-    return new_agents, prompt
-
-
 def handle_team_types(
     sender_name,
     session_id,
@@ -556,28 +693,13 @@ async def run_conversational_agent(
     team_id: Optional[UUID] = None,
     parent_id: Optional[UUID] = None,
 ):
-    data_sources = (
-        db.session.query(DatasourceModel)
-        .filter(DatasourceModel.id.in_(agent_with_configs.configs.datasources))
-        .all()
-    )
-
     tool_callback_handler = run_logs_manager.get_tool_callback_handler()
 
-    data_source_tools = get_datasource_tools(
-        data_sources,
-        settings,
-        provider_account,
+    data_source_tools, agent_tools = await run_in_threadpool(
+        get_conversational_agent_tools,
         agent_with_configs,
-        tool_callback_handler,
-    )
-
-    agent_tools = get_agent_tools(
-        agent_with_configs.configs.tools,
-        db,
         provider_account,
         settings,
-        agent_with_configs,
         tool_callback_handler,
     )
 
@@ -585,7 +707,9 @@ async def run_conversational_agent(
 
     if agent_with_configs.configs.source_flow == DataSourceFlow.PRE_RETRIEVAL.value:
         if len(data_source_tools) != 0:
-            pre_retrieved_context = data_source_tools[0]._run(prompt)
+            pre_retrieved_context = await run_in_threadpool(
+                data_source_tools[0]._run, prompt
+            )
 
         tools = agent_tools
     else:
@@ -609,7 +733,39 @@ async def run_conversational_agent(
         yield token
 
 
-def create_and_send_chat_message(
+def get_conversational_agent_tools(
+    agent_with_configs: AgentWithConfigsOutput,
+    provider_account: UserAccount,
+    settings: AccountSettings,
+    tool_callback_handler,
+):
+    data_sources = (
+        db.session.query(DatasourceModel)
+        .filter(DatasourceModel.id.in_(agent_with_configs.configs.datasources))
+        .all()
+    )
+
+    data_source_tools = get_datasource_tools(
+        data_sources,
+        settings,
+        provider_account,
+        agent_with_configs,
+        tool_callback_handler,
+    )
+
+    agent_tools = get_agent_tools(
+        agent_with_configs.configs.tools,
+        db,
+        provider_account,
+        settings,
+        agent_with_configs,
+        tool_callback_handler,
+    )
+
+    return data_source_tools, agent_tools
+
+
+async def create_and_send_chat_message(
     session_id: str,
     sender_name: str,
     sender_user_id: str,
@@ -636,16 +792,10 @@ def create_and_send_chat_message(
         run_id=run_id,
     )
 
-    human_message = history.create_human_message(prompt, voice_url=voice_url)
+    human_message = await history.acreate_human_message(prompt, voice_url=voice_url)
     human_message_id = UUID(human_message["id"])
 
-    memory = ZepMemory(
-        session_id=session_id,
-        url=Config.ZEP_API_URL,
-        api_key=Config.ZEP_API_KEY,
-        memory_key="chat_history",
-        return_messages=True,
-    )
+    memory = get_memory(session_id=session_id, exclude_message_id=human_message_id)
 
     memory.human_name = sender_name
 
@@ -657,7 +807,7 @@ def create_and_send_chat_message(
         chat_id=str(chat_id) if chat_id else None,
     )
 
-    chat_pubsub_service.send_chat_message(
+    await chat_pubsub_service.asend_chat_message(
         chat_message=human_message, local_chat_message_ref_id=local_chat_message_ref_id
     )
 
@@ -1,20 +1,170 @@
+import asyncio
+import hashlib
+import hmac
 import json
-from typing import Dict, Optional, Any
+import logging
+import threading
+import time
+from abc import ABC, abstractmethod
+from collections import defaultdict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Set, Tuple
+from uuid import UUID
+
 import sentry_sdk
-from azure.messaging.webpubsubservice import WebPubSubServiceClient
 from azure.core.exceptions import AzureError
-from azure.identity import DefaultAzureCredential
+from azure.messaging.webpubsubservice import WebPubSubServiceClient
+from azure.messaging.webpubsubservice.aio import \
+    WebPubSubServiceClient as AsyncWebPubSubServiceClient
+
 from config import Config
-from datetime import datetime
-from uuid import UUID
+
+logger = logging.getLogger(__name__)
+
+
+class PubSubBackend(ABC):
+    """
+    Transport for chat events. Backends which serve clients themselves (Redis,
+    in-memory) also implement join_group/leave_group for the websocket endpoint.
+    """
+
+    supports_websocket = False
+
+    @abstractmethod
+    def send_to_group(self, group: str, message: Any):
+        """Sends pubsub message to group"""
+
+    @abstractmethod
+    async def asend_to_group(self, group: str, message: Any):
+        """Sends pubsub message to group without blocking event loop"""
+
+    @abstractmethod
+    def get_client_access_token(self, user_id):
+        """Gets a client access token (url) for the given user_id"""
+
+    async def join_group(self, group: str, queue: asyncio.Queue):
+        """Starts delivering group messages of this process to the queue"""
+        raise NotImplementedError
+
+    async def leave_group(self, group: str, queue: asyncio.Queue):
+        raise NotImplementedError
+
+
+# Messages queued per websocket client before droppable ones are dropped
+CLIENT_QUEUE_SIZE = 1000
+
+# Events which the next one supersedes, so a slow client may miss them
+DROPPABLE_MESSAGE_TYPES = {"CHAT_STATUS", "user_typing", "user_stop_typing"}
+
+
+def is_droppable(message: Any) -> bool:
+    return isinstance(message, dict) and message.get("type") in DROPPABLE_MESSAGE_TYPES
+
+
+class LocalFanout:
+    """
+    Delivers group messages to the websocket connections of this process. Once a
+    client has max_queued messages waiting, droppable messages are dropped for it,
+    chat messages are always queued.
+    """
+
+    def __init__(self, max_queued: int = CLIENT_QUEUE_SIZE):
+        self.max_queued = max_queued
+        self.subscribers: Dict[str, Set[asyncio.Queue]] = defaultdict(set)
+        self.dropped_count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def join(self, group: str, queue: asyncio.Queue) -> bool:
+        """Returns True for the first subscriber of the group"""
+        self._loop = asyncio.get_running_loop()
+        is_first = group not in self.subscribers
+        self.subscribers[group].add(queue)
+        return is_first
+
+    def leave(self, group: str, queue: asyncio.Queue) -> bool:
+        """Returns True when the last subscriber of the group left"""
+        queues = self.subscribers.get(group)
+
+        if queues is None:
+            return False
+
+        queues.discard(queue)
+
+        if not queues:
+            del self.subscribers[group]
+            return True
+
+        return False
+
+    def deliver(self, group: str, message: Any):
+        try:
+            running_loop = asyncio.get_running_loop()
+        except RuntimeError:
+            running_loop = None
+
+        if self._loop and running_loop is not self._loop:
+            if not self._loop.is_closed():
+                self._loop.call_soon_threadsafe(self.deliver, group, message)
+            return
+
+        droppable = is_droppable(message)
+
+        for queue in list(self.subscribers.get(group, ())):
+            if droppable and queue.qsize() >= self.max_queued:
+                self.dropped_count += 1
+                continue
+
+            queue.put_nowait((group, message))
 
 
-class AzurePubSubService:
+def create_client_access_token(user_id, expires_in: int = 24 * 60 * 60) -> str:
+    """Signed token for the self-hosted websocket endpoint"""
+    expires_at = int(time.time()) + expires_in
+    payload = f"{user_id}.{expires_at}"
+    signature = hmac.new(
+        Config.JWT_SECRET_KEY.encode(), payload.encode(), hashlib.sha256
+    ).hexdigest()
+    return f"{payload}.{signature}"
+
+
+def verify_client_access_token(token: str) -> Optional[str]:
+    """Returns the user id of a valid token"""
+    try:
+        user_id, expires_at, signature = token.rsplit(".", 2)
+        expected = hmac.new(
+            Config.JWT_SECRET_KEY.encode(),
+            f"{user_id}.{expires_at}".encode(),
+            hashlib.sha256,
+        ).hexdigest()
+    except (AttributeError, ValueError):
+        return None
+
+    if not hmac.compare_digest(signature, expected) or int(expires_at) < time.time():
+        return None
+
+    return user_id
+
+
+def get_websocket_client_access_token(user_id):
+    token = create_client_access_token(user_id)
+    return {
+        "url": f"{Config.PUBSUB_WEBSOCKET_URL}?access_token={token}",
+        "token": token,
+    }
+
+
+class AzurePubSubService(PubSubBackend):
+    """
+    Azure Web PubSub client. Both clients are created once and reused, so sends go
+    over kept-alive connections instead of a new HTTP connection per message.
+    """
+
     def __init__(self):
-        self.credential = DefaultAzureCredential()
         self.service = WebPubSubServiceClient.from_connection_string(
             Config.AZURE_PUBSUB_CONNECTION_STRING, hub=Config.AZURE_PUBSUB_HUB_NAME
         )
+        self._async_service: Optional[AsyncWebPubSubServiceClient] = None
+        self._async_service_loop: Optional[asyncio.AbstractEventLoop] = None
 
     def send_to_group(self, group: str, message: Any):
         """Sends pubsub message to group"""
@@ -26,6 +176,16 @@ class AzurePubSubService:
         except AzureError as err:
             sentry_sdk.capture_exception(err)
 
+    async def asend_to_group(self, group: str, message: Any):
+        """Sends pubsub message to group without blocking event loop"""
+
+        try:
+            await self._get_async_service().send_to_group(
+                group=group, content_type="application/json", message=message
+            )
+        except AzureError as err:
+            sentry_sdk.capture_exception(err)
+
     def get_client_access_token(self, user_id):
         """Gets a client access token for the given user_id"""
 
@@ -38,6 +198,298 @@ class AzurePubSubService:
         except AzureError as err:
             sentry_sdk.capture_exception(err)
 
+    def _get_async_service(self) -> AsyncWebPubSubServiceClient:
+        # The aio transport session is bound to the event loop which created it
+        loop = asyncio.get_running_loop()
+
+        if self._async_service is None or self._async_service_loop is not loop:
+            self._async_service = AsyncWebPubSubServiceClient.from_connection_string(
+                Config.AZURE_PUBSUB_CONNECTION_STRING, hub=Config.AZURE_PUBSUB_HUB_NAME
+            )
+            self._async_service_loop = loop
+
+        return self._async_service
+
+
+class InMemoryPubSubService(PubSubBackend):
+    """
+    In-process backend for local runs, tests and load tests. Messages are kept per
+    group (up to max_messages), counted and fanned out to this process's websockets.
+    """
+
+    supports_websocket = True
+
+    def __init__(self, max_messages: int = 1000):
+        self.max_messages = max_messages
+        self.messages: Dict[str, List[Any]] = defaultdict(list)
+        self.sent_count = 0
+        self.fanout = LocalFanout()
+        self._lock = threading.Lock()
+
+    def send_to_group(self, group: str, message: Any):
+        """Sends pubsub message to group"""
+
+        with self._lock:
+            messages = self.messages[group]
+            messages.append(message)
+            del messages[: -self.max_messages]
+            self.sent_count += 1
+
+        self.fanout.deliver(group, message)
+
+    async def asend_to_group(self, group: str, message: Any):
+        """Sends pubsub message to group without blocking event loop"""
+
+        self.send_to_group(group, message)
+
+    def get_client_access_token(self, user_id):
+        """Gets a client access token for the given user_id"""
+
+        return get_websocket_client_access_token(user_id)
+
+    async def join_group(self, group: str, queue: asyncio.Queue):
+        self.fanout.join(group, queue)
+
+    async def leave_group(self, group: str, queue: asyncio.Queue):
+        self.fanout.leave(group, queue)
+
+
+class RedisPubSubService(PubSubBackend):
+    """
+    Redis pub/sub backend for self-hosted deployments, reusing the Redis which runs
+    for Celery. Each server process subscribes only to the groups its websocket
+    clients joined and fans messages out locally.
+    """
+
+    supports_websocket = True
+
+    def __init__(self, url: str, channel_prefix: str = "pubsub:"):
+        import redis
+        import redis.asyncio as aioredis
+
+        self.channel_prefix = channel_prefix
+        self.client = redis.Redis.from_url(url)
+        self.async_client = aioredis.Redis.from_url(url)
+        self.fanout = LocalFanout()
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+
+    def send_to_group(self, group: str, message: Any):
+        """Sends pubsub message to group"""
+
+        try:
+            self.client.publish(self._channel(group), self._encode(message))
+        except Exception as err:
+            sentry_sdk.capture_exception(err)
+
+    async def asend_to_group(self, group: str, message: Any):
+        """Sends pubsub message to group without blocking event loop"""
+
+        try:
+            await self.async_client.publish(self._channel(group), self._encode(message))
+        except Exception as err:
+            sentry_sdk.capture_exception(err)
+
+    def get_client_access_token(self, user_id):
+        """Gets a client access token for the given user_id"""
+
+        return get_websocket_client_access_token(user_id)
+
+    async def join_group(self, group: str, queue: asyncio.Queue):
+        if self.fanout.join(group, queue):
+            await self._get_pubsub().subscribe(self._channel(group))
+
+    async def leave_group(self, group: str, queue: asyncio.Queue):
+        if self.fanout.leave(group, queue):
+            await self._get_pubsub().unsubscribe(self._channel(group))
+
+    def _get_pubsub(self):
+        if self._pubsub is None:
+            self._pubsub = self.async_client.pubsub(ignore_subscribe_messages=True)
+
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.get_running_loop().create_task(self._listen())
+
+        return self._pubsub
+
+    async def _listen(self):
+        while True:
+            try:
+                if not self._pubsub.subscribed:
+                    await asyncio.sleep(0.1)
+                    continue
+
+                item = await self._pubsub.get_message(timeout=1.0)
+
+                if item and item["type"] == "message":
+                    channel = item["channel"].decode()
+                    group = channel[len(self.channel_prefix) :]
+                    self.fanout.deliver(group, json.loads(item["data"]))
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                sentry_sdk.capture_exception(err)
+                await asyncio.sleep(1)
+
+    def _channel(self, group: str) -> str:
+        return f"{self.channel_prefix}{group}"
+
+    def _encode(self, message: Any) -> str:
+        return json.dumps(message, cls=PubSubJSONEncoder)
+
+
+_pubsub_service: Optional[PubSubBackend] = None
+_pubsub_service_lock = threading.Lock()
+
+
+def get_pubsub_service() -> PubSubBackend:
+    """Process-wide PubSub backend selected by PUBSUB_BACKEND"""
+    global _pubsub_service
+
+    if _pubsub_service is None:
+        with _pubsub_service_lock:
+            if _pubsub_service is None:
+                if Config.PUBSUB_BACKEND == "memory":
+                    _pubsub_service = InMemoryPubSubService()
+                elif Config.PUBSUB_BACKEND == "redis":
+                    _pubsub_service = RedisPubSubService(Config.REDIS_URL)
+                else:
+                    _pubsub_service = AzurePubSubService()
+
+    return _pubsub_service
+
+
+class PubSubDispatcher:
+    """
+    Sends PubSub messages from bounded queues, so callers on the chat path never wait
+    on the PubSub HTTP call.
+
+    Groups are spread over the workers by hash, which keeps messages of one group in
+    order. A CHAT_STATUS replaces the status of its group which is still waiting as
+    the last queued item of the group, it never moves ahead of a message queued after
+    that status. When the queue is full a status is dropped and counted, statuses are
+    superseded by the next one anyway. Every other message, like CHAT_MESSAGE_ADDED,
+    waits for room in the queue instead.
+    """
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self.dropped_count = 0
+        self.coalesced_count = 0
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._queues: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+        # Queued status of a group while it's the last item queued for the group
+        self._pending_statuses: Dict[str, List[Dict]] = {}
+        # Messages of a group waiting for room in the queue
+        self._waiting_puts: Dict[str, int] = {}
+
+    async def publish(self, group: str, message: Dict):
+        """Queues the message, waits while the queue of the group is full"""
+        self._ensure_started()
+
+        if message.get("type") == "CHAT_STATUS":
+            await self._publish_status(group, message)
+            return
+
+        # A later status can't be coalesced into one queued before this message
+        self._pending_statuses.pop(group, None)
+        await self._put(group, ("message", message))
+
+    def publish_threadsafe(self, group: str, message: Dict) -> bool:
+        """Queues the message from another thread, False if the dispatcher isn't running"""
+        loop = self._loop
+
+        if not loop or loop.is_closed() or not loop.is_running():
+            return False
+
+        # Tasks start in the order they are scheduled, so the group stays in order
+        asyncio.run_coroutine_threadsafe(self.publish(group, message), loop)
+        return True
+
+    async def _publish_status(self, group: str, message: Dict):
+        pending = self._pending_statuses.get(group)
+
+        if pending:
+            pending[0] = message
+            self.coalesced_count += 1
+            return
+
+        # Holds the message, so a newer status can replace it while it's queued
+        status = [message]
+
+        if self._waiting_puts.get(group):
+            # Queued behind the messages of the group which wait for room
+            await self._put(group, ("status", status))
+        else:
+            try:
+                self._queue(group).put_nowait((group, ("status", status)))
+            except asyncio.QueueFull:
+                self.dropped_count += 1
+                logger.warning(
+                    "PubSub queue full, dropped status for group %s (%s dropped so far)",
+                    group,
+                    self.dropped_count,
+                )
+                return
+
+        self._pending_statuses[group] = status
+
+    async def _put(self, group: str, item: Tuple[str, Any]):
+        self._waiting_puts[group] = self._waiting_puts.get(group, 0) + 1
+
+        try:
+            await self._queue(group).put((group, item))
+        finally:
+            self._waiting_puts[group] -= 1
+
+            if not self._waiting_puts[group]:
+                del self._waiting_puts[group]
+
+    def _ensure_started(self):
+        loop = asyncio.get_running_loop()
+
+        if self._loop is loop:
+            return
+
+        self._loop = loop
+        self._pending_statuses = {}
+        self._waiting_puts = {}
+        self._queues = [
+            asyncio.Queue(maxsize=max(1, self.queue_size // self.workers))
+            for _ in range(self.workers)
+        ]
+        self._tasks = [loop.create_task(self._work(queue)) for queue in self._queues]
+
+    def _queue(self, group: str) -> asyncio.Queue:
+        return self._queues[hash(group) % self.workers]
+
+    async def _work(self, queue: asyncio.Queue):
+        service = get_pubsub_service()
+
+        while True:
+            group, (kind, value) = await queue.get()
+            message = value
+
+            if kind == "status":
+                if self._pending_statuses.get(group) is value:
+                    del self._pending_statuses[group]
+
+                message = value[0]
+
+            try:
+                await service.asend_to_group(group, message=message)
+            except Exception as err:
+                sentry_sdk.capture_exception(err)
+            finally:
+                queue.task_done()
+
+
+pubsub_dispatcher = PubSubDispatcher(
+    workers=Config.PUBSUB_DISPATCH_WORKERS, queue_size=Config.PUBSUB_QUEUE_SIZE
+)
+
 
 class ChatPubSubService:
     def __init__(
@@ -54,41 +506,65 @@ class ChatPubSubService:
         self.agent_id = agent_id
         self.chat_id = chat_id
 
-        self.azure_pubsub_service = AzurePubSubService()
-
     def send_chat_message(
         self, chat_message: Dict, local_chat_message_ref_id: Optional[str] = None
     ):
         """Sends chat message object"""
 
-        self.azure_pubsub_service.send_to_group(
+        self._send(self._chat_message_payload(chat_message, local_chat_message_ref_id))
+
+    async def asend_chat_message(
+        self, chat_message: Dict, local_chat_message_ref_id: Optional[str] = None
+    ):
+        """Queues chat message object without blocking event loop"""
+
+        await pubsub_dispatcher.publish(
             self.session_id,
-            message={
-                "type": "CHAT_MESSAGE_ADDED",
-                "from": str(self.user_id),
-                "chat_message": chat_message,
-                "local_chat_message_ref_id": local_chat_message_ref_id,
-                "agent_id": self.agent_id,
-                "team_id": self.team_id,
-                "chat_id": self.chat_id,
-            },
+            self._chat_message_payload(chat_message, local_chat_message_ref_id),
         )
 
     def send_chat_status(self, config: Dict):
         """Sends chat status object"""
-        data = json.loads(json.dumps(config, cls=PubSubJSONEncoder))
 
-        self.azure_pubsub_service.send_to_group(
-            self.session_id,
-            message={
-                "type": "CHAT_STATUS",
-                "from": str(self.user_id),
-                "config": data,
-                "agent_id": self.agent_id,
-                "team_id": self.team_id,
-            },
+        self._send(self._chat_status_payload(config))
+
+    async def asend_chat_status(self, config: Dict):
+        """Queues chat status object without blocking event loop"""
+
+        await pubsub_dispatcher.publish(
+            self.session_id, self._chat_status_payload(config)
         )
 
+    def _send(self, message: Dict):
+        # Sync callers run in worker threads (team runs), go through the dispatcher
+        # when the server loop is up so messages of a session stay in order
+        if not pubsub_dispatcher.publish_threadsafe(self.session_id, message):
+            get_pubsub_service().send_to_group(self.session_id, message=message)
+
+    def _chat_message_payload(
+        self, chat_message: Dict, local_chat_message_ref_id: Optional[str] = None
+    ) -> Dict:
+        return {
+            "type": "CHAT_MESSAGE_ADDED",
+            "from": str(self.user_id),
+            "chat_message": chat_message,
+            "local_chat_message_ref_id": local_chat_message_ref_id,
+            "agent_id": self.agent_id,
+            "team_id": self.team_id,
+            "chat_id": self.chat_id,
+        }
+
+    def _chat_status_payload(self, config: Dict) -> Dict:
+        data = json.loads(json.dumps(config, cls=PubSubJSONEncoder))
+
+        return {
+            "type": "CHAT_STATUS",
+            "from": str(self.user_id),
+            "config": data,
+            "agent_id": self.agent_id,
+            "team_id": self.team_id,
+        }
+
 
 class PubSubJSONEncoder(json.JSONEncoder):
     def default(self, obj: object):
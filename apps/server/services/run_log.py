@@ -1,20 +1,158 @@
-from typing import Any, Dict, List, Optional
-from uuid import UUID
+import atexit
+import threading
+from datetime import datetime
+from queue import Empty, Queue
+from typing import Any, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
 
+import sentry_sdk
 from langchain.callbacks.base import BaseCallbackHandler
 from langchain.schema.agent import AgentAction, AgentFinish
 from langchain_core.messages import BaseMessage
 from sqlalchemy.orm import Session
 
+from models.db import create_session
 from models.run_log import RunLogModel
+from models.run_log_message import RunLogMessageModel
 from tools.get_tools import get_toolkit_id_by_tool_name
 from typings.run import RunLogInput, RunLogType
 
+# Run logs created in a batch with their messages, and messages appended per run log
+RunChanges = Tuple[
+    List[Tuple[RunLogModel, List[Tuple[int, Dict]]]],
+    Dict[UUID, Tuple[List[Tuple[int, Dict]], datetime, UUID]],
+]
+
+
+class RunLogWriter:
+    """
+    Writes run logs on a background thread with its own session. Pending changes of
+    all runs are drained from the queue and committed in one transaction, with a
+    savepoint per run, so agent callbacks never wait on the database.
+    """
+
+    def __init__(self, max_batch_size: int = 500):
+        self.max_batch_size = max_batch_size
+        self.queue: Queue = Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+
+    def submit(self, changes: List[Tuple]):
+        self._ensure_started()
+        self.queue.put(changes)
+
+    def close(self, timeout: float = 10):
+        """Write everything still queued and stop the thread"""
+        if self._thread and self._thread.is_alive():
+            self.queue.put(None)
+            self._thread.join(timeout)
+
+    def _ensure_started(self):
+        if self._thread and self._thread.is_alive():
+            return
+
+        with self._lock:
+            if not self._thread or not self._thread.is_alive():
+                self._thread = threading.Thread(
+                    target=self._run, name="run-log-writer", daemon=True
+                )
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            changes = self.queue.get()
+
+            if changes is None:
+                return
+
+            batch = list(changes)
+            stop = False
+
+            while len(batch) < self.max_batch_size:
+                try:
+                    changes = self.queue.get_nowait()
+                except Empty:
+                    break
+
+                if changes is None:
+                    stop = True
+                    break
+
+                batch.extend(changes)
+
+            self._write(batch)
+
+            if stop:
+                return
+
+    def _write(self, batch: List[Tuple]):
+        # Run logs are inserted first, then messages of the same log are grouped
+        # into a single append. Changes are grouped per run, so a run whose changes
+        # fail doesn't lose the logs of the others
+        runs: Dict[UUID, RunChanges] = {}
+
+        for change in batch:
+            if change[0] == "create":
+                _, run_log, messages = change
+                created, _ = runs.setdefault(run_log.run_id, ([], {}))
+                created.append((run_log, messages))
+            else:
+                _, run_log_id, run_id, seq, message, end_date, user_id = change
+                _, appends = runs.setdefault(run_id, ([], {}))
+                _, messages, _ = appends.get(run_log_id, (None, [], None))
+                messages.append((seq, message))
+                appends[run_log_id] = (messages, end_date, user_id)
+
+        session = create_session()
+
+        try:
+            for run_id, (created, appends) in runs.items():
+                # Each run is written in a savepoint of the batch's transaction
+                try:
+                    with session.begin_nested():
+                        self._write_run(session, run_id, created, appends)
+                except Exception as err:
+                    sentry_sdk.capture_exception(err)
+
+            session.commit()
+        except Exception as err:
+            session.rollback()
+            sentry_sdk.capture_exception(err)
+        finally:
+            session.close()
+
+    def _write_run(
+        self,
+        session: Session,
+        run_id: UUID,
+        created: List[Tuple[RunLogModel, List[Tuple[int, Dict]]]],
+        appends: Dict[UUID, Tuple[List[Tuple[int, Dict]], datetime, UUID]],
+    ):
+        session.add_all([run_log for run_log, _ in created])
+        session.flush()
+
+        for run_log, messages in created:
+            RunLogMessageModel.create_messages(session, run_log.id, run_id, messages)
+
+        for run_log_id, (messages, end_date, user_id) in appends.items():
+            RunLogModel.append_messages(
+                session, run_log_id, run_id, messages, end_date, user_id
+            )
+
+
+run_log_writer = RunLogWriter()
+atexit.register(run_log_writer.close)
+
 
 class RunLogsManager:
+    """
+    Buffers the logs of a single run. The latest log of each type is tracked in
+    memory and pending changes are handed to the writer at step boundaries (agent
+    action/finish, tool end) and when the run ends.
+    """
+
     def __init__(
         self,
-        session: Session,
         run_id: UUID,
         user_id: UUID,
         account_id: UUID,
@@ -23,7 +161,6 @@ class RunLogsManager:
         chat_id: Optional[UUID],
         session_id: Optional[str],
     ):
-        self.session = session
         self.run_id = run_id
         self.user_id = user_id
         self.account_id = account_id
@@ -31,6 +168,10 @@ class RunLogsManager:
         self.team_id = team_id
         self.chat_id = chat_id
         self.session_id = session_id
+        self.latest_run_log_ids: Dict[str, UUID] = {}
+        self.next_seqs: Dict[UUID, int] = {}
+        self.pending_changes: List[Tuple] = []
+        self._lock = threading.Lock()
 
     def get_agent_callback_handler(self) -> BaseCallbackHandler:
         callback_handler = AgentCallbackHandler()
@@ -49,8 +190,17 @@ class RunLogsManager:
         messages: Optional[Dict] = [],
         toolkit_id: Optional[UUID] = None,
     ):
-        return RunLogModel.create_run_log(
-            self.session,
+        # Id and creation time are set here, logs are ordered by created_on and the
+        # insert happens later in a batch
+        run_log = RunLogModel(
+            id=uuid4(),
+            created_by=self.user_id,
+            account_id=self.account_id,
+            created_on=datetime.utcnow(),
+        )
+
+        RunLogModel.update_model_from_input(
+            run_log,
             RunLogInput(
                 run_id=self.run_id,
                 agent_id=self.agent_id,
@@ -58,13 +208,20 @@ class RunLogsManager:
                 chat_id=self.chat_id,
                 name=name,
                 type=str(type),
-                messages=messages,
+                messages=None,
                 toolkit_id=toolkit_id,
             ),
-            self.user_id,
-            self.account_id,
         )
 
+        messages = messages or []
+
+        with self._lock:
+            self.latest_run_log_ids[str(type)] = run_log.id
+            self.next_seqs[run_log.id] = len(messages)
+            self.pending_changes.append(("create", run_log, list(enumerate(messages))))
+
+        return run_log
+
     def create_llm_run_log(self, messages: List[BaseMessage]):
         message_mapping = {
             "system": "System",
@@ -104,16 +261,38 @@ class RunLogsManager:
         )
 
     def add_message_to_run_log(self, type: RunLogType, name: str, content: str):
-        return RunLogModel.add_message_to_latest_run_log(
-            self.session,
-            self.run_id,
-            type,
-            {
-                "name": name,
-                "content": content,
-            },
-            self.user_id,
-        )
+        with self._lock:
+            run_log_id = self.latest_run_log_ids.get(str(type))
+
+            # If the run log does not exist, raise an exception
+            if not run_log_id:
+                raise Exception("Run log not found")
+
+            seq = self.next_seqs[run_log_id]
+            self.next_seqs[run_log_id] = seq + 1
+
+            self.pending_changes.append(
+                (
+                    "append",
+                    run_log_id,
+                    self.run_id,
+                    seq,
+                    {
+                        "name": name,
+                        "content": content,
+                    },
+                    datetime.utcnow(),
+                    self.user_id,
+                )
+            )
+
+    def flush(self):
+        """Hand pending changes to the writer without waiting for the commit"""
+        with self._lock:
+            changes, self.pending_changes = self.pending_changes, []
+
+        if changes:
+            run_log_writer.submit(changes)
 
 
 class AgentCallbackHandler(BaseCallbackHandler):
@@ -145,6 +324,7 @@ class AgentCallbackHandler(BaseCallbackHandler):
         self.run_logs_manager.create_tool_run_log(
             name=action.tool, input=action.tool_input
         )
+        self.run_logs_manager.flush()
 
     def on_agent_finish(
         self,
@@ -159,12 +339,28 @@ class AgentCallbackHandler(BaseCallbackHandler):
             name="AI",
             content=finish.log,
         )
+        self.run_logs_manager.flush()
 
 
 class ToolCallbackHandler(BaseCallbackHandler):
     run_logs_manager: RunLogsManager
     run_id: UUID
 
+    def on_text(
+        self,
+        text: str,
+        *,
+        run_id: UUID,
+        parent_run_id: UUID | None = None,
+        **kwargs: Any,
+    ) -> Any:
+        """Extra details a tool reports while running, such as cache usage"""
+        self.run_logs_manager.add_message_to_run_log(
+            type=RunLogType.TOOL,
+            name=kwargs.get("name", "Info"),
+            content=text,
+        )
+
     def on_tool_error(
         self,
         error: BaseException,
@@ -178,6 +374,7 @@ class ToolCallbackHandler(BaseCallbackHandler):
             name="Error",
             content=str(error),
         )
+        self.run_logs_manager.flush()
 
     def on_tool_end(
         self,
@@ -192,3 +389,4 @@ class ToolCallbackHandler(BaseCallbackHandler):
             name="Output",
             content=output,
         )
+        self.run_logs_manager.flush()
@@ -0,0 +1,99 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from sqlalchemy import create_engine
+from sqlalchemy.engine import Engine
+
+from config import Config
+from utils.cache import make_fingerprint
+
+
+class SQLEngineRegistry:
+    """
+    Pooled SQLAlchemy engines for customer SQL datasources, shared by every request
+    of the process. Engines are keyed by datasource id (or credentials, for ad-hoc
+    connections) and disposed when their credentials change, when the datasource
+    is deleted, when they sit idle for idle_timeout seconds or when more than
+    max_engines are open.
+    """
+
+    def __init__(
+        self,
+        max_engines: int,
+        idle_timeout: float,
+        pool_size: int,
+        max_overflow: int,
+    ):
+        self.max_engines = max_engines
+        self.idle_timeout = idle_timeout
+        self.pool_size = pool_size
+        self.max_overflow = max_overflow
+        # key -> (credential hash, engine, last used)
+        self._engines: "OrderedDict[str, Tuple[str, Engine, float]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_engine(self, datasource_id: Optional[str], uri: str) -> Engine:
+        credential_hash = make_fingerprint(uri)
+        key = str(datasource_id) if datasource_id else f"uri:{credential_hash}"
+        disposed = []
+
+        with self._lock:
+            now = time.monotonic()
+            entry = self._engines.pop(key, None)
+
+            if entry and entry[0] != credential_hash:
+                disposed.append(entry[1])
+                entry = None
+
+            engine = entry[1] if entry else self._create_engine(uri)
+            self._engines[key] = (credential_hash, engine, now)
+
+            for other_key, (_, other_engine, last_used) in list(self._engines.items()):
+                if now - last_used > self.idle_timeout:
+                    disposed.append(self._engines.pop(other_key)[1])
+
+            while len(self._engines) > self.max_engines:
+                disposed.append(self._engines.popitem(last=False)[1][1])
+
+        # Disposing closes pooled connections, keep it outside the lock
+        for old_engine in disposed:
+            old_engine.dispose()
+
+        return engine
+
+    def dispose(self, datasource_id: str):
+        with self._lock:
+            entry = self._engines.pop(str(datasource_id), None)
+
+        if entry:
+            entry[1].dispose()
+
+    def dispose_all(self):
+        with self._lock:
+            entries, self._engines = list(self._engines.values()), OrderedDict()
+
+        for _, engine, _ in entries:
+            engine.dispose()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._engines)
+
+    def _create_engine(self, uri: str) -> Engine:
+        return create_engine(
+            uri,
+            pool_size=self.pool_size,
+            max_overflow=self.max_overflow,
+            pool_pre_ping=True,
+            pool_recycle=int(self.idle_timeout),
+        )
+
+
+sql_engine_registry = SQLEngineRegistry(
+    max_engines=Config.SQL_DATASOURCE_MAX_ENGINES,
+    idle_timeout=Config.SQL_DATASOURCE_ENGINE_IDLE_TIMEOUT,
+    pool_size=Config.SQL_DATASOURCE_POOL_SIZE,
+    max_overflow=Config.SQL_DATASOURCE_POOL_SIZE,
+)
@@ -0,0 +1,84 @@
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, List
+
+import sentry_sdk
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Engine
+
+from config import Config
+from utils.cache import TTLCache
+
+# Estimates from the planner statistics, no table is scanned
+POSTGRES_TABLE_ROWS_QUERY = text(
+    "SELECT c.relname AS name, c.reltuples::bigint AS count FROM pg_class c "
+    "JOIN pg_namespace n ON n.oid = c.relnamespace "
+    "WHERE n.nspname = current_schema() AND c.relkind IN ('r', 'p') "
+    "ORDER BY c.relname"
+)
+MYSQL_TABLE_ROWS_QUERY = text(
+    "SELECT TABLE_NAME AS name, TABLE_ROWS AS count FROM information_schema.TABLES "
+    "WHERE TABLE_SCHEMA = DATABASE() AND TABLE_TYPE = 'BASE TABLE' "
+    "ORDER BY TABLE_NAME"
+)
+
+# Table counts per datasource and mode, refreshed every SQL_TABLE_COUNTS_CACHE_TTL
+sql_table_counts_cache: TTLCache[List[Dict]] = TTLCache(
+    1000, Config.SQL_TABLE_COUNTS_CACHE_TTL
+)
+
+
+def get_approximate_table_counts(engine: Engine) -> List[Dict]:
+    """Row estimates of every table, read from the database statistics"""
+    if engine.dialect.name == "postgresql":
+        query = POSTGRES_TABLE_ROWS_QUERY
+    elif engine.dialect.name == "mysql":
+        query = MYSQL_TABLE_ROWS_QUERY
+    else:
+        raise ValueError(f"Approximate counts are not supported for {engine.name}")
+
+    with engine.connect() as connection:
+        rows = connection.execute(query).all()
+
+    # Postgres reports -1 for tables which were never analyzed and MySQL may report
+    # NULL, the count of those is unknown rather than 0
+    return [
+        {
+            "id": row.name,
+            "name": row.name,
+            "count": row.count if row.count is not None and row.count >= 0 else None,
+        }
+        for row in rows
+    ]
+
+
+def iter_exact_table_counts(engine: Engine, max_workers: int) -> Iterator[Dict]:
+    """
+    Exact COUNT(*) of every table, yielded as each count finishes. Tables are listed
+    right away, so connection errors are raised before anything is streamed. A table
+    which fails to count is yielded with no count and the error.
+    """
+    table_names = inspect(engine).get_table_names()
+    preparer = engine.dialect.identifier_preparer
+
+    def get_table_count(table: str) -> Dict:
+        try:
+            with engine.connect() as connection:
+                count = connection.execute(
+                    text(f"SELECT COUNT(*) FROM {preparer.quote(table)}")
+                ).scalar()
+        except Exception as err:
+            sentry_sdk.capture_exception(err)
+            # The driver's message, without SQLAlchemy's statement and help link
+            error = str(getattr(err, "orig", None) or err)
+            return {"id": table, "name": table, "count": None, "error": error}
+
+        return {"id": table, "name": table, "count": count}
+
+    def iter_counts() -> Iterator[Dict]:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            futures = [executor.submit(get_table_count, table) for table in table_names]
+
+            for future in as_completed(futures):
+                yield future.result()
+
+    return iter_counts()
@@ -0,0 +1,52 @@
+import os
+
+# Config builds the database URIs at import time
+for key, value in {
+    "DB_USER": "test",
+    "DB_PASS": "test",
+    "DB_HOST": "localhost",
+    "DB_PORT": "5432",
+    "DB_NAME": "test",
+}.items():
+    os.environ.setdefault(key, value)
+
+import pytest  # noqa: E402
+from sqlalchemy import create_engine  # noqa: E402
+from sqlalchemy.dialects.postgresql import JSONB  # noqa: E402
+from sqlalchemy.ext.asyncio import async_sessionmaker  # noqa: E402
+from sqlalchemy.ext.asyncio import create_async_engine  # noqa: E402
+from sqlalchemy.ext.compiler import compiles  # noqa: E402
+from sqlalchemy.orm import sessionmaker  # noqa: E402
+
+import models  # noqa: E402, F401
+from models import *  # noqa: E402, F401, F403
+from models.base_model import BaseModel  # noqa: E402
+
+
+@compiles(JSONB, "sqlite")
+def compile_jsonb_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+@pytest.fixture
+def sqlite_url(tmp_path):
+    """A file database with every table, shared by the sync and async engines"""
+    path = tmp_path / "test.db"
+    engine = create_engine(f"sqlite:///{path}")
+    BaseModel.metadata.create_all(engine)
+    engine.dispose()
+    return f"sqlite:///{path}"
+
+
+@pytest.fixture
+async def async_session_factory(sqlite_url):
+    engine = create_async_engine(sqlite_url.replace("sqlite", "sqlite+aiosqlite", 1))
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+@pytest.fixture
+def session_factory(sqlite_url):
+    engine = create_engine(sqlite_url)
+    yield sessionmaker(engine)
+    engine.dispose()
@@ -0,0 +1,66 @@
+import threading
+import time
+
+import pytest
+
+from agents.agent_simulations.decentralized.bidding import collect_bids
+
+
+class FakeAgent:
+    def __init__(self, bid: int, latency: float):
+        self.bid = bid
+        self.latency = latency
+
+
+def make_ask_for_bid(release: threading.Event):
+    def ask_for_bid(agent: FakeAgent) -> int:
+        # A stuck agent waits until the test releases it
+        if release.wait(agent.latency):
+            raise RuntimeError("released")
+
+        return agent.bid
+
+    return ask_for_bid
+
+
+@pytest.fixture
+def release():
+    event = threading.Event()
+    yield event
+    event.set()
+
+
+def test_bids_are_collected_concurrently(release):
+    agents = [FakeAgent(bid, 0.2) for bid in range(1, 7)]
+
+    start = time.monotonic()
+    bids = collect_bids(agents, make_ask_for_bid(release), 6, timeout=2)
+
+    assert bids == [1, 2, 3, 4, 5, 6]
+    assert time.monotonic() - start < 0.6
+
+
+def test_slow_bid_counts_as_default_after_timeout(release):
+    agents = [FakeAgent(3, 0.05), FakeAgent(9, 60), FakeAgent(5, 0.05)]
+
+    start = time.monotonic()
+    bids = collect_bids(agents, make_ask_for_bid(release), 3, timeout=0.3)
+
+    assert bids == [3, 0, 5]
+    assert time.monotonic() - start < 0.6
+
+
+def test_bids_queued_behind_a_slow_one_still_count(release):
+    agents = [FakeAgent(9, 60)] + [FakeAgent(bid, 0.05) for bid in range(1, 5)]
+
+    bids = collect_bids(agents, make_ask_for_bid(release), 2, timeout=0.3)
+
+    assert bids == [0, 1, 2, 3, 4]
+
+
+def test_bid_errors_are_raised():
+    def ask_for_bid(agent: FakeAgent) -> int:
+        raise ValueError("unparsable bid")
+
+    with pytest.raises(ValueError):
+        collect_bids([FakeAgent(1, 0)], ask_for_bid, 1, timeout=1)
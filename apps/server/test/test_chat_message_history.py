@@ -0,0 +1,33 @@
+import uuid
+
+import postgres
+from models.account import AccountModel
+from postgres import PostgresChatMessageHistory
+
+
+async def test_acreate_message_serializes_relationships(
+    async_session_factory, monkeypatch
+):
+    monkeypatch.setattr(postgres, "create_async_session", async_session_factory)
+    account_id = uuid.uuid4()
+
+    async with async_session_factory() as session:
+        session.add(AccountModel(id=account_id, name="Account"))
+        await session.commit()
+
+    history = PostgresChatMessageHistory(
+        sender_account_id=account_id,
+        sender_user_id=None,
+        session_id="session",
+        sender_name="Jane Doe",
+    )
+
+    human_message = await history.acreate_human_message("Hello")
+    ai_message = await history.acreate_ai_message(
+        "Hi", parent_id=uuid.UUID(human_message["id"])
+    )
+
+    assert human_message["message"]["data"]["content"] == "Hello"
+    assert human_message["sender_account"]["id"] == str(account_id)
+    assert ai_message["parent"]["id"] == human_message["id"]
+    assert ai_message["parent"]["sender_account"]["id"] == str(account_id)
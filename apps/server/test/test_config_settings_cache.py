@@ -0,0 +1,67 @@
+import uuid
+from types import SimpleNamespace
+
+from sqlalchemy import event
+
+from models.account import AccountModel
+from models.config import (ConfigModel, account_settings_cache,
+                           account_voice_settings_cache)
+from typings.config import ConfigInput
+
+
+def test_cached_account_settings_do_not_read_configs(session_factory):
+    account_settings_cache.clear()
+    account_voice_settings_cache.clear()
+    account = AccountModel(id=uuid.uuid4(), name="Account")
+
+    with session_factory() as session:
+        session.add(account)
+        session.commit()
+        ConfigModel.create_config(
+            SimpleNamespace(session=session),
+            ConfigInput(
+                key="open_api_key",
+                value="first",
+                key_type="string",
+                is_secret=False,
+                is_required=False,
+            ),
+            SimpleNamespace(id=None),
+            account,
+        )
+
+    statements = []
+
+    with session_factory() as session:
+        event.listen(
+            session.get_bind(),
+            "before_cursor_execute",
+            lambda conn, cursor, statement, *args: statements.append(statement),
+        )
+
+        for _ in range(3):
+            settings = ConfigModel.get_account_settings(session, account.id)
+            assert settings.openai_api_key == "first"
+
+    assert len(statements) == 1
+
+    # Updates through the model drop the cached settings
+    with session_factory() as session:
+        config = session.query(ConfigModel).filter_by(account_id=account.id).one()
+        ConfigModel.update_config(
+            SimpleNamespace(session=session),
+            config.id,
+            ConfigInput(
+                key="open_api_key",
+                value="second",
+                key_type="string",
+                is_secret=False,
+                is_required=False,
+            ),
+            SimpleNamespace(id=None),
+            account,
+        )
+
+        assert ConfigModel.get_account_settings(session, account.id).openai_api_key == (
+            "second"
+        )
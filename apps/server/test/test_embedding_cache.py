@@ -0,0 +1,71 @@
+from datetime import datetime, timedelta
+from typing import List
+
+import pytest
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.embeddings import MockEmbedding
+
+from datasources.file import embedding_cache
+from datasources.file.embedding_cache import CachedEmbedding
+from models.embedding_cache import EmbeddingCacheModel
+
+
+class RecordingEmbedding(MockEmbedding):
+    texts: List[str] = Field(default_factory=list)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.texts.extend(texts)
+        return [[float(len(text)), 1.0, 0.0, 0.0] for text in texts]
+
+
+@pytest.fixture
+def embed_model(session_factory, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "create_session", session_factory)
+    return RecordingEmbedding(embed_dim=4, model_name="text-embedding-test")
+
+
+def test_cached_chunks_are_embedded_once(embed_model):
+    first = CachedEmbedding(embed_model)
+    embeddings = first.get_text_embedding_batch(["one", "two", "one"])
+
+    # The duplicate is embedded once within the batch
+    assert embed_model.texts == ["one", "two"]
+    assert (first.hits, first.misses) == (1, 2)
+
+    # Another datasource or a re-index finds them, whitespace variants included
+    second = CachedEmbedding(embed_model)
+    cached = second.get_text_embedding_batch(["one ", "two", "three"])
+
+    assert embed_model.texts == ["one", "two", "three"]
+    assert cached[:2] == embeddings[:2]
+    assert (second.hits, second.misses) == (2, 1)
+    assert second.hit_rate == pytest.approx(2 / 3)
+
+
+def test_query_embeddings_are_not_cached(embed_model, session_factory):
+    CachedEmbedding(embed_model).get_query_embedding("question")
+
+    with session_factory() as session:
+        assert session.query(EmbeddingCacheModel).count() == 0
+
+
+def test_evict_deletes_least_recently_used_entries(session_factory):
+    now = datetime.utcnow()
+
+    with session_factory() as session:
+        EmbeddingCacheModel.set_embeddings(
+            session, "model", {key: [1.0, 0.0] for key in ("a", "b", "c", "d")}
+        )
+
+        for age, key in enumerate(["a", "b", "c", "d"]):
+            session.query(EmbeddingCacheModel).filter_by(key=key).update(
+                {"last_used_on": now - timedelta(hours=4 - age)}
+            )
+
+        session.commit()
+        # Reading an entry makes it the most recently used
+        EmbeddingCacheModel.get_embeddings(session, ["a"])
+
+        assert EmbeddingCacheModel.evict(session, 2) == 2
+        assert EmbeddingCacheModel.evict(session, 2) == 0
+        assert {entry.key for entry in session.query(EmbeddingCacheModel)} == {"a", "d"}
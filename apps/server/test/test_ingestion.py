@@ -0,0 +1,145 @@
+import json
+from types import SimpleNamespace
+from typing import List
+
+import fsspec
+import pytest
+from llama_index.core.bridge.pydantic import Field
+from llama_index.core.embeddings import MockEmbedding
+
+from datasources.file import embedding_cache, file_retriever
+from datasources.file.file_retriever import FileDatasourceRetriever
+from datasources.file.ingestion import MANIFEST_FNAME, hash_text
+
+# Above the default chunk overlap, every paragraph still spans a few chunks
+CHUNK_SIZE = 256
+
+
+def paragraph(topic: str) -> str:
+    return " ".join(f"{topic} sentence number {number}." for number in range(40))
+
+
+PARAGRAPHS = {
+    "docs/a.txt": [paragraph("Apple")],
+    "docs/b.txt": [paragraph("Banana"), paragraph("Plantain")],
+    "docs/c.txt": [paragraph("Cherry")],
+}
+NEW_PARAGRAPH = paragraph("Mango")
+
+
+class RecordingEmbedding(MockEmbedding):
+    texts: List[str] = Field(default_factory=list)
+
+    def _get_text_embeddings(self, texts: List[str]) -> List[List[float]]:
+        self.texts.extend(texts)
+        return super()._get_text_embeddings(texts)
+
+
+class FakeS3:
+    """Files uploaded by key, with an ETag which changes on every upload"""
+
+    def __init__(self, root):
+        self.root = root
+        self.etags = {}
+
+    def upload(self, key: str, paragraphs: List[str]):
+        path = self.root / key
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text("\n\n".join(paragraphs))
+        self.etags[key] = f"{key}-{len(self.etags)}"
+
+    def download_file(self, key: str, filename: str):
+        fsspec.filesystem("file").get(str(self.root / key), str(filename))
+
+
+@pytest.fixture
+def embed_model(monkeypatch, session_factory):
+    model = RecordingEmbedding(embed_dim=4)
+    monkeypatch.setattr(file_retriever, "OpenAIEmbeddings", lambda **kwargs: model)
+    monkeypatch.setattr(embedding_cache, "create_session", session_factory)
+    monkeypatch.setattr(file_retriever, "create_session", session_factory)
+    return model
+
+
+@pytest.fixture
+def storage(tmp_path, monkeypatch):
+    s3 = FakeS3(tmp_path / "bucket")
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-test")
+    monkeypatch.setattr(file_retriever, "s3", fsspec.filesystem("file"))
+    monkeypatch.setattr(
+        file_retriever.AWSS3Service, "get_key_from_public_url", lambda url: url
+    )
+    monkeypatch.setattr(
+        file_retriever.AWSS3Service, "get_etag", lambda key: s3.etags[key]
+    )
+    monkeypatch.setattr(file_retriever.AWSS3Service, "download_file", s3.download_file)
+    monkeypatch.setattr(
+        FileDatasourceRetriever,
+        "get_index_persist_dir",
+        lambda self, account_id: str(tmp_path / "index"),
+    )
+    return s3
+
+
+def create_retriever(tmp_path) -> FileDatasourceRetriever:
+    retriever = FileDatasourceRetriever(
+        settings=SimpleNamespace(openai_api_key="sk-test"),
+        index_type="vector_store",
+        response_mode="compact",
+        vector_store="local",
+        account_id="account",
+        data_source_account_id="account",
+        datasource_id="datasource",
+        chunk_size=CHUNK_SIZE,
+    )
+    retriever.datasource_path = tmp_path / "downloads"
+    return retriever
+
+
+def read_manifest(tmp_path) -> dict:
+    return json.loads((tmp_path / "index" / MANIFEST_FNAME).read_text())
+
+
+def test_reindex_reuses_unchanged_chunks_and_deletes_removed_files(
+    tmp_path, storage, embed_model
+):
+    for key, paragraphs in PARAGRAPHS.items():
+        storage.upload(key, paragraphs)
+
+    stats = create_retriever(tmp_path).index_documents(list(PARAGRAPHS))
+
+    assert stats.files_indexed == 3
+    assert stats.chunks_embedded == len(embed_model.texts)
+    first_files = read_manifest(tmp_path)["files"]
+
+    # b gets a new paragraph at the end, c is removed
+    storage.upload("docs/b.txt", PARAGRAPHS["docs/b.txt"] + [NEW_PARAGRAPH])
+    embed_model.texts.clear()
+
+    retriever = create_retriever(tmp_path)
+    stats = retriever.index_documents(["docs/a.txt", "docs/b.txt"])
+
+    files = read_manifest(tmp_path)["files"]
+    assert set(files) == {"docs/a.txt", "docs/b.txt"}
+    assert files["docs/a.txt"] == first_files["docs/a.txt"]
+
+    # Only chunks of b which didn't exist before reach the embedding model
+    a_chunks = files["docs/a.txt"]["chunks"]
+    b_chunks = files["docs/b.txt"]["chunks"]
+    new_chunks = [
+        chunk for chunk in b_chunks if chunk not in first_files["docs/b.txt"]["chunks"]
+    ]
+    assert 0 < len(new_chunks) < len(b_chunks)
+    assert [hash_text(text) for text in embed_model.texts] == new_chunks
+
+    assert stats.files_unchanged == 1
+    assert stats.files_indexed == 1
+    assert stats.files_removed == 1
+    assert stats.chunks_embedded == len(new_chunks)
+    assert stats.chunks_reused == len(a_chunks) + len(b_chunks) - len(new_chunks)
+
+    ref_doc_ids = retriever.index.docstore.get_all_ref_doc_info().keys()
+    assert sorted(ref_doc_ids) == ["docs/a.txt_part_0", "docs/b.txt_part_0"]
+    texts = [node.get_content() for node in retriever.index.docstore.docs.values()]
+    assert len(texts) == len(a_chunks) + len(b_chunks)
+    assert not any("Cherry" in text for text in texts)
@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+from llama_index.core import Settings, VectorStoreIndex
+from llama_index.core.embeddings import MockEmbedding
+from llama_index.core.schema import QueryBundle, TextNode
+
+from datasources.file.local_index import LocalIndex
+from datasources.file.local_vector_store import (LocalVectorStore,
+                                                 is_memory_mapped)
+
+EMBEDDINGS = [[1, 0, 0, 0], [0.6, 0.8, 0, 0], [0, 0, 3, 4], [0, 1, 1, 0]]
+
+
+@pytest.fixture(autouse=True)
+def mock_embed_model(monkeypatch):
+    # Loaded indexes take the global model, which would default to OpenAI
+    monkeypatch.setattr(Settings, "_embed_model", MockEmbedding(embed_dim=4))
+
+
+def build_index() -> VectorStoreIndex:
+    nodes = [
+        TextNode(id_=f"node-{number}", text=f"Text {number} ü", embedding=embedding)
+        for number, embedding in enumerate(EMBEDDINGS)
+    ]
+    index = VectorStoreIndex(nodes)
+    index.set_index_id("index")
+    return index
+
+
+def retrieve(index, embedding):
+    retriever = index.as_retriever(similarity_top_k=2)
+    return [
+        (result.node.node_id, result.node.get_content(), round(result.score, 5))
+        for result in retriever.retrieve(QueryBundle("query", embedding=embedding))
+    ]
+
+
+def test_load_index_decodes_only_retrieved_nodes(tmp_path):
+    index = build_index()
+    LocalIndex._write_files(tmp_path, index)
+
+    loaded = LocalIndex(tmp_path).load_index("index")
+    kvstore = loaded.docstore._kvstore
+
+    for query in ([1, 0.2, 0, 0], [0, 0.5, 1, 0]):
+        assert retrieve(loaded, query) == retrieve(index, query)
+
+    # Retrieval neither decoded the whole docstore nor copied the embeddings
+    assert not kvstore.is_materialized
+    assert isinstance(loaded.vector_store, LocalVectorStore)
+    assert is_memory_mapped(loaded.vector_store.client.vectors)
+    assert loaded.vector_store.nbytes == 0
+
+
+def test_listing_docs_decodes_every_node(tmp_path):
+    index = build_index()
+    LocalIndex._write_files(tmp_path, index)
+
+    loaded = LocalIndex(tmp_path).load_index("index")
+
+    assert {
+        node_id: node.get_content() for node_id, node in loaded.docstore.docs.items()
+    } == {node_id: node.get_content() for node_id, node in index.docstore.docs.items()}
+    assert loaded.docstore._kvstore.is_materialized
+    assert loaded.docstore.get_ref_doc_info("missing") is None
+
+
+def test_unnormalized_embeddings_are_normalized_in_memory(tmp_path):
+    index = build_index()
+    LocalIndex._write_files(tmp_path, index)
+    # Files written before the embeddings were stored normalized
+    np.save(tmp_path / "embeddings.npy", np.asarray(EMBEDDINGS, dtype=np.float32))
+
+    loaded = LocalIndex(tmp_path).load_index("index")
+
+    assert not is_memory_mapped(loaded.vector_store.client.vectors)
+    assert retrieve(loaded, [0, 0.5, 1, 0]) == retrieve(index, [0, 0.5, 1, 0])
@@ -0,0 +1,143 @@
+import pytest
+from langchain.schema import LLMResult
+
+from agents.conversational.marker_scanner import MarkerScanner
+from agents.conversational.streaming_aiter import AsyncCallbackHandler
+
+STREAM = "Thought: I know it\nFinal Answer: Hello there"
+
+# Chunks as the model streams a final answer of the ReAct JSON format, with both
+# markers split over several tokens
+FINAL_ANSWER_TOKENS = [
+    "```",
+    "json",
+    "\n",
+    "{\n",
+    '    "',
+    "action",
+    '": "',
+    "Final",
+    " Ans",
+    "wer",
+    '",\n',
+    '    "',
+    "action",
+    "_in",
+    "put",
+    '": ',
+    '"',
+    "Hello",
+    " world",
+    '"\n',
+    "}\n",
+    "```",
+]
+
+TOOL_TOKENS = [
+    "```json\n{\n",
+    '    "action": "',
+    "Search",
+    '",\n    "action_input": "',
+    "weather",
+    " today",
+    '"\n}\n```',
+]
+
+
+def feed_all(scanner: MarkerScanner, chunks):
+    return "".join(scanner.feed(chunk) for chunk in chunks)
+
+
+@pytest.mark.parametrize("split", range(len(STREAM) + 1))
+def test_marker_scanner_two_chunks(split):
+    scanner = MarkerScanner()
+
+    assert feed_all(scanner, [STREAM[:split], STREAM[split:]]) == "Hello there"
+    assert scanner.detected
+    assert scanner.text == "Hello there"
+
+
+def test_marker_scanner_single_characters():
+    scanner = MarkerScanner()
+
+    assert feed_all(scanner, list(STREAM)) == "Hello there"
+
+
+def test_marker_scanner_marker_split_over_chunks():
+    scanner = MarkerScanner()
+
+    assert scanner.feed("Final Ans") == ""
+    assert not scanner.detected
+    assert scanner.feed("wer:") == ""
+    assert scanner.detected
+    assert scanner.feed(" Hi") == "Hi"
+    assert scanner.feed(" you") == " you"
+    assert scanner.text == "Hi you"
+
+
+def test_marker_scanner_false_start():
+    scanner = MarkerScanner()
+
+    assert scanner.feed("Final Answ") == ""
+    assert scanner.feed("ered? Final Ans") == ""
+    assert scanner.feed("wer: x") == "x"
+
+
+def test_marker_scanner_keeps_whitespace():
+    scanner = MarkerScanner('"action_input": "', strip_leading_whitespace=False)
+
+    assert feed_all(scanner, ['"action_', 'input": ', '" Hi']) == " Hi"
+
+
+def test_marker_scanner_without_marker():
+    scanner = MarkerScanner()
+
+    assert feed_all(scanner, ["Thought: ", "Final", " answer is ", "coming"]) == ""
+    assert not scanner.detected
+    assert scanner.text == ""
+
+
+async def replay(handler: AsyncCallbackHandler, tokens):
+    for token in tokens:
+        await handler.on_llm_new_token(token)
+
+    queued = []
+
+    while not handler.queue.empty():
+        queued.append(handler.queue.get_nowait())
+
+    return queued
+
+
+async def test_callback_handler_streams_final_answer():
+    handler = AsyncCallbackHandler()
+
+    assert await replay(handler, FINAL_ANSWER_TOKENS) == ["Hello", " world"]
+    assert handler.final_answer
+
+    await handler.on_llm_end(LLMResult(generations=[]))
+
+    assert handler.done.is_set()
+    assert not handler.final_answer
+
+
+async def test_callback_handler_ignores_tool_calls():
+    handler = AsyncCallbackHandler()
+
+    # A tool call, then the final answer in the next LLM call of the agent
+    assert await replay(handler, TOOL_TOKENS) == []
+    assert not handler.final_answer
+
+    await handler.on_llm_end(LLMResult(generations=[]))
+
+    assert not handler.done.is_set()
+    assert await replay(handler, FINAL_ANSWER_TOKENS) == ["Hello", " world"]
+
+
+@pytest.mark.parametrize("size", [1, 2, 3, 5, 8])
+async def test_callback_handler_any_chunking(size):
+    text = "".join(FINAL_ANSWER_TOKENS[:-5]) + "Hello world"
+    handler = AsyncCallbackHandler()
+    chunks = [text[index : index + size] for index in range(0, len(text), size)]
+
+    assert "".join(await replay(handler, chunks)) == "Hello world"
@@ -0,0 +1,97 @@
+import re
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+from langchain.schema import messages_to_dict
+from langchain.schema.messages import AIMessage, HumanMessage, SystemMessage
+
+from memory.postgres import postgres_memory_history
+from memory.postgres.postgres_memory import PostgresMemory
+from memory.postgres.postgres_memory_history import PostgresMemoryHistory
+from models.account import AccountModel
+from models.chat_message import ChatMessage
+from models.chat_summary import ChatSummaryModel
+
+
+class FakeLLM:
+    """Summarizes by appending the new lines to the summary"""
+
+    def predict(self, prompt: str) -> str:
+        # The prompt starts with an example, the actual summary and lines come last
+        prompt = prompt.rsplit("Current summary:\n", 1)[1]
+        summary, prompt = prompt.split("\n\nNew lines of conversation:\n")
+        new_lines = prompt.split("\n\nNew summary:")[0]
+        return f"{summary}\n{new_lines}".strip()
+
+
+def create_messages(session_factory, count: int) -> List[uuid.UUID]:
+    account_id = uuid.uuid4()
+    started = datetime(2024, 1, 1)
+    ids = [uuid.uuid4() for _ in range(count)]
+
+    with session_factory() as session:
+        session.add(AccountModel(id=account_id, name="Account"))
+        session.add_all(
+            [
+                ChatMessage(
+                    id=ids[index],
+                    session_id="session",
+                    sender_account_id=account_id,
+                    sender_name="Jane",
+                    message=messages_to_dict(
+                        [
+                            (HumanMessage if index % 2 == 0 else AIMessage)(
+                                content=f"message {index}"
+                            )
+                        ]
+                    )[0],
+                    created_on=started + timedelta(seconds=index),
+                )
+                for index in range(count)
+            ]
+        )
+        session.commit()
+
+    return ids
+
+
+def test_summary_folds_a_long_backlog_without_skipping_messages(
+    session_factory, monkeypatch
+):
+    monkeypatch.setattr(postgres_memory_history, "create_session", session_factory)
+    # Messages of a chat which was never summarized
+    create_messages(session_factory, 30)
+    history = PostgresMemoryHistory("session", message_window=4, llm=FakeLLM())
+
+    for _ in range(10):
+        history.reset()
+        messages = history.messages
+
+    summary = messages[0]
+    assert isinstance(summary, SystemMessage)
+    # Every message which left the window is summarized once, in order
+    assert re.findall(r"message (\d+)$", summary.content, re.MULTILINE) == [
+        str(index) for index in range(24)
+    ]
+    assert [message.content for message in messages[1:]] == [
+        f"message {index}" for index in range(24, 30)
+    ]
+
+    with session_factory() as session:
+        chat_summary = ChatSummaryModel.get_summary(session, "session")
+        assert chat_summary.summarized_until == datetime(2024, 1, 1, 0, 0, 23)
+
+
+def test_prompt_being_answered_is_left_out(session_factory, monkeypatch):
+    monkeypatch.setattr(postgres_memory_history, "create_session", session_factory)
+    # The chat stores the prompt before the agent reads its memory
+    *_, prompt_id = create_messages(session_factory, 3)
+    memory = PostgresMemory(
+        "session", return_messages=True, exclude_message_id=prompt_id
+    )
+
+    assert [message.content for message in memory.buffer] == [
+        "message 0",
+        "message 1",
+    ]
@@ -0,0 +1,125 @@
+import asyncio
+import threading
+
+from services import pubsub
+from services.pubsub import LocalFanout, PubSubDispatcher
+
+
+class SlowPubSubService:
+    def __init__(self):
+        self.sent = []
+        self.release = asyncio.Event()
+
+    async def asend_to_group(self, group, message):
+        await self.release.wait()
+        self.sent.append((group, message))
+
+
+def chat_message(index: int):
+    return {"type": "CHAT_MESSAGE_ADDED", "chat_message": {"id": index}}
+
+
+def chat_status(index: int):
+    return {"type": "CHAT_STATUS", "config": {"index": index}}
+
+
+async def drain(dispatcher: PubSubDispatcher):
+    await asyncio.gather(*[queue.join() for queue in dispatcher._queues])
+
+
+async def test_dispatcher_waits_for_room_instead_of_dropping_messages(monkeypatch):
+    service = SlowPubSubService()
+    monkeypatch.setattr(pubsub, "get_pubsub_service", lambda: service)
+    dispatcher = PubSubDispatcher(workers=1, queue_size=2)
+
+    async def publish_all():
+        for index in range(10):
+            await dispatcher.publish("session", chat_message(index))
+            await dispatcher.publish("session", chat_status(index))
+
+    publishing = asyncio.create_task(publish_all())
+    await asyncio.sleep(0.01)
+
+    # The queue is full, the publisher waits instead of dropping chat messages
+    assert not publishing.done()
+
+    service.release.set()
+    await publishing
+    await drain(dispatcher)
+
+    messages = [message for _, message in service.sent]
+    chat_messages = [m for m in messages if m["type"] == "CHAT_MESSAGE_ADDED"]
+    statuses = [m for m in messages if m["type"] == "CHAT_STATUS"]
+
+    assert chat_messages == [chat_message(index) for index in range(10)]
+    assert statuses[-1] == chat_status(9)
+    assert len(statuses) + dispatcher.dropped_count + dispatcher.coalesced_count == 10
+
+
+async def test_status_is_not_coalesced_ahead_of_a_later_message(monkeypatch):
+    service = SlowPubSubService()
+    monkeypatch.setattr(pubsub, "get_pubsub_service", lambda: service)
+    dispatcher = PubSubDispatcher(workers=1, queue_size=10)
+
+    # The worker holds the first message, the rest stays queued
+    await dispatcher.publish("session", chat_message(0))
+    await asyncio.sleep(0.01)
+    await dispatcher.publish("session", chat_status(1))
+    await dispatcher.publish("session", chat_status(2))
+    await dispatcher.publish("session", chat_message(3))
+    await dispatcher.publish("session", chat_status(4))
+    await dispatcher.publish("session", chat_status(5))
+
+    service.release.set()
+    await drain(dispatcher)
+
+    assert [message for _, message in service.sent] == [
+        chat_message(0),
+        chat_status(2),
+        chat_message(3),
+        chat_status(5),
+    ]
+    assert dispatcher.coalesced_count == 2
+
+
+async def test_dispatcher_keeps_order_of_messages_from_threads(monkeypatch):
+    service = SlowPubSubService()
+    service.release.set()
+    monkeypatch.setattr(pubsub, "get_pubsub_service", lambda: service)
+    dispatcher = PubSubDispatcher(workers=2, queue_size=2)
+    await dispatcher.publish("session", chat_message(-1))
+
+    def send_from_thread():
+        for index in range(50):
+            assert dispatcher.publish_threadsafe("session", chat_message(index))
+
+    thread = threading.Thread(target=send_from_thread)
+    thread.start()
+
+    while thread.is_alive():
+        await asyncio.sleep(0.01)
+
+    await asyncio.sleep(0.01)
+    await drain(dispatcher)
+
+    assert [message for _, message in service.sent] == [
+        chat_message(index) for index in range(-1, 50)
+    ]
+
+
+async def test_fanout_only_drops_droppable_messages_of_slow_clients():
+    fanout = LocalFanout(max_queued=2)
+    queue = asyncio.Queue()
+    fanout.join("session", queue)
+
+    for index in range(5):
+        fanout.deliver("session", chat_message(index))
+        fanout.deliver("session", chat_status(index))
+        fanout.deliver("session", {"type": "user_typing"})
+
+    delivered = [queue.get_nowait()[1] for _ in range(queue.qsize())]
+
+    assert [m for m in delivered if m["type"] == "CHAT_MESSAGE_ADDED"] == [
+        chat_message(index) for index in range(5)
+    ]
+    assert fanout.dropped_count == 9
@@ -0,0 +1,46 @@
+import uuid
+
+from models.run_log import RunLogModel
+from models.run_log_message import RunLogMessageModel
+from services import run_log
+from services.run_log import RunLogsManager, RunLogWriter
+from typings.run import RunLogType
+
+
+def create_manager() -> RunLogsManager:
+    return RunLogsManager(
+        run_id=uuid.uuid4(),
+        user_id=uuid.uuid4(),
+        account_id=uuid.uuid4(),
+        agent_id=None,
+        team_id=None,
+        chat_id=None,
+        session_id="session",
+    )
+
+
+def test_failing_run_does_not_lose_logs_of_other_runs(session_factory, monkeypatch):
+    monkeypatch.setattr(run_log, "create_session", session_factory)
+    ok, failing = create_manager(), create_manager()
+
+    for manager in (ok, failing):
+        manager.create_run_log(
+            type=RunLogType.LLM,
+            name="LLM",
+            messages=[{"name": "Human", "content": "Hi"}],
+        )
+
+    ok.add_message_to_run_log(type=RunLogType.LLM, name="AI", content="Hello")
+    # Can't be stored as JSON, so the insert of this run fails
+    failing.add_message_to_run_log(type=RunLogType.LLM, name="AI", content=object())
+
+    RunLogWriter()._write(ok.pending_changes + failing.pending_changes)
+
+    with session_factory() as session:
+        run_logs = session.query(RunLogModel).all()
+        messages = (
+            session.query(RunLogMessageModel).order_by(RunLogMessageModel.seq).all()
+        )
+
+    assert [log.run_id for log in run_logs] == [ok.run_id]
+    assert [message.message["content"] for message in messages] == ["Hi", "Hello"]
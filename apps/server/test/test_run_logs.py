@@ -0,0 +1,71 @@
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+from fastapi import Response
+
+from controllers import run as run_controller
+from controllers.run import NEXT_CURSOR_HEADER, get_run_logs
+from models.run import RunModel
+from models.run_log import RunLogModel
+
+
+def create_run_logs(session_factory, count: int):
+    account_id = uuid.uuid4()
+    run_id = uuid.uuid4()
+    started = datetime(2024, 1, 1)
+
+    with session_factory() as session:
+        session.add(RunModel(id=run_id, account_id=account_id))
+        session.add_all(
+            [
+                RunLogModel(
+                    id=uuid.uuid4(),
+                    run_id=run_id,
+                    account_id=account_id,
+                    name=f"log {index}",
+                    type="LLM",
+                    created_on=started + timedelta(seconds=index),
+                )
+                for index in range(count)
+            ]
+        )
+        session.commit()
+
+    return run_id, SimpleNamespace(account=SimpleNamespace(id=account_id))
+
+
+def test_run_logs_are_not_paginated_by_default(session_factory, monkeypatch):
+    run_id, auth = create_run_logs(session_factory, 120)
+
+    with session_factory() as session:
+        monkeypatch.setattr(run_controller, "db", SimpleNamespace(session=session))
+        response = Response()
+        run_logs = get_run_logs(run_id, response, cursor=None, limit=None, auth=auth)
+
+    assert [log.name for log in run_logs] == [f"log {index}" for index in range(120)]
+    assert NEXT_CURSOR_HEADER not in response.headers
+
+
+def test_run_logs_pages_follow_the_cursor(session_factory, monkeypatch):
+    run_id, auth = create_run_logs(session_factory, 120)
+    names = []
+    cursor = None
+
+    with session_factory() as session:
+        monkeypatch.setattr(run_controller, "db", SimpleNamespace(session=session))
+
+        while True:
+            response = Response()
+            names += [
+                log.name
+                for log in get_run_logs(
+                    run_id, response, cursor=cursor, limit=50, auth=auth
+                )
+            ]
+            cursor = response.headers.get(NEXT_CURSOR_HEADER)
+
+            if not cursor:
+                break
+
+    assert names == [f"log {index}" for index in range(120)]
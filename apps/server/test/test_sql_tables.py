@@ -0,0 +1,97 @@
+import json
+from contextlib import contextmanager
+from types import SimpleNamespace
+
+from sqlalchemy import create_engine, event, text
+
+from controllers import datasource as datasource_controller
+from controllers.datasource import get_sql_tables
+from datasources.base import DatasourceType
+from services.sql_tables import (get_approximate_table_counts,
+                                 iter_exact_table_counts)
+from utils.cache import TTLCache
+
+
+def create_database(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'customer.db'}")
+
+    with engine.begin() as connection:
+        for table in ("orders", "users", "broken"):
+            connection.execute(text(f"CREATE TABLE {table} (id INTEGER)"))
+
+        connection.execute(text("INSERT INTO users VALUES (1), (2)"))
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def fail_broken_table(conn, cursor, statement, *args):
+        if "broken" in statement and "COUNT" in statement:
+            raise RuntimeError("permission denied for table broken")
+
+    return engine
+
+
+def create_statistics_engine(dialect: str, counts):
+    """Engine whose statistics query returns the given estimates by table"""
+    rows = [SimpleNamespace(name=name, count=count) for name, count in counts.items()]
+
+    @contextmanager
+    def connect():
+        yield SimpleNamespace(execute=lambda query: SimpleNamespace(all=lambda: rows))
+
+    return SimpleNamespace(dialect=SimpleNamespace(name=dialect), connect=connect)
+
+
+def test_unknown_estimates_have_no_count():
+    postgres = create_statistics_engine(
+        "postgresql", {"orders": 120, "empty": 0, "never_analyzed": -1}
+    )
+    mysql = create_statistics_engine("mysql", {"orders": 120, "unknown": None})
+
+    assert {
+        table["name"]: table["count"]
+        for table in get_approximate_table_counts(postgres)
+    } == {"orders": 120, "empty": 0, "never_analyzed": None}
+    assert {
+        table["name"]: table["count"] for table in get_approximate_table_counts(mysql)
+    } == {"orders": 120, "unknown": None}
+
+
+def test_failed_count_is_yielded_with_its_error(tmp_path):
+    engine = create_database(tmp_path)
+
+    tables = {table["name"]: table for table in iter_exact_table_counts(engine, 2)}
+
+    assert tables["users"]["count"] == 2
+    assert tables["orders"]["count"] == 0
+    assert tables["broken"]["count"] is None
+    assert "permission denied" in tables["broken"]["error"]
+
+
+async def test_exact_counts_stream_valid_json_when_a_table_fails(tmp_path, monkeypatch):
+    engine = create_database(tmp_path)
+    cache = TTLCache(10, 60)
+    monkeypatch.setattr(
+        datasource_controller,
+        "sql_engine_registry",
+        SimpleNamespace(get_engine=lambda id, uri: engine),
+    )
+    monkeypatch.setattr(datasource_controller, "sql_table_counts_cache", cache)
+
+    response = get_sql_tables(
+        source_type=DatasourceType.POSTGRES.value,
+        host="localhost",
+        port=5432,
+        user="user",
+        password="password",
+        name="customer",
+        id=None,
+        exact=True,
+        refresh=False,
+        auth=None,
+    )
+    body = "".join([chunk async for chunk in response.body_iterator])
+
+    tables = {table["name"]: table for table in json.loads(body)}
+    assert tables["broken"]["count"] is None
+    assert tables["users"]["count"] == 2
+    # Failed counts are not cached
+    assert len(cache) == 0
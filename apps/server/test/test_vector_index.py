@@ -0,0 +1,21 @@
+import numpy as np
+
+from benchmarks.vector_index_recall import make_vectors
+from datasources.file.vector_index import IVF_THRESHOLD, VectorIndex
+
+
+def test_default_ivf_search_keeps_recall_on_clustered_vectors():
+    vectors = make_vectors(IVF_THRESHOLD + 50, 64, 100, 0.5, seed=1)
+    vectors, queries = vectors[:IVF_THRESHOLD], vectors[IVF_THRESHOLD:]
+    index = VectorIndex()
+    index.add([str(position) for position in range(len(vectors))], vectors)
+
+    assert index.ivf is not None
+
+    recalls = [
+        len(set(index.search(query, 10)[0]) & set(index.search(query, 10, True)[0]))
+        / 10
+        for query in queries
+    ]
+
+    assert np.mean(recalls) >= 0.95
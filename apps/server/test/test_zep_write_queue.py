@@ -0,0 +1,73 @@
+import threading
+from types import SimpleNamespace
+
+from zep_python import Message
+
+from memory.zep.zep_write_queue import ZepWriteQueue
+
+
+class FakeZepMemory:
+    """Records added messages, every call waits until the test releases it"""
+
+    def __init__(self):
+        self.added = []
+        self.release = threading.Event()
+
+    def add_memory(self, session_id, memory):
+        self.release.wait(5)
+        self.added.append(
+            (session_id, [message.content for message in memory.messages])
+        )
+
+
+def create_client():
+    return SimpleNamespace(memory=FakeZepMemory())
+
+
+def message(content: str) -> Message:
+    return Message(role="human", content=content)
+
+
+def test_flush_returns_once_the_session_is_written():
+    write_queue = ZepWriteQueue(maxsize=10, batch_size=10)
+    client = create_client()
+
+    for index in range(3):
+        write_queue.put(client, "session", message(f"message {index}"))
+
+    # The worker is stuck on the write, so the session isn't flushed yet
+    assert not write_queue.flush(client, "session", timeout=0.1)
+
+    client.memory.release.set()
+
+    assert write_queue.flush(client, "session", timeout=5)
+    written = [
+        content
+        for session_id, contents in client.memory.added
+        if session_id == "session"
+        for content in contents
+    ]
+    assert written == ["message 0", "message 1", "message 2"]
+
+
+def test_flush_waits_for_messages_saved_before_it_only():
+    write_queue = ZepWriteQueue(maxsize=10, batch_size=1)
+    client = create_client()
+    client.memory.release.set()
+
+    write_queue.put(client, "session", message("first"))
+    assert write_queue.flush(client, "session", timeout=5)
+    assert client.memory.added == [("session", ["first"])]
+
+    # The write of the other session is stuck, the flush only waits for this one
+    other = create_client()
+    write_queue.put(client, "session", message("second"))
+    write_queue.put(other, "other", message("other"))
+
+    assert write_queue.flush(client, "session", timeout=5)
+    assert client.memory.added == [("session", ["first"]), ("session", ["second"])]
+    assert not write_queue.flush(other, "other", timeout=0.1)
+
+    other.memory.release.set()
+    assert write_queue.flush_all(timeout=5)
+    assert other.memory.added == [("other", ["other"])]
@@ -7,6 +7,7 @@ from pydantic import BaseModel, Field
 
 from datasources.file.file_retriever import FileDatasourceRetriever
 from models.config import ConfigModel
+from models.datasource import DatasourceModel
 from tools.base import BaseTool
 from typings.config import ConfigQueryParams
 
@@ -46,6 +47,7 @@ class FileDatasourceTool(BaseTool):
         vector_store = value.get("vector_store")
         chunk_size = value.get("chunk_size")
         similarity_top_k = value.get("similarity_top_k", 2)
+        query_cache = value.get("query_cache", True)
 
         retriever = FileDatasourceRetriever(
             self.settings,
@@ -58,7 +60,16 @@ class FileDatasourceTool(BaseTool):
             self.agent_with_configs,
             chunk_size,
             similarity_top_k,
+            query_cache,
+        )
+        retriever.load_index(
+            DatasourceModel.get_index_version(db.session, self.data_source_id)
         )
-        retriever.load_index()
         result = retriever.query(query)
+
+        query_cache_info = retriever.describe_query_cache()
+
+        if run_manager and query_cache_info:
+            run_manager.on_text(query_cache_info, name="Query cache")
+
         return result
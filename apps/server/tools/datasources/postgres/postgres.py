@@ -7,7 +7,6 @@ from pydantic import BaseModel, Field
 from models.config import ConfigModel
 from tools.base import BaseTool
 from tools.datasources.sql_query_engine import SQLQueryEngine
-from utils.encyption import decrypt_data, is_encrypted
 
 
 class PostgresDatabaseSchema(BaseModel):
@@ -41,12 +40,7 @@ class PostgresDatabaseTool(BaseTool):
             .all()
         )
 
-        config = {}
-
-        for cfg in configs:
-            config[cfg.key] = (
-                decrypt_data(cfg.value) if is_encrypted(cfg.value) else cfg.value
-            )
+        config = ConfigModel.decrypt_configs(configs)
 
         user = config.get("user")
         password = config.get("pass")
@@ -56,5 +50,7 @@ class PostgresDatabaseTool(BaseTool):
 
         uri = f"postgresql+psycopg2://{user}:{password}@{host}:{port}/{name}"
 
-        result = SQLQueryEngine(self.settings, self.agent_with_configs, uri).run(query)
+        result = SQLQueryEngine(
+            self.settings, self.agent_with_configs, uri, self.data_source_id
+        ).run(query)
         return result
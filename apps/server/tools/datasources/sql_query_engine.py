@@ -1,3 +1,5 @@
+from typing import NamedTuple, Optional
+
 from llama_index.core import (ServiceContext, SQLDatabase, VectorStoreIndex,
                               set_global_service_context)
 from llama_index.core.indices.struct_store.sql_query import \
@@ -7,12 +9,46 @@ from llama_index.core.objects import (ObjectIndex, SQLTableNodeMapping,
 from llama_index.core.prompts.base import Prompt
 from llama_index.core.prompts.prompt_type import PromptType
 from llama_index.llms.langchain import LangChainLLM
-from sqlalchemy import MetaData, create_engine
+from sqlalchemy import text
 
+from config import Config
+from services.sql_engines import sql_engine_registry
 from typings.agent import AgentWithConfigsOutput
 from typings.config import AccountSettings
+from utils.cache import TTLCache, make_fingerprint
 from utils.model import get_llm
 
+SCHEMA_FINGERPRINT_QUERY = text(
+    "SELECT table_name, column_name, data_type FROM information_schema.columns "
+    "WHERE table_schema = :schema ORDER BY table_name, ordinal_position"
+)
+
+
+class SQLSchemaCacheEntry(NamedTuple):
+    fingerprint: str
+    sql_database: SQLDatabase
+    obj_index: ObjectIndex
+
+
+# Reflected schema and table index per database, reused while its fingerprint matches
+sql_schema_cache: TTLCache[SQLSchemaCacheEntry] = TTLCache(
+    256, Config.SQL_SCHEMA_CACHE_TTL
+)
+
+
+def get_schema_fingerprint(engine) -> str:
+    """
+    Hash of every column of the default schema. One catalog query, much cheaper than
+    reflecting the tables.
+    """
+    with engine.connect() as connection:
+        rows = connection.execute(
+            SCHEMA_FINGERPRINT_QUERY,
+            {"schema": connection.dialect.default_schema_name},
+        ).all()
+
+    return make_fingerprint([tuple(row) for row in rows])
+
 
 class SQLQueryEngine:
     """LLamaIndex SQL Query Engine for SQL datasource"""
@@ -22,20 +58,39 @@ class SQLQueryEngine:
         settings: AccountSettings,
         agent_with_configs: AgentWithConfigsOutput,
         uri: str,
+        datasource_id: Optional[str] = None,
     ):
-        self.sql_database = SQLDatabase(engine=create_engine(uri))
-        self.meta = MetaData()
-        self.meta.reflect(bind=self.sql_database.engine)
         self.settings = settings
         self.agent_with_configs = agent_with_configs
 
+        cache_key = make_fingerprint(uri)
+        cached = sql_schema_cache.get(cache_key)
+        engine = sql_engine_registry.get_engine(datasource_id, uri)
+        fingerprint = get_schema_fingerprint(engine)
+
+        if (
+            cached
+            and cached.fingerprint == fingerprint
+            and cached.sql_database.engine is engine
+        ):
+            self.sql_database = cached.sql_database
+            self.obj_index = cached.obj_index
+            return
+
+        # SQLDatabase reflects the schema itself
+        self.sql_database = SQLDatabase(engine=engine)
+        self.obj_index = self.initialize_sql_index()
+
+        sql_schema_cache.set(
+            cache_key,
+            SQLSchemaCacheEntry(fingerprint, self.sql_database, self.obj_index),
+        )
+
     def run(self, query: str):
         """Run query and return result"""
 
-        obj_index = self.initialize_sql_index()
-
         try:
-            query_engine = self.create_sql_query_engine(obj_index)
+            query_engine = self.create_sql_query_engine(self.obj_index)
             res = query_engine.query(query)
             return res.response
         except Exception as err:
@@ -45,7 +100,7 @@ class SQLQueryEngine:
     def initialize_sql_index(self):
         """Initialize LLamaIndex SQL index"""
 
-        table_names = self.meta.tables.keys()
+        table_names = self.sql_database.get_usable_table_names()
 
         table_schema_objs = [
             SQLTableSchema(table_name=table_name) for table_name in table_names
@@ -53,8 +108,6 @@ class SQLQueryEngine:
 
         table_node_mapping = SQLTableNodeMapping(self.sql_database)
 
-        # TODO: research about saving index
-
         obj_index = ObjectIndex.from_objects(
             table_schema_objs,
             table_node_mapping,
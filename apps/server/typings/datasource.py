@@ -35,4 +35,5 @@ class DatasourceOutput(BaseModel):
 class DatasourceSQLTableOutput(BaseModel):
     id: str
     name: str
-    count: int
+    count: Optional[int]
+    error: Optional[str]
@@ -0,0 +1,163 @@
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, Optional, Tuple, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """
+    Thread-safe in-process LRU cache whose entries expire after `ttl` seconds.
+
+    The cache is per process, so writes made by other workers are only picked up
+    once the entry expires. Keep the TTL short for data which can change elsewhere.
+    """
+
+    def __init__(self, maxsize: int, ttl: float, timer: Callable[[], float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.timer = timer or time.monotonic
+        self._data: "OrderedDict[Hashable, Tuple[float, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Optional[V]:
+        with self._lock:
+            item = self._data.get(key)
+
+            if item is None:
+                self.misses += 1
+                return default
+
+            expires_at, value = item
+
+            if expires_at <= self.timer():
+                del self._data[key]
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: Hashable, value: V) -> None:
+        with self._lock:
+            self._data[key] = (self.timer() + self.ttl, value)
+            self._data.move_to_end(key)
+
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key: Hashable, default: Any = None) -> Optional[V]:
+        with self._lock:
+            item = self._data.pop(key, None)
+            return item[1] if item else default
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            item = self._data.get(key)
+            return item is not None and item[0] > self.timer()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+class SizedLRUCache(Generic[V]):
+    """
+    Thread-safe in-process LRU cache bounded by the total size of its values rather
+    than their count. Sizes are estimated by the caller when an entry is added, and
+    values bigger than the whole budget are not cached at all.
+    """
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.current_bytes = 0
+        self._data: "OrderedDict[Hashable, Tuple[int, V]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: Hashable, default: Any = None) -> Optional[V]:
+        with self._lock:
+            item = self._data.get(key)
+
+            if item is None:
+                self.misses += 1
+                return default
+
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key: Hashable, value: V, size: int) -> bool:
+        """Returns False when the value does not fit in the budget"""
+        with self._lock:
+            self._remove(key)
+
+            if size > self.max_bytes:
+                return False
+
+            self._data[key] = (size, value)
+            self.current_bytes += size
+
+            while self.current_bytes > self.max_bytes:
+                _, (evicted_size, _) = self._data.popitem(last=False)
+                self.current_bytes -= evicted_size
+                self.evictions += 1
+
+            return True
+
+    def pop(self, key: Hashable, default: Any = None) -> Optional[V]:
+        with self._lock:
+            item = self._remove(key)
+            return item[1] if item else default
+
+    def pop_where(self, predicate: Callable[[Hashable], bool]) -> int:
+        """Removes every entry whose key matches the predicate"""
+        with self._lock:
+            keys = [key for key in self._data if predicate(key)]
+
+            for key in keys:
+                self._remove(key)
+
+            return len(keys)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+            self.current_bytes = 0
+
+    def _remove(self, key: Hashable) -> Optional[Tuple[int, V]]:
+        item = self._data.pop(key, None)
+
+        if item:
+            self.current_bytes -= item[0]
+
+        return item
+
+    def __contains__(self, key: Hashable) -> bool:
+        with self._lock:
+            return key in self._data
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._data)
+
+
+def make_fingerprint(*parts: Any) -> str:
+    """
+    Stable hash of JSON-serializable parts, for cache keys which must change whenever
+    the underlying data does.
+    """
+    payload = json.dumps(parts, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode()).hexdigest()
@@ -1,4 +1,4 @@
-from cryptography.fernet import Fernet, InvalidToken, InvalidSignature
+from cryptography.fernet import Fernet, InvalidSignature, InvalidToken
 
 # Generate a key
 # key = Fernet.generate_key()
@@ -36,14 +36,36 @@ def decrypt_data(encrypted_data):
     return decrypted_data.decode()
 
 
-def is_encrypted(value):
-    # todo move in ENV
-    key = b"Y2g4Wn0qJ5kT7v9DfQ41aM_zXpEoBnI6+UjVcRLbGwO=="
+# Every Fernet token starts with the version byte 0x80, base64url encoded
+FERNET_TOKEN_PREFIX = "gAAAAA"
+
+
+def looks_encrypted(value) -> bool:
+    """
+    Cheap check whether the value has the shape of a Fernet token, without decrypting it.
+    """
+    return isinstance(value, str) and value.startswith(FERNET_TOKEN_PREFIX)
+
+
+def decrypt_value(value, encrypted=None):
+    """
+    Decrypts the value at most once, falling back to the raw value when it is not a
+    token of ours.
+
+    Args:
+        value (str): The stored value.
+        encrypted (bool | None): The stored encryption marker. None means unknown
+            (rows written before the marker existed), in which case the token shape
+            decides.
+
+    Returns:
+        str: The decrypted value, or the value itself if it is not encrypted.
+    """
+    # The shape check also covers values already decrypted earlier in the session
+    if encrypted is False or not looks_encrypted(value):
+        return value
+
     try:
-        f = Fernet(key)
-        f.decrypt(value)
-        return True
-    except (InvalidToken, InvalidSignature):
-        return False
-    except (ValueError, TypeError):
-        return False
+        return decrypt_data(value)
+    except (InvalidToken, InvalidSignature, ValueError, TypeError):
+        return value
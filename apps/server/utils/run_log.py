@@ -1,19 +1,30 @@
-from typing import List
+import base64
+from datetime import datetime
+from typing import Dict, List, Optional, Tuple
+from uuid import UUID
 
 from models.run_log import RunLogModel
 from typings.run import RunLogOutput
 from utils.type import convert_value_to_type
 
 
-def convert_model_to_response(run_log_model: RunLogModel) -> RunLogOutput:
+def convert_model_to_response(
+    run_log_model: RunLogModel, messages: Optional[List[Dict]] = None
+) -> RunLogOutput:
     datasource_data = {}
 
     # Extract attributes from DatasourceModel using annotations of Datasource
     for key in RunLogOutput.__annotations__.keys():
         if hasattr(run_log_model, key):
             target_type = RunLogOutput.__annotations__.get(key)
+            value = getattr(run_log_model, key)
+
+            # Messages come from run_log_message, the column is only legacy storage
+            if key == "messages" and messages is not None:
+                value = messages
+
             datasource_data[key] = convert_value_to_type(
-                value=getattr(run_log_model, key), target_type=target_type
+                value=value, target_type=target_type
             )
 
     return RunLogOutput(**datasource_data)
@@ -21,5 +32,26 @@ def convert_model_to_response(run_log_model: RunLogModel) -> RunLogOutput:
 
 def convert_run_logs_to_run_logs_list(
     run_logs: List[RunLogModel],
+    messages_by_run_log_id: Optional[Dict[UUID, List[Dict]]] = None,
 ) -> List[RunLogOutput]:
-    return [convert_model_to_response(run_log_model) for run_log_model in run_logs]
+    messages_by_run_log_id = messages_by_run_log_id or {}
+
+    return [
+        convert_model_to_response(
+            run_log_model, messages_by_run_log_id.get(run_log_model.id)
+        )
+        for run_log_model in run_logs
+    ]
+
+
+def encode_run_log_cursor(run_log: RunLogModel) -> str:
+    value = f"{run_log.created_on.isoformat()}|{run_log.id}"
+    return base64.urlsafe_b64encode(value.encode()).decode()
+
+
+def decode_run_log_cursor(cursor: str) -> Tuple[datetime, UUID]:
+    """Raises ValueError for malformed cursors"""
+    created_on, run_log_id = (
+        base64.urlsafe_b64decode(cursor.encode()).decode().split("|")
+    )
+    return datetime.fromisoformat(created_on), UUID(run_log_id)
@@ -151,6 +151,7 @@ const DatasourceForm = ({ formik, isLoading, isEdit = false, type }: DatasourceF
                         { label: `${t('zep')}`, value: 'zep' },
                         { label: `${t('pinecone')}`, value: 'pinecone' },
                         { label: `${t('weaviate')}`, value: 'weaviate' },
+                        { label: `${t('local-vector-store')}`, value: 'local' },
                       ]}
                     />
                   )}
@@ -4,7 +4,7 @@ import DATASOURCE_SQL_TABLES from '../../gql/ai/datasource/datasourceSqlTables.g
 export type IDatasourceSqlTables = {
   id: string
   name: string
-  count: number
+  count: number | null
 }[]
 
 interface Data {